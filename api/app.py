@@ -1,122 +1,80 @@
 # coding: utf-8
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request, stream_with_context
 from flask_cors import CORS
 import os
 import json
 import time
+from itertools import islice
+from urllib.parse import quote, urlencode
 from dotenv import load_dotenv
 
+import http_cache
+import metrics
+from graph_data import ConflictError
+from graph_store import FileGraphStore
+from graph_query import DIRECTIONS, MAX_DEPTH, MAX_LIMIT, MAX_PATH_LENGTH, MAX_PATHS
+from search_index import MAX_SEARCH_LIMIT
+
 # 加载环境变量
 load_dotenv()
 
 app = Flask(__name__)
-CORS(app)  # 允许跨域请求
-
-# 文件图存储实现
-class FileGraphStore:
-    def __init__(self, data_dir="./graph_data"):
-        self.data_dir = data_dir
-        os.makedirs(data_dir, exist_ok=True)
-        self.concepts_file = os.path.join(data_dir, "concepts.json")
-        self.relations_file = os.path.join(data_dir, "relations.json")
-        self.load_data()
-    
-    def load_data(self):
-        # 加载概念
-        if os.path.exists(self.concepts_file):
-            with open(self.concepts_file, "r", encoding="utf-8") as f:
-                self.concepts = json.load(f)
-        else:
-            self.concepts = []
-        
-        # 加载关系
-        if os.path.exists(self.relations_file):
-            with open(self.relations_file, "r", encoding="utf-8") as f:
-                self.relations = json.load(f)
-        else:
-            self.relations = []
-    
-    def save_data(self):
-        # 保存概念
-        with open(self.concepts_file, "w", encoding="utf-8") as f:
-            json.dump(self.concepts, f, ensure_ascii=False, indent=2)
-        
-        # 保存关系
-        with open(self.relations_file, "w", encoding="utf-8") as f:
-            json.dump(self.relations, f, ensure_ascii=False, indent=2)
-    
-    def get_concepts(self, category=None):
-        if category:
-            return [c for c in self.concepts if c.get("category") == category]
-        return self.concepts
-    
-    def get_concept(self, concept_id):
-        for concept in self.concepts:
-            if concept.get("id") == concept_id:
-                # 查找相关概念
-                concept_copy = concept.copy()
-                concept_copy["relations"] = []
-                
-                for relation in self.relations:
-                    if relation.get("src_id") == concept_id:
-                        target_id = relation.get("dst_id")
-                        target_concept = None
-                        for c in self.concepts:
-                            if c.get("id") == target_id:
-                                target_concept = c
-                                break
-                        
-                        if target_concept:
-                            concept_copy["relations"].append({
-                                "type": relation.get("relation_type"),
-                                "target_id": target_concept.get("id"),
-                                "target_name": target_concept.get("name"),
-                                "target_category": target_concept.get("category")
-                            })
-                
-                return concept_copy
-        return None
-    
-    def get_categories(self):
-        categories = set()
-        for concept in self.concepts:
-            category = concept.get("category")
-            if category:
-                categories.add(category)
-        return list(categories)
-    
-    # 添加基本的示例数据
-    def add_sample_data(self):
-        if not self.concepts:  # 只在没有数据时添加示例数据
-            self.concepts = [
-                {"id": "concept1", "name": "五位七十五法", "description": "阿毗达摩系统将一切法分为五大类七十五种", "category": "核心概念"},
-                {"id": "concept2", "name": "色法", "description": "物质现象相关的概念，共十一种", "category": "五位"},
-                {"id": "concept3", "name": "心法", "description": "心识相关的概念，共一种", "category": "五位"},
-                {"id": "concept4", "name": "心所法", "description": "心的作用相关的概念，共五十一种", "category": "五位"},
-                {"id": "concept5", "name": "心不相应行法", "description": "非心性但与心相关的概念，共十四种", "category": "五位"},
-                {"id": "concept6", "name": "无为法", "description": "不生不灭的概念，共三种", "category": "五位"},
-                {"id": "concept7", "name": "眼", "description": "眼根，色法之一", "category": "色法"},
-                {"id": "concept8", "name": "耳", "description": "耳根，色法之一", "category": "色法"},
-                {"id": "concept9", "name": "心王", "description": "心识本体", "category": "心法"}
-            ]
-            
-            self.relations = [
-                {"src_id": "concept1", "dst_id": "concept2", "relation_type": "包含", "weight": 5},
-                {"src_id": "concept1", "dst_id": "concept3", "relation_type": "包含", "weight": 5},
-                {"src_id": "concept1", "dst_id": "concept4", "relation_type": "包含", "weight": 5},
-                {"src_id": "concept1", "dst_id": "concept5", "relation_type": "包含", "weight": 5},
-                {"src_id": "concept1", "dst_id": "concept6", "relation_type": "包含", "weight": 5},
-                {"src_id": "concept2", "dst_id": "concept7", "relation_type": "包含", "weight": 3},
-                {"src_id": "concept2", "dst_id": "concept8", "relation_type": "包含", "weight": 3},
-                {"src_id": "concept3", "dst_id": "concept9", "relation_type": "包含", "weight": 3}
-            ]
-            
-            self.save_data()
+CORS(app, expose_headers=["ETag", "Last-Modified", "X-Next-Cursor", "Link"])  # 允许跨域请求
+
+# 概念列表分页：默认页大小、最大页大小，以及 NDJSON 流式输出每次写出的行数
+CONCEPTS_PAGE_SIZE = 100
+CONCEPTS_MAX_PAGE_SIZE = 5000
+NDJSON_CHUNK_LINES = 500
+# 批量获取概念详情时单次请求的最大ID数
+CONCEPTS_BATCH_MAX_IDS = 1000
+
+# 数据文件变化检查间隔（秒），0 表示不自动重新加载
+GRAPH_RELOAD_INTERVAL = float(os.getenv("GRAPH_RELOAD_INTERVAL", 5))
+# 管理接口令牌，未设置时管理接口不可用
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+# 写操作：写日志每次组提交后是否 fsync、累计多少条记录后合并进数据文件、
+# wait=1 时等待新快照发布的最长秒数
+WRITE_LOG_FSYNC = os.getenv("WRITE_LOG_FSYNC", "1") not in ("0", "false")
+COMPACT_THRESHOLD = int(os.getenv("COMPACT_THRESHOLD", 10000))
+WRITE_VISIBLE_TIMEOUT = 30
+
+# 只读打开存储（多个工作进程共享数据目录时由 serve.py 设置），写接口返回 409
+GRAPH_READ_ONLY = os.getenv("GRAPH_READ_ONLY", "0") in ("1", "true")
+# 是否把建好的索引另存为二进制快照文件，数据未变化时下次启动直接载入
+GRAPH_SNAPSHOT = os.getenv("GRAPH_SNAPSHOT", "0") in ("1", "true")
+
+# 邻域、路径和过滤后的概念列表查询结果缓存的容量（MB），0 表示不缓存
+RESULT_CACHE_MB = float(os.getenv("RESULT_CACHE_MB", 64))
+
+# 路径查询的单次展开预算
+PATH_MAX_EXPANSIONS = int(os.getenv("PATH_MAX_EXPANSIONS", 100000))
+PATH_TIMEOUT = float(os.getenv("PATH_TIMEOUT", 2.0))
 
 # 初始化文件图存储
-graph_store = FileGraphStore()
+load_start = time.perf_counter()
+graph_store = FileGraphStore(
+    os.getenv("GRAPH_DATA_DIR", "./graph_data"),
+    mode=os.getenv("GRAPH_STORE_MODE", "indexed"),
+    fsync=WRITE_LOG_FSYNC,
+    compact_threshold=COMPACT_THRESHOLD,
+    binary_snapshot=GRAPH_SNAPSHOT,
+    read_only=GRAPH_READ_ONLY,
+    result_cache_bytes=int(RESULT_CACHE_MB * 1024 * 1024)
+)
 # 添加示例数据
 graph_store.add_sample_data()
+# 请求和存储操作计时；须在 http_cache 之前注册，304 响应也会被统计
+app_metrics = metrics.init_app(app, graph_store)
+# 启动时的加载发生在计时包装之前，单独记录
+app_metrics.store_latency.observe(("load_data",), time.perf_counter() - load_start)
+# 按图数据版本处理条件请求和响应压缩
+http_cache.init_app(app, graph_store)
+# 数据文件变化时在后台重建快照并原子替换
+if GRAPH_RELOAD_INTERVAL > 0:
+    graph_store.start_watcher(GRAPH_RELOAD_INTERVAL)
+# 就绪状态：图数据和索引加载完成后为 True，开始优雅关闭时置为 False
+service_state = {"ready": True}
 
 @app.route('/api/health')
 def health_check():
@@ -124,23 +82,348 @@ def health_check():
     return jsonify({
         "status": "ok", 
         "timestamp": time.time(), 
-        "message": "API服务正常运行"
+        "message": "API服务正常运行",
+        "data_version": graph_store.version,
+        "result_cache": graph_store.result_cache.stats()
     })
 
+@app.route('/api/metrics')
+def metrics_endpoint():
+    """Prometheus 文本格式的运行指标"""
+    return Response(app_metrics.render(graph_store, service_state["ready"]), content_type=metrics.CONTENT_TYPE)
+
+def require_admin():
+    """校验 X-Admin-Token 请求头，未通过时返回 403 响应"""
+    if not ADMIN_TOKEN or request.headers.get('X-Admin-Token') != ADMIN_TOKEN:
+        return jsonify({"error": "无权访问管理接口"}), 403
+    return None
+
+@app.route('/api/ready')
+def readiness_check():
+    """就绪检查接口：图数据和索引已加载且未在关闭过程中时返回 200，否则返回 503"""
+    if not service_state["ready"]:
+        return jsonify({"status": "unavailable"}), 503
+    snapshot = graph_store.snapshot
+    return jsonify({"status": "ready", "data_version": snapshot.version, "concepts": len(snapshot.graph)})
+
+@app.route('/api/admin/reload', methods=['POST'])
+def reload_data():
+    """重新加载图数据接口（需要 X-Admin-Token 请求头）
+
+    默认在后台构建新快照并立即返回 202；wait=1 时等待构建完成后返回新版本。
+    """
+    denied = require_admin()
+    if denied:
+        return denied
+
+    force = request.args.get('force', '') in ('1', 'true')
+    if request.args.get('wait', '') in ('1', 'true'):
+        try:
+            reloaded = graph_store.reload(force)
+        except Exception as e:
+            return jsonify({"error": f"重新加载失败: {e}", "data_version": graph_store.version}), 500
+        return jsonify({"reloaded": reloaded, "data_version": graph_store.version})
+
+    graph_store.reload_in_background(force)
+    return jsonify({"status": "accepted", "data_version": graph_store.version}), 202
+
+@app.route('/api/admin/compact', methods=['POST'])
+def compact_data():
+    """把写日志合并进数据文件接口（需要 X-Admin-Token 请求头）"""
+    denied = require_admin()
+    if denied:
+        return denied
+    try:
+        compacted = graph_store.compact()
+    except Exception as e:
+        return jsonify({"error": f"合并写日志失败: {e}"}), 500
+    return jsonify({"compacted": compacted, "data_version": graph_store.version})
+
+def write_response(result, status=200):
+    """写操作的响应：带上写日志序号；wait=1 时等待包含该修改的快照发布后再返回"""
+    if request.args.get('wait', '') in ('1', 'true'):
+        result["visible"] = graph_store.wait_visible(result["seq"], WRITE_VISIBLE_TIMEOUT)
+        result["data_version"] = graph_store.version
+    return jsonify(result), status
+
+def run_write(operation, *args):
+    """执行写操作，把存储抛出的异常转换为相应的错误响应；成功时返回 (结果, None)"""
+    try:
+        return operation(*args), None
+    except ValueError as e:
+        return None, (jsonify({"error": str(e)}), 400)
+    except KeyError as e:
+        return None, (jsonify({"error": f"未找到: {e.args[0]}"}), 404)
+    except ConflictError as e:
+        return None, (jsonify({"error": str(e)}), 409)
+    except RuntimeError as e:
+        return None, (jsonify({"error": str(e)}), 409)
+    except OSError as e:
+        return None, (jsonify({"error": f"写入失败: {e}"}), 500)
+
+@app.route('/api/concepts', methods=['POST'])
+def create_concept():
+    """新增概念接口（需要 X-Admin-Token 请求头）"""
+    denied = require_admin()
+    if denied:
+        return denied
+    concept = request.get_json(silent=True)
+    if not isinstance(concept, dict):
+        return jsonify({"error": "请求体必须是 JSON 对象"}), 400
+    seq, error = run_write(graph_store.add_concept, concept)
+    if error:
+        return error
+    return write_response({"concept": concept, "seq": seq}, 201)
+
+@app.route('/api/concept/<concept_id>', methods=['PATCH'])
+def update_concept(concept_id):
+    """修改概念字段接口（需要 X-Admin-Token 请求头）"""
+    denied = require_admin()
+    if denied:
+        return denied
+    fields = request.get_json(silent=True)
+    if not isinstance(fields, dict):
+        return jsonify({"error": "请求体必须是 JSON 对象"}), 400
+    result, error = run_write(graph_store.update_concept, concept_id, fields)
+    if error:
+        return error
+    concept, seq = result
+    return write_response({"concept": concept, "seq": seq})
+
+@app.route('/api/concept/<concept_id>', methods=['DELETE'])
+def delete_concept(concept_id):
+    """删除概念及其全部关系接口（需要 X-Admin-Token 请求头）"""
+    denied = require_admin()
+    if denied:
+        return denied
+    seq, error = run_write(graph_store.delete_concept, concept_id)
+    if error:
+        return error
+    return write_response({"deleted": concept_id, "seq": seq})
+
+@app.route('/api/relations', methods=['POST'])
+def create_relation():
+    """新增关系接口（需要 X-Admin-Token 请求头），请求体含 src_id、dst_id、relation_type，可选 weight"""
+    denied = require_admin()
+    if denied:
+        return denied
+    relation = request.get_json(silent=True)
+    if not isinstance(relation, dict):
+        return jsonify({"error": "请求体必须是 JSON 对象"}), 400
+    seq, error = run_write(graph_store.add_relation, relation)
+    if error:
+        return error
+    return write_response({"relation": relation, "seq": seq}, 201)
+
+@app.route('/api/relations', methods=['DELETE'])
+def delete_relation():
+    """删除关系接口（需要 X-Admin-Token 请求头），由 src_id、dst_id、relation_type 查询参数指定"""
+    denied = require_admin()
+    if denied:
+        return denied
+    key = [request.args.get(name, '') for name in ('src_id', 'dst_id', 'relation_type')]
+    if not all(key):
+        return jsonify({"error": "必须提供 src_id、dst_id 和 relation_type 参数"}), 400
+    seq, error = run_write(graph_store.delete_relation, *key)
+    if error:
+        return error
+    return write_response({"deleted": dict(zip(('src_id', 'dst_id', 'relation_type'), key)), "seq": seq})
+
+def parse_fields(value):
+    """解析逗号分隔的字段投影参数，空值表示返回全部字段"""
+    if not value:
+        return None
+    fields = [f.strip() for f in value.split(',') if f.strip()]
+    return fields or None
+
+def project(concept, fields):
+    if fields is None:
+        return concept
+    return {f: concept[f] for f in fields if f in concept}
+
+def generate_ndjson(concepts, fields):
+    """逐批序列化概念，每行一个 JSON 对象，内存占用与结果总量无关"""
+    lines = []
+    for concept in concepts:
+        lines.append(json.dumps(project(concept, fields), ensure_ascii=False))
+        if len(lines) >= NDJSON_CHUNK_LINES:
+            yield "\n".join(lines) + "\n"
+            lines = []
+    if lines:
+        yield "\n".join(lines) + "\n"
+
 @app.route('/api/concepts')
 def get_concepts():
-    """获取所有概念接口"""
+    """获取概念列表接口，支持游标分页、字段投影、按中心性排序和 NDJSON 流式输出"""
     category = request.args.get('category', '')
-    return jsonify(graph_store.get_concepts(category))
+    after = request.args.get('after') or None
+    fields = parse_fields(request.args.get('fields'))
+    output_format = request.args.get('format', 'json')
+    if output_format not in ('json', 'ndjson'):
+        return jsonify({"error": "参数 format 必须是 json 或 ndjson"}), 400
+    sort = request.args.get('sort') or None
+    if sort not in (None, 'centrality'):
+        return jsonify({"error": "参数 sort 只能是 centrality"}), 400
+    if sort is not None:
+        # 中心性在该数据版本第一次使用时计算，先在这里算好，流式输出中不再出错
+        try:
+            graph_store.get_centrality()
+        except RuntimeError as e:
+            return jsonify({"error": str(e)}), 501
+    try:
+        limit = parse_int_arg('limit', None, 1, CONCEPTS_MAX_PAGE_SIZE) if 'limit' in request.args else None
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    if output_format == 'ndjson':
+        try:
+            concepts = graph_store.iter_concepts(category, after, sort)
+        except KeyError:
+            return jsonify({"error": "无效的游标 after"}), 400
+        if limit is not None:
+            concepts = islice(concepts, limit)
+        return Response(stream_with_context(generate_ndjson(concepts, fields)), mimetype='application/x-ndjson')
+
+    # 不分页时保持原有行为：一次返回全部概念
+    if limit is None and after is None:
+        return jsonify([project(c, fields) for c in graph_store.get_concepts(category, sort)])
+
+    try:
+        items, next_cursor = graph_store.get_concepts_page(category, after, limit or CONCEPTS_PAGE_SIZE, sort)
+    except KeyError:
+        return jsonify({"error": "无效的游标 after"}), 400
+    response = jsonify([project(c, fields) for c in items])
+    if next_cursor is not None:
+        args = request.args.to_dict()
+        args['after'] = next_cursor
+        # 响应头只能是 latin-1，游标按 URL 编码写出
+        response.headers['X-Next-Cursor'] = quote(next_cursor, safe='')
+        response.headers['Link'] = f'<{request.path}?{urlencode(args)}>; rel="next"'
+    return response
 
 @app.route('/api/concept/<concept_id>')
 def get_concept(concept_id):
     """获取特定概念的详细信息接口"""
     concept = graph_store.get_concept(concept_id)
     if concept:
+        if "centrality" not in concept and graph_store.centrality_available:
+            # 中心性尚在后台计算，算好后同一版本的响应会多出该字段
+            http_cache.mark_incomplete()
         return jsonify(concept)
     return jsonify({"id": concept_id, "name": "未知概念", "description": "未找到该概念", "category": "未知", "relations": []}), 404
 
+@app.route('/api/concepts/batch', methods=['POST'])
+def get_concepts_batch():
+    """批量获取概念详情接口
+
+    请求体: {"ids": [...], "types": [...]}，types 可选，只返回这些类型的关系。
+    返回 {"concepts": {id: 详情}, "missing": [不存在的ID]}。
+    """
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict):
+        return jsonify({"error": "请求体必须是 JSON 对象"}), 400
+    ids = body.get('ids')
+    if not isinstance(ids, list) or not all(isinstance(i, str) for i in ids):
+        return jsonify({"error": "ids 必须是字符串数组"}), 400
+    if len(ids) > CONCEPTS_BATCH_MAX_IDS:
+        return jsonify({"error": f"ids 最多 {CONCEPTS_BATCH_MAX_IDS} 个"}), 400
+    types = body.get('types')
+    if types is not None and (not isinstance(types, list) or not all(isinstance(t, str) for t in types)):
+        return jsonify({"error": "types 必须是字符串数组"}), 400
+
+    found, missing = graph_store.get_concepts_batch(ids, set(types) if types else None)
+    return jsonify({"concepts": found, "missing": missing})
+
+def parse_types(value):
+    """解析逗号分隔的关系类型参数，空值表示不过滤"""
+    if not value:
+        return None
+    types = {t.strip() for t in value.split(',') if t.strip()}
+    return types or None
+
+def parse_int_arg(name, default, minimum, maximum):
+    """读取整数查询参数，不是整数或超出范围时抛出 ValueError"""
+    message = f"参数 {name} 必须是 {minimum} 到 {maximum} 之间的整数"
+    raw = request.args.get(name)
+    if raw is None:
+        value = default
+    else:
+        try:
+            value = int(raw)
+        except ValueError:
+            raise ValueError(message)
+    if value is None or not minimum <= value <= maximum:
+        raise ValueError(message)
+    return value
+
+@app.route('/api/concept/<concept_id>/neighborhood')
+def get_neighborhood(concept_id):
+    """获取概念的多跳邻域（节点和边）接口"""
+    try:
+        depth = parse_int_arg('depth', 1, 1, MAX_DEPTH)
+        limit = parse_int_arg('limit', 200, 1, MAX_LIMIT)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    direction = request.args.get('direction', 'out')
+    if direction not in DIRECTIONS:
+        return jsonify({"error": f"参数 direction 必须是 {'/'.join(DIRECTIONS)} 之一"}), 400
+
+    result = graph_store.get_neighborhood(concept_id, depth, direction, parse_types(request.args.get('types')), limit)
+    if result is None:
+        return jsonify({"error": "未找到该概念"}), 404
+    return jsonify(result)
+
+@app.route('/api/path')
+def get_path():
+    """查询两个概念之间的最短路径接口"""
+    source_id = request.args.get('from', '')
+    target_id = request.args.get('to', '')
+    if not source_id or not target_id:
+        return jsonify({"error": "必须提供 from 和 to 参数"}), 400
+    try:
+        max_len = parse_int_arg('max_len', 6, 1, MAX_PATH_LENGTH)
+        k = parse_int_arg('k', 1, 1, MAX_PATHS)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    direction = request.args.get('direction', 'both')
+    if direction not in DIRECTIONS:
+        return jsonify({"error": f"参数 direction 必须是 {'/'.join(DIRECTIONS)} 之一"}), 400
+
+    result = graph_store.find_paths(source_id, target_id, k, max_len, direction,
+                                    parse_types(request.args.get('types')),
+                                    PATH_MAX_EXPANSIONS, PATH_TIMEOUT)
+    if result is None:
+        return jsonify({"error": "未找到起点或终点概念"}), 404
+    return jsonify(result)
+
+@app.route('/api/search')
+def search_concepts():
+    """概念全文检索接口（名称、描述、巴利语名、梵语名，繁简通检）"""
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({"error": "必须提供 q 参数"}), 400
+    try:
+        limit = parse_int_arg('limit', 20, 1, MAX_SEARCH_LIMIT)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    start = time.perf_counter()
+    results = graph_store.search(query, request.args.get('category', ''), limit)
+    return jsonify({
+        "query": query,
+        "results": results,
+        "took_ms": round((time.perf_counter() - start) * 1000, 3)
+    })
+
+@app.route('/api/layout')
+def get_layout():
+    """获取服务端预计算的图布局接口（节点坐标和边），前端只需绘制"""
+    try:
+        layout = graph_store.get_layout(request.args.get('category', ''))
+    except RuntimeError as e:
+        return jsonify({"error": str(e)}), 501
+    return jsonify(layout)
+
 @app.route('/api/categories')
 def get_categories():
     """获取所有分类接口"""
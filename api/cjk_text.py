@@ -0,0 +1,77 @@
+# coding: utf-8
+"""检索用的文本规范化与分词：繁简折叠、去除巴利/梵语变音符号、字符 n-gram
+
+scripts/entity_resolution.py 的实体消解也使用这里的 fold 和 index_grams，两边的规范化保持一致。
+"""
+import os
+import re
+import unicodedata
+
+T2S_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "t2s_chars.txt")
+
+# 汉字连续段或拉丁字母/数字单词，其余字符（标点、空白）作为分隔
+_CJK_CLASS = r"[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]"
+_SEGMENT_RE = re.compile(_CJK_CLASS + r"+|(?:(?!" + _CJK_CLASS + r")[^\W_])+")
+
+# 组合用变音符号（分解后的 ā、ṃ、ṇ 等的附加符号）
+_COMBINING_RE = re.compile(r"[\u0300-\u036f\u1ab0-\u1aff\u1dc0-\u1dff\u20d0-\u20ff\ufe20-\ufe2f]")
+
+
+def _load_t2s_table(path=T2S_FILE):
+    mapping = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            for i in range(0, len(line) - 1, 2):
+                mapping[ord(line[i])] = line[i + 1]
+    return mapping
+
+
+_T2S = _load_t2s_table()
+
+
+def is_cjk(ch):
+    return "\u4e00" <= ch <= "\u9fff" or "\u3400" <= ch <= "\u4dbf" or "\uf900" <= ch <= "\ufaff"
+
+
+def fold(text):
+    """规范化文本：全角转半角、繁体转简体、去掉变音符号（vedanā → vedana）、转小写"""
+    if not text:
+        return ""
+    if text.isascii():
+        return text.lower()
+    text = unicodedata.normalize("NFKC", text).translate(_T2S)
+    text = _COMBINING_RE.sub("", unicodedata.normalize("NFKD", text))
+    return text.lower()
+
+
+def segments(folded):
+    """把已规范化的文本切分为汉字段和拉丁单词"""
+    return _SEGMENT_RE.findall(folded)
+
+
+def index_grams(folded):
+    """索引用的 n-gram 集合：汉字段取单字和双字，拉丁单词取三字母组（不足三个字母取整词）"""
+    grams = set()
+    for segment in segments(folded):
+        if is_cjk(segment[0]):
+            grams.update(segment)
+            grams.update(map(str.__add__, segment, segment[1:]))
+        elif len(segment) < 3:
+            grams.add(segment)
+        else:
+            grams.update(map("".join, zip(segment, segment[1:], segment[2:])))
+    return grams
+
+
+def query_grams(term):
+    """查询词对应的 n-gram：尽量使用最长的 gram，以缩小候选集"""
+    if is_cjk(term[0]):
+        if len(term) == 1:
+            return [term]
+        return [term[i:i + 2] for i in range(len(term) - 1)]
+    if len(term) < 3:
+        return [term]
+    return [term[i:i + 3] for i in range(len(term) - 2)]
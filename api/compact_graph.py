@@ -0,0 +1,206 @@
+# coding: utf-8
+import json
+from array import array
+from bisect import bisect_right
+
+# 权重缺失或不是数值时在浮点数组中以 NaN 表示（与中心性计算的处理一致），查询时返回 None
+_MISSING = float("nan")
+
+
+class StringTable:
+    """驻留字符串表：相同字符串只保存一份，以整数下标引用"""
+
+    def __init__(self):
+        self.strings = []
+        self.index = {}
+
+    def intern(self, value):
+        idx = self.index.get(value)
+        if idx is None:
+            idx = len(self.strings)
+            self.index[value] = idx
+            self.strings.append(value)
+        return idx
+
+    def __getitem__(self, idx):
+        return self.strings[idx]
+
+    def __len__(self):
+        return len(self.strings)
+
+
+class CompactGraph:
+    """紧凑的数组化概念图
+
+    与 GraphIndex 提供相同的查询接口，但不为每个概念、每条关系保存独立的 dict：
+    - 概念ID映射为整数节点号；分类和关系类型存入驻留字符串表，只保存下标
+    - 概念的其余字段序列化为 UTF-8 JSON，拼接进一个 bytearray，按偏移量惰性解码
+    - 出边、入边按 CSR 格式存储：offsets[i]..offsets[i+1] 是节点 i 的边，
+      对端节点、关系类型、权重分别存入并行的类型化数组
+    关系中引用但不存在的概念ID分配在 [concept_count, len(ids)) 区间，仅用于保留边。
+    """
+
+    def __init__(self, concepts, relations):
+        self.ids = []
+        self.node_of = {}
+        self.categories_table = StringTable()
+        self.relation_types = StringTable()
+
+        # 概念记录
+        self.record_blob = bytearray()
+        self.record_offsets = array("Q", [0])
+        self.node_category = array("i")
+        for concept in concepts:
+            concept_id = concept.get("id")
+            if concept_id is None or concept_id in self.node_of:
+                continue
+            self.node_of[concept_id] = len(self.ids)
+            self.ids.append(concept_id)
+
+            category = concept.get("category")
+            self.node_category.append(self.categories_table.intern(category) if category else -1)
+
+            rest = {k: v for k, v in concept.items() if k not in ("id", "category")}
+            self.record_blob += json.dumps(rest, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+            self.record_offsets.append(len(self.record_blob))
+        self.concept_count = len(self.ids)
+
+        # 关系先转为整数三元组，再按源/目标节点分桶生成 CSR
+        src_nodes = array("I")
+        dst_nodes = array("I")
+        type_ids = array("I")
+        # 双精度保存，0.1 等权重读回时与 indexed 模式完全相同
+        weights = array("d")
+        for relation in relations:
+            src_nodes.append(self._node_for(relation.get("src_id")))
+            dst_nodes.append(self._node_for(relation.get("dst_id")))
+            type_ids.append(self.relation_types.intern(relation.get("relation_type")))
+            weight = relation.get("weight")
+            weights.append(weight if isinstance(weight, (int, float)) else _MISSING)
+        self.relation_count = len(src_nodes)
+
+        node_total = len(self.ids)
+        self.out_offsets, self.out_targets, self.out_types, self.out_weights = self._build_csr(
+            src_nodes, dst_nodes, type_ids, weights, node_total)
+        self.in_offsets, self.in_sources, self.in_types, self.in_weights = self._build_csr(
+            dst_nodes, src_nodes, type_ids, weights, node_total)
+
+        # 分类 → 节点号列表，同样以 CSR 方式存放
+        category_nodes = [array("I") for _ in range(len(self.categories_table))]
+        for node, category_idx in enumerate(self.node_category):
+            if category_idx >= 0:
+                category_nodes[category_idx].append(node)
+        self.category_nodes = category_nodes
+
+    def _node_for(self, concept_id):
+        node = self.node_of.get(concept_id)
+        if node is None:
+            node = len(self.ids)
+            self.node_of[concept_id] = node
+            self.ids.append(concept_id)
+        return node
+
+    @staticmethod
+    def _build_csr(keys, others, type_ids, weights, node_total):
+        """计数排序生成 CSR：offsets 长度为 node_total+1，其余数组与边数等长"""
+        offsets = array("I", bytes(4 * (node_total + 1)))
+        for key in keys:
+            offsets[key + 1] += 1
+        for i in range(node_total):
+            offsets[i + 1] += offsets[i]
+
+        edge_total = len(keys)
+        cursor = array("I", offsets[:-1])
+        targets = array("I", bytes(4 * edge_total))
+        types = array("I", bytes(4 * edge_total))
+        edge_weights = array("d", bytes(8 * edge_total))
+        for edge, key in enumerate(keys):
+            pos = cursor[key]
+            cursor[key] = pos + 1
+            targets[pos] = others[edge]
+            types[pos] = type_ids[edge]
+            edge_weights[pos] = weights[edge]
+        return offsets, targets, types, edge_weights
+
+    def __len__(self):
+        return self.concept_count
+
+    def __contains__(self, concept_id):
+        node = self.node_of.get(concept_id)
+        return node is not None and node < self.concept_count
+
+    def _materialize(self, node):
+        record = json.loads(self.record_blob[self.record_offsets[node]:self.record_offsets[node + 1]])
+        concept = {"id": self.ids[node]}
+        category_idx = self.node_category[node]
+        if category_idx >= 0:
+            concept["category"] = self.categories_table[category_idx]
+        concept.update(record)
+        return concept
+
+    def concept(self, concept_id):
+        node = self.node_of.get(concept_id)
+        if node is None or node >= self.concept_count:
+            return None
+        return self._materialize(node)
+
+    def concepts(self, category=None):
+        if category:
+            idx = self.categories_table.index.get(category)
+            if idx is None:
+                return []
+            return [self._materialize(node) for node in self.category_nodes[idx]]
+        return [self._materialize(node) for node in range(self.concept_count)]
+
+    def iter_concepts(self, category=None, after=None):
+        """按加载顺序遍历概念；after 为游标（上一页最后一个概念的ID），未知游标抛出 KeyError"""
+        if category:
+            idx = self.categories_table.index.get(category)
+            nodes = self.category_nodes[idx] if idx is not None else []
+        else:
+            nodes = range(self.concept_count)
+        start = 0
+        if after is not None:
+            if after not in self:
+                raise KeyError(after)
+            start = bisect_right(nodes, self.node_of[after])
+        return (self._materialize(nodes[i]) for i in range(start, len(nodes)))
+
+    def categories(self):
+        return list(self.categories_table.strings)
+
+    def positions(self, category=None):
+        """category 下（为空时为全部）概念的位置（即节点号），按升序排列"""
+        if category:
+            idx = self.categories_table.index.get(category)
+            return self.category_nodes[idx] if idx is not None else []
+        return range(self.concept_count)
+
+    def concept_position(self, concept_id):
+        node = self.node_of.get(concept_id)
+        return node if node is not None and node < self.concept_count else None
+
+    def concept_at(self, position):
+        return self._materialize(position)
+
+    def edges(self, concept_id, direction="out"):
+        """返回 (另一端概念ID, 关系类型, 权重) 列表"""
+        node = self.node_of.get(concept_id)
+        if node is None:
+            return []
+        if direction == "in":
+            offsets, others, types, weights = self.in_offsets, self.in_sources, self.in_types, self.in_weights
+        else:
+            offsets, others, types, weights = self.out_offsets, self.out_targets, self.out_types, self.out_weights
+
+        ids = self.ids
+        relation_types = self.relation_types.strings
+        result = []
+        for pos in range(offsets[node], offsets[node + 1]):
+            weight = weights[pos]
+            if weight != weight:  # NaN
+                weight = None
+            elif weight.is_integer():
+                weight = int(weight)
+            result.append((ids[others[pos]], relation_types[types[pos]], weight))
+        return result
@@ -0,0 +1,178 @@
+# coding: utf-8
+"""概念图的中心性指标：度、加权 PageRank、介数（抽样近似）
+
+全部以 NumPy 数组运算完成，节点按概念的位置（加载顺序下标）编号：
+- 度：出边与入边条数之和；加权度为两端关系权重之和
+- PageRank：把关系视为无向边、按权重分配转移概率的幂迭代，每轮一次 np.bincount。
+  关系多为"包含"等由上位指向下位的边，沿方向计算时得分流向叶子，根概念反而排在最后
+- 介数：把关系视为无向边，从抽样的 BETWEENNESS_SAMPLES 个起点做 Brandes 算法，
+  广度优先搜索和依赖累加都按层向量化，结果按 节点数/抽样数 放大后归一化到 [0, 1]
+关系的权重缺失时按 1 计，负权重按 0 计；端点不是已知概念的关系不参与计算。
+"""
+try:
+    import numpy as np
+except ImportError:  # numpy 为可选依赖，未安装时中心性不可用
+    np = None
+
+DAMPING = 0.85
+PAGERANK_MAX_ITERATIONS = 100
+PAGERANK_TOLERANCE = 1e-10
+BETWEENNESS_SAMPLES = 32
+
+
+def available():
+    """是否安装了 numpy、能够计算中心性"""
+    return np is not None
+
+
+def _edge_arrays(graph, n):
+    """返回 (src, dst, weight) 三个数组，端点为概念位置"""
+    if hasattr(graph, "out_offsets"):
+        # CompactGraph / MappedGraph：直接使用 CSR 数组，节点号即概念位置
+        offsets = np.asarray(graph.out_offsets, dtype=np.int64)
+        src = np.repeat(np.arange(len(offsets) - 1, dtype=np.int64), np.diff(offsets))
+        dst = np.asarray(graph.out_targets, dtype=np.int64)
+        weight = np.asarray(graph.out_weights, dtype=np.float64)
+    else:
+        src_list = []
+        dst_list = []
+        weight_list = []
+        position = graph.concept_position
+        for src_id, edges in graph.out_edges.items():
+            src_pos = position(src_id)
+            if src_pos is None:
+                continue
+            for dst_id, _, edge_weight in edges:
+                dst_pos = position(dst_id)
+                if dst_pos is not None:
+                    src_list.append(src_pos)
+                    dst_list.append(dst_pos)
+                    weight_list.append(edge_weight if isinstance(edge_weight, (int, float)) else np.nan)
+        src = np.array(src_list, dtype=np.int64)
+        dst = np.array(dst_list, dtype=np.int64)
+        weight = np.array(weight_list, dtype=np.float64)
+
+    keep = (src < n) & (dst < n)
+    weight = np.where(np.isnan(weight), 1.0, np.maximum(weight, 0.0))
+    return src[keep], dst[keep], weight[keep]
+
+
+def pagerank(src, dst, weight, n):
+    """加权 PageRank；没有出边（或出边权重全为 0）的节点把得分均分给所有节点"""
+    out_weight = np.bincount(src, weights=weight, minlength=n)
+    dangling = out_weight == 0
+    share = weight / np.where(dangling, 1.0, out_weight)[src]
+    rank = np.full(n, 1.0 / n)
+    for _ in range(PAGERANK_MAX_ITERATIONS):
+        spread = np.bincount(dst, weights=rank[src] * share, minlength=n)
+        new_rank = (1 - DAMPING) / n + DAMPING * (spread + rank[dangling].sum() / n)
+        delta = np.abs(new_rank - rank).sum()
+        rank = new_rank
+        if delta < PAGERANK_TOLERANCE:
+            break
+    return rank
+
+
+def _neighbor_csr(src, dst, n):
+    """无向邻接的 CSR：去掉自环和重复边"""
+    # 排序后去重；np.unique 在 NumPy 2 中按哈希去重，大数组上慢得多
+    pairs = np.concatenate([src * n + dst, dst * n + src])
+    pairs.sort()
+    keep = np.empty(len(pairs), dtype=bool)
+    keep[:1] = True
+    np.not_equal(pairs[1:], pairs[:-1], out=keep[1:])
+    pairs = pairs[keep & (pairs // n != pairs % n)]
+    heads = pairs // n
+    offsets = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(heads, minlength=n), out=offsets[1:])
+    return offsets, pairs % n
+
+
+def _expand(offsets, neighbors, frontier):
+    """frontier 中各节点的全部邻接边，返回 (起点数组, 终点数组)"""
+    starts = offsets[frontier]
+    counts = offsets[frontier + 1] - starts
+    ends = np.cumsum(counts)
+    edge_pos = np.arange(ends[-1] if len(ends) else 0) - np.repeat(ends - counts - starts, counts)
+    return np.repeat(frontier, counts), neighbors[edge_pos]
+
+
+def betweenness(src, dst, n, samples=BETWEENNESS_SAMPLES, seed=0):
+    """抽样 Brandes 介数（无向），节点数不超过 samples 时为精确值"""
+    result = np.zeros(n)
+    if n < 3:
+        return result
+    offsets, neighbors = _neighbor_csr(src, dst, n)
+    rng = np.random.default_rng(seed)
+    sources = np.arange(n) if n <= samples else rng.choice(n, samples, replace=False)
+
+    for source in sources:
+        dist = np.full(n, -1, dtype=np.int64)
+        sigma = np.zeros(n)
+        dist[source] = 0
+        sigma[source] = 1.0
+        frontier = np.array([source], dtype=np.int64)
+        # 每层记录连接相邻两层的最短路径边，供反向累加依赖
+        levels = []
+        depth = 0
+        while len(frontier):
+            heads, tails = _expand(offsets, neighbors, frontier)
+            tail_dist = dist[tails]
+            fresh = tail_dist < 0
+            dist[tails[fresh]] = depth + 1
+            on_path = fresh | (tail_dist == depth + 1)
+            heads = heads[on_path]
+            tails = tails[on_path]
+            sigma += np.bincount(tails, weights=sigma[heads], minlength=n)
+            levels.append((heads, tails))
+            depth += 1
+            frontier = np.flatnonzero(dist == depth)
+
+        delta = np.zeros(n)
+        for heads, tails in reversed(levels):
+            delta += np.bincount(heads, weights=sigma[heads] / sigma[tails] * (1 + delta[tails]), minlength=n)
+        delta[source] = 0
+        result += delta
+
+    # 无向图中每对节点被两端各统计一次
+    return result * (n / len(sources)) / ((n - 1) * (n - 2))
+
+
+class Centrality:
+    """某一版本图数据的中心性指标，各指标为按概念位置索引的数组"""
+
+    def __init__(self, graph):
+        if np is None:
+            raise RuntimeError("中心性计算需要安装 numpy")
+        n = len(graph)
+        src, dst, weight = _edge_arrays(graph, n)
+        self.degree = np.bincount(src, minlength=n) + np.bincount(dst, minlength=n)
+        self.weighted_degree = np.bincount(src, weights=weight, minlength=n) + \
+            np.bincount(dst, weights=weight, minlength=n)
+        # 每条关系在两个方向上各算一次
+        self.pagerank = pagerank(np.concatenate([src, dst]), np.concatenate([dst, src]),
+                                 np.concatenate([weight, weight]), n) if n else np.zeros(0)
+        self.betweenness = betweenness(src, dst, n)
+        # 按 PageRank 从高到低的全部位置，得分相同时保持加载顺序
+        self.order = np.argsort(-self.pagerank, kind="stable")
+        self.rank = np.empty(n, dtype=np.int64)
+        self.rank[self.order] = np.arange(n)
+
+    def metrics(self, position):
+        return {
+            "degree": int(self.degree[position]),
+            "weighted_degree": float(self.weighted_degree[position]),
+            "pagerank": float(self.pagerank[position]),
+            "betweenness": float(self.betweenness[position])
+        }
+
+    def ranked(self, positions, after=None):
+        """把 positions 按中心性从高到低排列，返回位置数组；after 为游标所在位置时只返回排在它之后的部分"""
+        if isinstance(positions, range) and len(positions) == len(self.order):
+            ranked = self.order
+        else:
+            positions = np.asarray(positions, dtype=np.int64)
+            ranked = positions[np.argsort(self.rank[positions], kind="stable")]
+        if after is None:
+            return ranked
+        return ranked[np.searchsorted(self.rank[ranked], self.rank[after], side="right"):]
@@ -0,0 +1,68 @@
+# coding: utf-8
+
+
+class ConflictError(Exception):
+    """要新增的概念或关系已存在"""
+
+
+def relation_key(relation):
+    return relation.get("src_id"), relation.get("dst_id"), relation.get("relation_type")
+
+
+class GraphData:
+    """可变的图数据主副本，是写操作的作用对象
+
+    概念按ID、关系按 (src_id, dst_id, relation_type) 存入保持插入顺序的 dict，
+    另为每个概念记下与它相连的关系键，删除概念时级联删除关系为 O(度)。
+    写操作以幂等的 put/delete 记录表示（见 apply），在线修改和回放写日志走同一条路径，
+    同一段日志回放多次得到相同的结果。
+    单个概念、关系对象只整体替换、不原地修改，因此可以与已发布的快照共享。
+    """
+
+    def __init__(self, concepts, relations):
+        self.concepts = {}
+        self.relations = {}
+        self.node_relations = {}
+        for concept in concepts:
+            concept_id = concept.get("id")
+            if concept_id is not None and concept_id not in self.concepts:
+                self.concepts[concept_id] = concept
+        for relation in relations:
+            self._put_relation(relation)
+
+    def lists(self):
+        """返回 (概念列表, 关系列表)，供构建快照或写出数据文件"""
+        return list(self.concepts.values()), list(self.relations.values())
+
+    def apply(self, record):
+        op = record["op"]
+        if op == "put_concept":
+            concept = record["concept"]
+            self.concepts[concept["id"]] = concept
+        elif op == "delete_concept":
+            concept_id = record["id"]
+            self.concepts.pop(concept_id, None)
+            for key in list(self.node_relations.get(concept_id, ())):
+                self._delete_relation(key)
+        elif op == "put_relation":
+            self._put_relation(record["relation"])
+        elif op == "delete_relation":
+            self._delete_relation(tuple(record["key"]))
+        else:
+            raise ValueError(f"未知的写操作: {op}")
+
+    def _put_relation(self, relation):
+        key = relation_key(relation)
+        self.relations[key] = relation
+        for concept_id in key[:2]:
+            self.node_relations.setdefault(concept_id, set()).add(key)
+
+    def _delete_relation(self, key):
+        if self.relations.pop(key, None) is None:
+            return
+        for concept_id in key[:2]:
+            keys = self.node_relations.get(concept_id)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.node_relations[concept_id]
@@ -0,0 +1,171 @@
+# coding: utf-8
+"""服务端预计算的概念图布局
+
+以 Fruchterman-Reingold 力导向算法计算节点坐标，全部用 NumPy 向量化：
+- 初始位置按五位分扇区：属于色法、心法等分类的概念放在对应扇区的外圈，
+  名为五位之一的概念（如分类"五位"下的"色法"）放在该扇区的内圈，核心概念在中心
+- 每轮迭代计算节点间斥力、沿边的引力，以及把节点拉向所属扇区锚点的弹力，
+  使布局保持五位的分区结构；步长随温度线性递减
+- 节点数不超过 EXACT_REPULSION_LIMIT 时精确计算两两斥力（分块广播），
+  否则把节点划入网格，以各网格的质心和节点数近似远处节点的斥力
+结果坐标缩放到 [0, LAYOUT_SIZE] 区间。
+"""
+import zlib
+import math
+
+try:
+    import numpy as np
+except ImportError:  # numpy 为可选依赖，未安装时布局接口不可用
+    np = None
+
+# 五位的次序，决定各扇区的方位
+FIVE_POSITIONS = ("色法", "心法", "心所法", "心不相应行法", "无为法")
+LAYOUT_SIZE = 1000.0
+ITERATIONS = 50
+EXACT_REPULSION_LIMIT = 1000
+GRID_SIZE = 16
+# 扇区锚点半径（布局在 [-1, 1] 坐标系中进行）
+INNER_RADIUS = 0.35
+OUTER_RADIUS = 0.75
+OTHER_RADIUS = 0.95
+ANCHOR_STRENGTH = 0.15
+# 分块计算斥力时每块的最大元素数，限制临时数组的内存
+_BLOCK_ELEMENTS = 500000
+
+
+def _sector_angle(index, count):
+    return 2 * math.pi * index / count - math.pi / 2
+
+
+def _anchor(concept):
+    """按五位层级给出概念的锚点坐标"""
+    category = concept.get("category")
+    name = concept.get("name")
+    if category in FIVE_POSITIONS:
+        angle = _sector_angle(FIVE_POSITIONS.index(category), len(FIVE_POSITIONS))
+        radius = OUTER_RADIUS
+    elif name in FIVE_POSITIONS:
+        angle = _sector_angle(FIVE_POSITIONS.index(name), len(FIVE_POSITIONS))
+        radius = INNER_RADIUS
+    elif category and category not in ("核心概念", "五位"):
+        # 五位以外的分类按名称哈希分散在最外圈，结果与加载顺序无关
+        angle = _sector_angle(zlib.crc32(category.encode("utf-8")) % 360, 360)
+        radius = OTHER_RADIUS
+    else:
+        return 0.0, 0.0
+    return radius * math.cos(angle), radius * math.sin(angle)
+
+
+def _repulsion_from(pos, points, mass, k2):
+    """pos 中每个节点受 points（各点质量为 mass）的斥力之和，按行分块计算"""
+    force = np.empty_like(pos)
+    px = points[:, 0]
+    py = points[:, 1]
+    block = max(1, _BLOCK_ELEMENTS // len(points))
+    for start in range(0, len(pos), block):
+        dx = pos[start:start + block, 0, None] - px
+        dy = pos[start:start + block, 1, None] - py
+        scale = mass / (dx * dx + dy * dy + 1e-9)
+        force[start:start + block, 0] = (dx * scale).sum(axis=1)
+        force[start:start + block, 1] = (dy * scale).sum(axis=1)
+    return force * k2
+
+
+def _exact_repulsion(pos, k2):
+    return _repulsion_from(pos, pos, 1.0, k2)
+
+
+def _grid_repulsion(pos, k2):
+    """以网格质心近似斥力：每个节点受各非空网格（质心、节点数）的斥力"""
+    lo = pos.min(axis=0)
+    span = np.maximum(pos.max(axis=0) - lo, 1e-9)
+    cells = np.minimum((pos - lo) / span * GRID_SIZE, GRID_SIZE - 1).astype(np.int64)
+    cell = cells[:, 0] * GRID_SIZE + cells[:, 1]
+    counts = np.bincount(cell, minlength=GRID_SIZE * GRID_SIZE)
+    occupied = counts > 0
+    mass = counts[occupied].astype(float)
+    centroids = np.stack([
+        np.bincount(cell, weights=pos[:, 0], minlength=GRID_SIZE * GRID_SIZE)[occupied] / mass,
+        np.bincount(cell, weights=pos[:, 1], minlength=GRID_SIZE * GRID_SIZE)[occupied] / mass,
+    ], axis=1)
+
+    return _repulsion_from(pos, centroids, mass, k2)
+
+
+def compute_layout(graph, category=None, iterations=ITERATIONS, seed=0):
+    """计算 category 下（为空时为全部）概念的布局
+
+    返回 {"nodes": [{id, name, category, x, y}], "edges": [{source, target, type}]}，
+    只包含两端都在布局内的边。同样的图和参数总是得到同样的坐标。
+    """
+    if np is None:
+        raise RuntimeError("布局计算需要安装 numpy")
+
+    concepts = graph.concepts(category)
+    index = {}
+    nodes = []
+    for concept in concepts:
+        concept_id = concept.get("id")
+        if concept_id is not None and concept_id not in index:
+            index[concept_id] = len(nodes)
+            nodes.append(concept)
+
+    edges = []
+    src = []
+    dst = []
+    for i, concept in enumerate(nodes):
+        for target_id, relation_type, _ in graph.edges(concept["id"], "out"):
+            j = index.get(target_id)
+            if j is not None and j != i:
+                edges.append({"source": concept["id"], "target": target_id, "type": relation_type})
+                src.append(i)
+                dst.append(j)
+
+    n = len(nodes)
+    if n == 0:
+        return {"nodes": [], "edges": []}
+
+    rng = np.random.default_rng(seed)
+    anchors = np.array([_anchor(concept) for concept in nodes], dtype=float)
+    pos = anchors + rng.normal(scale=0.1, size=(n, 2))
+    src = np.array(src, dtype=np.int64)
+    dst = np.array(dst, dtype=np.int64)
+
+    # 理想边长：布局面积（边长为 2 的正方形）平均分给每个节点
+    k = math.sqrt(4.0 / n)
+    k2 = k * k
+    repulsion = _exact_repulsion if n <= EXACT_REPULSION_LIMIT else _grid_repulsion
+    temperature = 0.1
+    for step in range(iterations):
+        disp = repulsion(pos, k2)
+        if len(src):
+            delta = pos[dst] - pos[src]
+            dist = np.sqrt(np.einsum("ij,ij->i", delta, delta)) + 1e-9
+            pull = delta * (dist / k)[:, None]
+            for axis in (0, 1):
+                disp[:, axis] += np.bincount(src, weights=pull[:, axis], minlength=n)
+                disp[:, axis] -= np.bincount(dst, weights=pull[:, axis], minlength=n)
+        disp += (anchors - pos) * (ANCHOR_STRENGTH * n * k)
+
+        # 每个节点的位移不超过当前温度
+        length = np.sqrt(np.einsum("ij,ij->i", disp, disp)) + 1e-9
+        step_length = np.minimum(length, temperature * (1 - step / iterations))
+        pos += disp * (step_length / length)[:, None]
+
+    lo = pos.min(axis=0)
+    scale = LAYOUT_SIZE / max(float((pos.max(axis=0) - lo).max()), 1e-9)
+    pos = (pos - lo) * scale
+
+    return {
+        "nodes": [
+            {
+                "id": concept["id"],
+                "name": concept.get("name"),
+                "category": concept.get("category"),
+                "x": round(float(x), 1),
+                "y": round(float(y), 1)
+            }
+            for concept, (x, y) in zip(nodes, pos)
+        ],
+        "edges": edges
+    }
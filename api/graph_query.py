@@ -0,0 +1,272 @@
+# coding: utf-8
+import time
+import heapq
+from collections import deque
+
+DIRECTIONS = ("out", "in", "both")
+MAX_DEPTH = 6
+MAX_LIMIT = 5000
+MAX_PATH_LENGTH = 10
+MAX_PATHS = 10
+
+_REVERSE = {"out": "in", "in": "out", "both": "both"}
+
+
+class QueryBudgetExceeded(Exception):
+    """单次查询展开的节点数或耗时超过预算"""
+
+
+class ExpansionBudget:
+    """单次查询的展开预算，防止一个查询长时间占用工作进程
+
+    每展开一个节点调用一次 spend()；超过节点数上限或截止时间时抛出 QueryBudgetExceeded。
+    """
+
+    def __init__(self, max_expansions=100000, timeout=None):
+        self.max_expansions = max_expansions
+        self.deadline = time.monotonic() + timeout if timeout else None
+        self.used = 0
+
+    def spend(self):
+        self.used += 1
+        if self.used > self.max_expansions:
+            raise QueryBudgetExceeded(f"展开节点数超过上限 {self.max_expansions}")
+        # 每256次展开检查一次时间，避免频繁调用时钟
+        if self.deadline is not None and not self.used & 0xFF and time.monotonic() > self.deadline:
+            raise QueryBudgetExceeded("查询超时")
+
+
+def iter_edges(graph, concept_id, direction, types=None):
+    """按方向遍历邻接边，产出 (邻居ID, 关系类型, 权重, 源ID, 目标ID)"""
+    if direction in ("out", "both"):
+        for other_id, relation_type, weight in graph.edges(concept_id, "out"):
+            if types is None or relation_type in types:
+                yield other_id, relation_type, weight, concept_id, other_id
+    if direction in ("in", "both"):
+        for other_id, relation_type, weight in graph.edges(concept_id, "in"):
+            if types is None or relation_type in types:
+                yield other_id, relation_type, weight, other_id, concept_id
+
+
+def _node_payload(concept, depth):
+    return {
+        "id": concept.get("id"),
+        "name": concept.get("name"),
+        "category": concept.get("category"),
+        "depth": depth
+    }
+
+
+def neighborhood(graph, concept_id, depth=1, direction="out", types=None, limit=200):
+    """从 concept_id 出发做有界广度优先搜索
+
+    最多展开 depth 层、收录 limit 个节点；types 为关系类型集合，None 表示不过滤。
+    返回 {"nodes": [...], "edges": [...], "truncated": bool}，起点不存在时返回 None。
+    edges 只包含两端都已收录的边，每条边只出现一次。
+    """
+    root = graph.concept(concept_id)
+    if root is None:
+        return None
+
+    nodes = [_node_payload(root, 0)]
+    visited = {concept_id}
+    edges = []
+    seen_edges = set()
+    truncated = False
+    frontier = deque([(concept_id, 0)])
+
+    while frontier:
+        current_id, current_depth = frontier.popleft()
+        if current_depth >= depth:
+            continue
+
+        for other_id, relation_type, weight, src_id, dst_id in iter_edges(graph, current_id, direction, types):
+            if other_id not in visited:
+                if len(nodes) >= limit:
+                    truncated = True
+                    continue
+                other = graph.concept(other_id)
+                if other is None:
+                    continue
+                visited.add(other_id)
+                nodes.append(_node_payload(other, current_depth + 1))
+                frontier.append((other_id, current_depth + 1))
+
+            edge_key = (src_id, dst_id, relation_type)
+            if edge_key not in seen_edges:
+                seen_edges.add(edge_key)
+                edges.append({
+                    "source": src_id,
+                    "target": dst_id,
+                    "type": relation_type,
+                    "weight": weight
+                })
+
+    return {"nodes": nodes, "edges": edges, "truncated": truncated}
+
+
+def shortest_path(graph, source_id, target_id, max_len, direction="both", types=None,
+                  budget=None, banned_nodes=(), banned_hops=()):
+    """双向广度优先搜索最短路径
+
+    两端交替展开当前较小的前沿，每次展开完整一层；两端相遇后在该层内取最短的汇合点，
+    两端层数之和达到 max_len 时提前结束。banned_nodes / banned_hops 供 k 最短路径使用，
+    hop 以 (起点, 终点, 关系类型) 表示路径上的一步。
+    返回 (节点ID列表, 步列表)，步为 (起点, 终点, 关系类型, 权重, 源ID, 目标ID)；不可达时返回 None。
+    """
+    if budget is None:
+        budget = ExpansionBudget()
+    if source_id == target_id:
+        return [source_id], []
+
+    # 每个已访问节点记录 (距离, 父节点, 关系类型, 权重, 源ID, 目标ID)
+    forward = {source_id: (0, None, None, None, None, None)}
+    backward = {target_id: (0, None, None, None, None, None)}
+    forward_frontier = [source_id]
+    backward_frontier = [target_id]
+    forward_depth = backward_depth = 0
+
+    while forward_frontier and backward_frontier and forward_depth + backward_depth < max_len:
+        is_forward = len(forward_frontier) <= len(backward_frontier)
+        if is_forward:
+            frontier, visited, opposite = forward_frontier, forward, backward
+            step_direction = direction
+        else:
+            frontier, visited, opposite = backward_frontier, backward, forward
+            step_direction = _REVERSE[direction]
+
+        next_frontier = []
+        best = None
+        for node in frontier:
+            budget.spend()
+            distance = visited[node][0] + 1
+            for other_id, relation_type, weight, src_id, dst_id in iter_edges(graph, node, step_direction, types):
+                if other_id in visited or other_id in banned_nodes or other_id not in graph:
+                    continue
+                hop = (node, other_id, relation_type) if is_forward else (other_id, node, relation_type)
+                if hop in banned_hops:
+                    continue
+                visited[other_id] = (distance, node, relation_type, weight, src_id, dst_id)
+                next_frontier.append(other_id)
+                if other_id in opposite:
+                    total = distance + opposite[other_id][0]
+                    if best is None or total < best[0]:
+                        best = (total, other_id)
+
+        if is_forward:
+            forward_frontier = next_frontier
+            forward_depth += 1
+        else:
+            backward_frontier = next_frontier
+            backward_depth += 1
+
+        if best is not None and best[0] <= max_len:
+            return _join_path(forward, backward, best[1])
+
+    return None
+
+
+def _join_path(forward, backward, meeting_id):
+    """由两端的父指针拼出完整路径"""
+    nodes = [meeting_id]
+    hops = []
+    node = meeting_id
+    while forward[node][1] is not None:
+        _, parent, relation_type, weight, src_id, dst_id = forward[node]
+        hops.append((parent, node, relation_type, weight, src_id, dst_id))
+        nodes.append(parent)
+        node = parent
+    nodes.reverse()
+    hops.reverse()
+
+    node = meeting_id
+    while backward[node][1] is not None:
+        _, parent, relation_type, weight, src_id, dst_id = backward[node]
+        hops.append((node, parent, relation_type, weight, src_id, dst_id))
+        nodes.append(parent)
+        node = parent
+    return nodes, hops
+
+
+def k_shortest_paths(graph, source_id, target_id, k, max_len, direction="both", types=None, budget=None):
+    """Yen 算法求前 k 条无环最短路径，每条偏离路径由双向 BFS 求得
+
+    返回的路径按长度升序排列；预算耗尽时抛出 QueryBudgetExceeded，已找到的路径保存在 found 列表中
+    （通过异常的 found 属性取得）。
+    """
+    if budget is None:
+        budget = ExpansionBudget()
+    found = []
+    try:
+        first = shortest_path(graph, source_id, target_id, max_len, direction, types, budget)
+        if first is None:
+            return found
+        found.append(first)
+
+        candidates = []
+        seen = {_path_key(first)}
+        counter = 0
+        while len(found) < k:
+            prev_nodes, prev_hops = found[-1]
+            for i in range(len(prev_nodes) - 1):
+                spur_id = prev_nodes[i]
+                root_nodes = prev_nodes[:i + 1]
+                banned_hops = {hops[i][:3] for nodes, hops in found if nodes[:i + 1] == root_nodes}
+                spur = shortest_path(graph, spur_id, target_id, max_len - i, direction, types, budget,
+                                     banned_nodes=set(root_nodes[:-1]), banned_hops=banned_hops)
+                if spur is None:
+                    continue
+                path = (root_nodes[:-1] + spur[0], prev_hops[:i] + spur[1])
+                key = _path_key(path)
+                if key not in seen:
+                    seen.add(key)
+                    counter += 1
+                    heapq.heappush(candidates, (len(path[1]), counter, path))
+            if not candidates:
+                break
+            found.append(heapq.heappop(candidates)[2])
+    except QueryBudgetExceeded as e:
+        e.found = found
+        raise
+    return found
+
+
+def _path_key(path):
+    return tuple(hop[:3] for hop in path[1])
+
+
+def _path_payload(graph, path):
+    nodes, hops = path
+    return {
+        "length": len(hops),
+        "nodes": [_node_payload(graph.concept(node_id), depth) for depth, node_id in enumerate(nodes)],
+        "edges": [
+            {"source": src_id, "target": dst_id, "type": relation_type, "weight": weight}
+            for _, _, relation_type, weight, src_id, dst_id in hops
+        ]
+    }
+
+
+def find_paths(graph, source_id, target_id, k=1, max_len=6, direction="both", types=None,
+               max_expansions=100000, timeout=None):
+    """查询两个概念之间的最短路径（k>1 时为前 k 条）
+
+    返回 {"paths": [...], "truncated": bool}，任一端点不存在时返回 None。
+    预算耗尽时返回已找到的路径并将 truncated 置为 true。
+    """
+    if source_id not in graph or target_id not in graph:
+        return None
+
+    budget = ExpansionBudget(max_expansions, timeout)
+    truncated = False
+    try:
+        paths = k_shortest_paths(graph, source_id, target_id, k, max_len, direction, types, budget)
+    except QueryBudgetExceeded as e:
+        paths = e.found
+        truncated = True
+
+    return {
+        "paths": [_path_payload(graph, path) for path in paths],
+        "truncated": truncated,
+        "expanded": budget.used
+    }
@@ -0,0 +1,1179 @@
+# coding: utf-8
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from bisect import bisect_right, insort
+from itertools import islice
+
+from compact_graph import CompactGraph
+from graph_centrality import Centrality, available as centrality_available
+from graph_data import GraphData, ConflictError, relation_key
+from graph_layout import compute_layout
+from graph_query import neighborhood, find_paths
+from mapped_graph import write_mapped, read_mapped_version, open_mapped
+from result_cache import ResultCache
+from search_index import SearchIndex
+from snapshot_file import load_snapshot, write_snapshot
+from write_log import WriteLog, read_log
+
+logger = logging.getLogger(__name__)
+
+# 存储模式：indexed 为 dict 索引（默认），compact 为数组化紧凑表示（只读），
+# mapped 为多个进程共享的内存映射文件（只读）
+STORE_MODES = ("indexed", "compact", "mapped")
+
+# 写日志文件名；合并进数据文件期间，旧日志改名为 .compacting
+WRITE_LOG_NAME = "changes.log"
+# 二进制快照文件名，保存建好的索引以加快启动
+SNAPSHOT_FILE_NAME = "graph.snapshot"
+# mapped 模式的映射文件名，按数据版本区分，各工作进程映射同一版本的同一个文件
+MAPPED_FILE_PATTERN = "graph.{version}.map"
+# 一批写入的记录数超过概念数的该比例时整体重建快照，否则在已发布的快照上增量更新
+INCREMENTAL_MAX_FRACTION = 0.1
+
+
+class GraphIndex:
+    """概念图的内存索引
+
+    加载时一次性建立 id→概念、src→出边、dst→入边、category→概念 四组索引，
+    概念详情为 O(度)，按分类列出概念为 O(该类概念数)，获取分类为 O(分类数)。
+    概念按加载顺序编号，分类索引保存该顺序下的位置，便于游标分页。
+    写入后以 updated() 得到新索引，只替换涉及的概念和边列表，其余部分与原索引共用。
+    """
+
+    def __init__(self, concepts, relations):
+        self.out_edges = {}
+        self.in_edges = {}
+        self.relation_count = 0
+        self._index_concepts(concepts)
+
+        for relation in relations:
+            src_id = relation.get("src_id")
+            dst_id = relation.get("dst_id")
+            relation_type = relation.get("relation_type")
+            weight = relation.get("weight")
+            self.out_edges.setdefault(src_id, []).append((dst_id, relation_type, weight))
+            self.in_edges.setdefault(dst_id, []).append((src_id, relation_type, weight))
+            self.relation_count += 1
+
+    def _index_concepts(self, concepts):
+        self.all_concepts = concepts
+        self.concept_by_id = {}
+        self.order = []
+        self.position = {}
+        self.category_positions = {}
+
+        for concept in concepts:
+            concept_id = concept.get("id")
+            # 重复ID以第一次出现的概念为准，与原先线性查找的行为一致
+            if concept_id is None or concept_id in self.concept_by_id:
+                continue
+            self.concept_by_id[concept_id] = concept
+            self.position[concept_id] = len(self.order)
+            self.order.append(concept_id)
+
+            category = concept.get("category")
+            if category:
+                self.category_positions.setdefault(category, []).append(self.position[concept_id])
+
+    def updated(self, concepts, concept_changes, relation_changes, removed=False, appended=()):
+        """返回应用了一批写入的新索引，本索引不变
+
+        concepts 为写入后的全部概念（顺序与 GraphData 一致），concept_changes 为 {概念ID: 写入后的概念，已删除为 None}，
+        relation_changes 为 {(src_id, dst_id, relation_type): 写入后的关系，已删除为 None}。
+        appended 为这批写入中新增（包括删除后再新增）的关系键，这些边按 relation_changes 的顺序排到边列表末尾，
+        与 GraphData 中的顺序一致；其余已有的边原位替换。
+        顶层字典浅复制，只替换涉及的概念和边列表。removed 为真（这批写入删除过概念）时其后概念的位置都会变化，
+        概念部分按 concepts 重建。
+        """
+        index = GraphIndex.__new__(GraphIndex)
+        if removed:
+            index._index_concepts(concepts)
+        else:
+            index.all_concepts = concepts
+            index.concept_by_id = dict(self.concept_by_id)
+            index.order = list(self.order)
+            index.position = dict(self.position)
+            index.category_positions = dict(self.category_positions)
+            recategorized = False
+            for concept_id, concept in concept_changes.items():
+                old = index.concept_by_id.get(concept_id)
+                index.concept_by_id[concept_id] = concept
+                if old is None:
+                    position = index.position[concept_id] = len(index.order)
+                    index.order.append(concept_id)
+                    old_category = None
+                else:
+                    position = index.position[concept_id]
+                    old_category = old.get("category")
+                category = concept.get("category")
+                if category == old_category:
+                    continue
+                recategorized = True
+                if old_category:
+                    positions = [p for p in index.category_positions[old_category] if p != position]
+                    if positions:
+                        index.category_positions[old_category] = positions
+                    else:
+                        del index.category_positions[old_category]
+                if category:
+                    positions = list(index.category_positions.get(category, ()))
+                    insort(positions, position)
+                    index.category_positions[category] = positions
+            if recategorized:
+                # 分类列表按各分类第一个概念的位置排列，与从头建立索引时一致
+                index.category_positions = dict(sorted(index.category_positions.items(), key=lambda item: item[1][0]))
+
+        index.out_edges = dict(self.out_edges)
+        index.in_edges = dict(self.in_edges)
+        index.relation_count = self.relation_count
+        by_src = {}
+        by_dst = {}
+        for key, relation in relation_changes.items():
+            by_src.setdefault(key[0], {})[key] = relation
+            by_dst.setdefault(key[1], {})[key] = relation
+        for src_id, changes in by_src.items():
+            old_edges = self.out_edges.get(src_id, [])
+            edges = _updated_edges(old_edges, changes, appended, lambda edge: (src_id, edge[0], edge[1]),
+                                   lambda relation: (relation["dst_id"], relation["relation_type"], relation.get("weight")))
+            index.relation_count += len(edges) - len(old_edges)
+            _set_edges(index.out_edges, src_id, edges)
+        for dst_id, changes in by_dst.items():
+            edges = _updated_edges(self.in_edges.get(dst_id, []), changes, appended, lambda edge: (edge[0], dst_id, edge[1]),
+                                   lambda relation: (relation["src_id"], relation["relation_type"], relation.get("weight")))
+            _set_edges(index.in_edges, dst_id, edges)
+        return index
+
+    def __len__(self):
+        return len(self.concept_by_id)
+
+    def __contains__(self, concept_id):
+        return concept_id in self.concept_by_id
+
+    def concept(self, concept_id):
+        return self.concept_by_id.get(concept_id)
+
+    def concepts(self, category=None):
+        if category:
+            return [self.concept_by_id[self.order[p]] for p in self.category_positions.get(category, [])]
+        return self.all_concepts
+
+    def iter_concepts(self, category=None, after=None):
+        """按加载顺序遍历概念；after 为游标（上一页最后一个概念的ID），未知游标抛出 KeyError"""
+        positions = self.category_positions.get(category, []) if category else range(len(self.order))
+        start = 0
+        if after is not None:
+            start = bisect_right(positions, self.position[after])
+        return (self.concept_by_id[self.order[positions[i]]] for i in range(start, len(positions)))
+
+    def categories(self):
+        return list(self.category_positions)
+
+    def positions(self, category=None):
+        """category 下（为空时为全部）概念的位置（加载顺序下标），按升序排列"""
+        return self.category_positions.get(category, []) if category else range(len(self.order))
+
+    def concept_position(self, concept_id):
+        return self.position.get(concept_id)
+
+    def concept_at(self, position):
+        return self.concept_by_id[self.order[position]]
+
+    def edges(self, concept_id, direction="out"):
+        """返回 (另一端概念ID, 关系类型, 权重) 列表"""
+        if direction == "in":
+            return self.in_edges.get(concept_id, [])
+        return self.out_edges.get(concept_id, [])
+
+
+def _updated_edges(edges, changes, appended, key_of, edge_of):
+    """在边列表上应用 changes（{关系键: 关系或 None}）：已有的边原位替换或删除，
+    新增的边和 appended 中的边按 changes 的顺序追加在末尾"""
+    result = []
+    seen = set()
+    for edge in edges:
+        key = key_of(edge)
+        if key not in changes:
+            result.append(edge)
+        elif key not in seen and key not in appended:
+            seen.add(key)
+            if changes[key] is not None:
+                result.append(edge_of(changes[key]))
+    for key, relation in changes.items():
+        if key not in seen and relation is not None:
+            result.append(edge_of(relation))
+    return result
+
+
+def _set_edges(edges_by_node, concept_id, edges):
+    if edges:
+        edges_by_node[concept_id] = edges
+    else:
+        edges_by_node.pop(concept_id, None)
+
+
+def _types_key(types):
+    """关系类型过滤条件的规范形式，用作缓存键"""
+    return None if types is None else tuple(sorted(types))
+
+
+class GraphSnapshot:
+    """某一版本图数据的只读快照：图索引、检索索引和版本信息
+
+    快照建好后不再修改。重新加载时在后台构建新快照，再通过一次属性赋值整体替换，
+    正在处理的请求继续使用它开始时取得的旧快照，读路径不需要加锁。
+    """
+
+    def __init__(self, concepts, relations, mode, version, last_modified, seq=0):
+        if mode == "compact":
+            self.graph = CompactGraph(concepts, relations)
+            # 紧凑模式不保留原始 dict 列表，数据只存在于数组中
+            self.concepts = None
+            self.relations = None
+        else:
+            self.graph = GraphIndex(concepts, relations)
+            self.concepts = concepts
+            self.relations = relations
+        self.search_index = SearchIndex(self.graph.concepts())
+        self.version = version
+        self.last_modified = last_modified
+        # 快照已包含的最后一条写日志记录的序号
+        self.seq = seq
+
+    def updated(self, concepts, relations, concept_changes, relation_changes, removed, appended, version, last_modified,
+                seq, reindex_graph=False):
+        """在本快照（indexed 模式）上应用一批写入，返回新快照，本快照不变
+
+        concepts / relations 为写入后的全部概念和关系，其余参数见 GraphIndex.updated。
+        图索引和检索索引都只更新涉及的部分，代价与写入的规模而不是图的规模成正比；
+        reindex_graph 为真时图索引按 concepts / relations 重建。
+        """
+        snapshot = GraphSnapshot.__new__(GraphSnapshot)
+        if reindex_graph:
+            snapshot.graph = GraphIndex(concepts, relations)
+        else:
+            snapshot.graph = self.graph.updated(concepts, concept_changes, relation_changes, removed, appended)
+        snapshot.search_index = self.search_index.updated(
+            [(self.graph.concept(concept_id), concept) for concept_id, concept in concept_changes.items()], concepts)
+        snapshot.concepts = concepts
+        snapshot.relations = relations
+        snapshot.version = version
+        snapshot.last_modified = last_modified
+        snapshot.seq = seq
+        return snapshot
+
+    @classmethod
+    def mapped(cls, path, version, last_modified, seq=0):
+        """以映射文件构建快照，图和检索索引都不占用进程私有内存"""
+        snapshot = cls.__new__(cls)
+        snapshot.graph, snapshot.search_index = open_mapped(path)
+        snapshot.concepts = None
+        snapshot.relations = None
+        snapshot.version = version
+        snapshot.last_modified = last_modified
+        snapshot.seq = seq
+        return snapshot
+
+
+# 文件图存储实现
+class FileGraphStore:
+    """基于 JSON 文件的图存储
+
+    concepts.json / relations.json 是数据的基线，写操作不重写这两个文件，而是以幂等记录
+    追加到写日志 changes.log（组提交，批量 fsync），再作用到内存中的可变主副本；
+    后台线程把短时间内的多次写入合并后构建新快照并原子替换。加载时先读数据文件再回放写日志。
+    日志达到 compact_threshold 条记录时在后台合并：先把日志转存为 .compacting，
+    再把当前数据写入临时文件并以原子改名替换数据文件，最后删除转存的日志。
+    binary_snapshot=True 时，从 JSON 构建快照后把它另存为二进制快照文件，
+    之后数据版本不变的启动直接载入该文件。
+    写日志只能由一个进程写入，多个工作进程共享数据目录时以 read_only=True 打开。
+    邻域、路径和过滤后的概念列表查询结果缓存在 result_cache 中（总量不超过 result_cache_bytes，
+    为 0 时不缓存），发布新快照时清空。
+    precompute=True 时每次发布新快照后在后台线程中计算中心性和布局（全图以及上一版本请求过的分类），
+    算好之前概念详情不带中心性字段；为 False 时只在显式调用 get_centrality / get_layout 时计算。
+    """
+
+    def __init__(self, data_dir="./graph_data", mode="indexed", fsync=True,
+                 compact_threshold=10000, rebuild_delay=0.5, binary_snapshot=False, read_only=False,
+                 result_cache_bytes=64 * 1024 * 1024, precompute=True):
+        if mode not in STORE_MODES:
+            raise ValueError(f"未知的存储模式: {mode}，可选: {', '.join(STORE_MODES)}")
+        self.data_dir = data_dir
+        self.mode = mode
+        self.fsync = fsync
+        self.compact_threshold = compact_threshold
+        self.rebuild_delay = rebuild_delay
+        self.read_only = read_only
+        self.precompute = precompute
+        os.makedirs(data_dir, exist_ok=True)
+        self.concepts_file = os.path.join(data_dir, "concepts.json")
+        self.relations_file = os.path.join(data_dir, "relations.json")
+        self.log_file = os.path.join(data_dir, WRITE_LOG_NAME)
+        self.compacting_log_file = self.log_file + ".compacting"
+        self.snapshot_file = os.path.join(data_dir, SNAPSHOT_FILE_NAME) if binary_snapshot else None
+        # 写锁保护数据文件的重新加载和主副本的修改；读路径只访问快照，不加锁
+        self._write_lock = threading.Lock()
+        self._compact_lock = threading.Lock()
+        self._watcher = None
+        self._watcher_stop = threading.Event()
+        self._failed_signature = None
+        # 写日志在第一次写操作时才打开，主副本在第一次写操作或需要回放日志时才建立
+        self._log = None
+        self._data = None
+        self._seq = 0
+        self._file_version = None
+        self._generation = 0
+        # 已作用于主副本、尚未进入已发布快照的写日志记录；为 None 时下次只能整体重建
+        self._pending = []
+        self._reindex_graph = False
+        self._rebuild_wanted = threading.Event()
+        self._rebuilder = None
+        self._visible = threading.Condition()
+        # 布局按 (数据版本, 分类) 缓存，只保留当前版本的结果；每个键各有一把锁，
+        # 同一布局不会被并发重复计算，计算一个分类时不阻塞其他分类。_layout_lock 只保护这两个字典
+        self._layouts = {}
+        self._layout_locks = {}
+        self._layout_lock = threading.Lock()
+        # 中心性指标只保留当前版本的一份：(数据版本, Centrality)；发布快照时由后台线程计算
+        self._centrality = None
+        self._centrality_lock = threading.Lock()
+        self._precompute_thread = None
+        self.result_cache = ResultCache(result_cache_bytes)
+        self.load_data()
+
+    # 以下属性都取自当前快照；一次请求内需要多次访问时应先取 snapshot 再使用
+    @property
+    def graph(self):
+        return self.snapshot.graph
+
+    @property
+    def search_index(self):
+        return self.snapshot.search_index
+
+    @property
+    def concepts(self):
+        return self.snapshot.concepts
+
+    @property
+    def relations(self):
+        return self.snapshot.relations
+
+    @property
+    def version(self):
+        return self.snapshot.version
+
+    @property
+    def last_modified(self):
+        return self.snapshot.last_modified
+
+    def load_data(self):
+        with self._write_lock:
+            signature = self._file_signature()
+            self._install(*self._read_state())
+            self._signature = signature
+
+    def _read_state(self, skip_version=None):
+        """读取数据文件并回放写日志，返回 (快照, 数据文件版本, 主副本, 日志序号)
+
+        数据版本等于 skip_version 时不构建快照，返回 None。
+        二进制快照文件的版本一致时直接载入，不解析 JSON、不建索引；
+        没有日志记录或从快照文件载入时不建立主副本，第一次写操作时再从快照的列表建立。
+        """
+        raw_concepts, raw_relations, file_version = self._read_files()
+        if self._log is not None:
+            # 已分配序号但尚未落盘的记录要先写出，否则回放时会漏掉
+            self._log.wait(self._log.last_seq)
+        records = read_log(self.compacting_log_file)[0] + read_log(self.log_file)[0]
+        seq = max(self._seq, records[-1]["seq"]) if records else self._seq
+        version = self._compose_version(file_version, seq)
+        if version == skip_version:
+            return None
+
+        snapshot = self._load_prebuilt(version, seq)
+        if snapshot is not None:
+            return snapshot, file_version, None, seq
+
+        concepts = json.loads(raw_concepts)
+        relations = json.loads(raw_relations)
+        data = None
+        if records:
+            data = GraphData(concepts, relations)
+            for record in records:
+                data.apply(record)
+            concepts, relations = data.lists()
+        snapshot = self._build_snapshot(concepts, relations, version, seq)
+        self._save_snapshot_file(snapshot)
+        return snapshot, file_version, data, seq
+
+    def _load_prebuilt(self, version, seq):
+        """取得已经建好的快照：mapped 模式映射现有的映射文件，其余模式载入二进制快照文件"""
+        if self.mode == "mapped":
+            path = self._mapped_path(version)
+            if read_mapped_version(path) != version:
+                return None
+            return GraphSnapshot.mapped(path, version, self._data_mtime(), seq)
+        if self.snapshot_file is None:
+            return None
+        try:
+            snapshot = load_snapshot(self.snapshot_file, version, self.mode)
+        except Exception:
+            logger.warning("二进制快照文件无法读取，改为从 JSON 加载", exc_info=True)
+            return None
+        if snapshot is not None:
+            snapshot.last_modified = self._data_mtime()
+        return snapshot
+
+    def _save_snapshot_file(self, snapshot):
+        """在后台线程中写出二进制快照文件，不拖慢本次加载"""
+        if self.snapshot_file is None or self.mode == "mapped":
+            return
+
+        def save():
+            try:
+                write_snapshot(self.snapshot_file, snapshot, self.mode)
+            except Exception:
+                logger.warning("写入二进制快照文件失败", exc_info=True)
+
+        threading.Thread(target=save, name="graph-snapshot-writer").start()
+
+    def _install(self, snapshot, file_version, data, seq):
+        """以读取到的状态替换主副本和快照，调用方须持有写锁"""
+        # 只读模式不保留主副本
+        self._data = data if self.mode == "indexed" else None
+        self._seq = seq
+        self._file_version = file_version
+        self._generation += 1
+        self._pending = []
+        self._reindex_graph = False
+        self._publish(snapshot)
+
+    def _publish(self, snapshot):
+        self.snapshot = snapshot
+        self.result_cache.clear()
+        with self._visible:
+            self._visible.notify_all()
+        if self.precompute:
+            # 上一版本请求过的分类布局在新版本中也预先算好
+            categories = [""] + sorted({key[1] for key in list(self._layouts) if key[1]})
+            self._precompute_thread = threading.Thread(target=self._precompute, args=(snapshot, categories),
+                                                       name="graph-precompute", daemon=True)
+            self._precompute_thread.start()
+
+    def _precompute(self, snapshot, categories):
+        """在后台计算新快照的中心性和 categories 下的布局；快照已被替换时放弃剩余的计算"""
+        try:
+            if self._compute_centrality(snapshot, current_only=True) is None:
+                return
+            for category in categories:
+                if snapshot is not self.snapshot:
+                    return
+                self.get_layout(category, snapshot)
+        except RuntimeError:
+            # 未安装 numpy
+            pass
+        except Exception:
+            logger.exception("预计算中心性和布局失败")
+
+    def wait_precomputed(self, timeout=None):
+        """等待最近一次发布快照时启动的后台计算完成，超时返回 False"""
+        thread = self._precompute_thread
+        if thread is not None:
+            thread.join(timeout)
+            return not thread.is_alive()
+        return True
+
+    @staticmethod
+    def _compose_version(file_version, seq):
+        """数据版本由数据文件内容和写日志序号共同决定"""
+        if not seq:
+            return file_version
+        return hashlib.sha1(f"{file_version}:{seq}".encode("ascii")).hexdigest()[:16]
+
+    def _read_files(self):
+        """读取两个数据文件，返回 (概念 JSON, 关系 JSON, 数据版本)，JSON 尚未解析"""
+        # 数据版本：两个数据文件内容的哈希，用作 HTTP 缓存的 ETag
+        digest = hashlib.sha1()
+
+        # 加载概念
+        concepts = self._read_json(self.concepts_file, digest)
+
+        # 加载关系
+        relations = self._read_json(self.relations_file, digest)
+
+        return concepts, relations, digest.hexdigest()[:16]
+
+    def _build_snapshot(self, concepts, relations, version, seq=0):
+        if self.mode == "mapped":
+            path = self._mapped_path(version)
+            write_mapped(path, concepts, relations, version)
+            self._remove_stale_mapped(path)
+            return GraphSnapshot.mapped(path, version, self._data_mtime(), seq)
+        return GraphSnapshot(concepts, relations, self.mode, version, self._data_mtime(), seq)
+
+    def _mapped_path(self, version):
+        return os.path.join(self.data_dir, MAPPED_FILE_PATTERN.format(version=version))
+
+    def _remove_stale_mapped(self, current_path):
+        """删除其他版本的映射文件；仍被其他进程映射的文件在其解除映射后才真正释放，
+        Windows 下无法删除正在映射的文件，留待下次清理"""
+        prefix, suffix = MAPPED_FILE_PATTERN.split("{version}")
+        for name in os.listdir(self.data_dir):
+            path = os.path.join(self.data_dir, name)
+            if name.startswith(prefix) and name.endswith(suffix) and path != current_path:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    @staticmethod
+    def _read_json(path, digest):
+        if not os.path.exists(path):
+            digest.update(b"\0")
+            return b"[]"
+        with open(path, "rb") as f:
+            data = f.read()
+        digest.update(len(data).to_bytes(8, "big"))
+        digest.update(data)
+        return data
+
+    def _data_mtime(self):
+        paths = (self.concepts_file, self.relations_file, self.log_file, self.compacting_log_file)
+        mtimes = [os.path.getmtime(p) for p in paths if os.path.exists(p)]
+        return max(mtimes) if mtimes else time.time()
+
+    def _file_signature(self):
+        """数据文件的 (修改时间, 大小)，用于廉价地判断文件是否变化"""
+        signature = []
+        for path in (self.concepts_file, self.relations_file):
+            try:
+                stat = os.stat(path)
+                signature.append((stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                signature.append(None)
+        return tuple(signature)
+
+    def reload(self, force=False):
+        """数据文件有变化时构建新快照并原子替换，返回是否替换了快照
+
+        构建在调用线程中进行，期间读请求继续使用旧快照。文件内容哈希与当前版本相同时
+        （例如只是 touch 了文件）不重建索引。读取或解析失败时抛出异常并保留旧快照。
+        写日志中的记录会重新回放到新的数据文件之上。
+        """
+        with self._write_lock:
+            signature = self._file_signature()
+            if not force and signature in (self._signature, self._failed_signature):
+                return False
+
+            start = time.perf_counter()
+            try:
+                state = self._read_state(skip_version=None if force else self.snapshot.version)
+            except (OSError, ValueError):
+                # 文件可能正在写入或已损坏；记下签名，文件再次变化之前不再重试
+                self._failed_signature = signature
+                raise
+            if state is None:
+                self._signature = signature
+                return False
+
+            self._install(*state)
+            self._signature = signature
+            snapshot = self.snapshot
+            logger.info("图数据已重新加载: 版本 %s, %d 个概念, %d 个关系, 用时 %.2f 秒",
+                        snapshot.version, len(snapshot.graph), snapshot.graph.relation_count,
+                        time.perf_counter() - start)
+            return True
+
+    def reload_in_background(self, force=False):
+        """在后台线程中重新加载，立即返回该线程"""
+        thread = threading.Thread(target=self._safe_reload, args=(force,), name="graph-reload", daemon=True)
+        thread.start()
+        return thread
+
+    def _safe_reload(self, force=False):
+        try:
+            return self.reload(force)
+        except Exception:
+            logger.exception("重新加载图数据失败，继续使用当前版本")
+            return False
+
+    def start_watcher(self, interval=5.0):
+        """启动后台线程，每 interval 秒检查一次数据文件，有变化时自动重新加载"""
+        if self._watcher is not None and self._watcher.is_alive():
+            return
+        self._watcher_stop.clear()
+
+        def watch():
+            while not self._watcher_stop.wait(interval):
+                self._safe_reload()
+
+        self._watcher = threading.Thread(target=watch, name="graph-reload-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop_watcher(self):
+        self._watcher_stop.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
+
+    def save_data(self):
+        """把当前数据完整写回数据文件；有写日志时等同于 compact()"""
+        if self.mode != "indexed":
+            raise RuntimeError(f"{self.mode} 模式为只读，不能保存数据")
+        if self._log is not None:
+            self.compact()
+            return
+        snapshot = self.snapshot
+        self._write_data(snapshot.concepts, snapshot.relations)
+
+    def _write_data(self, concepts, relations):
+        """原子地写出两个数据文件，返回新的数据文件版本
+
+        每个文件先写入 .tmp 并 fsync，再以 os.replace 替换，崩溃时不会留下写了一半的文件。
+        两次替换之间崩溃时两个文件可能分属新旧两个版本，由保留到最后的写日志回放补齐。
+        """
+        digest = hashlib.sha1()
+
+        # 保存概念
+        self._write_json(self.concepts_file, concepts, digest)
+
+        # 保存关系
+        self._write_json(self.relations_file, relations, digest)
+
+        return digest.hexdigest()[:16]
+
+    @staticmethod
+    def _write_json(path, value, digest):
+        data = json.dumps(value, ensure_ascii=False, indent=2).encode("utf-8")
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        digest.update(len(data).to_bytes(8, "big"))
+        digest.update(data)
+
+    # 写操作：先写日志并等待落盘，再由后台线程发布包含该修改的新快照
+    def add_concept(self, concept):
+        """新增概念，ID 已存在时抛出 ConflictError；返回写日志序号"""
+        concept_id = self._require_id(concept)
+
+        def make_record(data):
+            if concept_id in data.concepts:
+                raise ConflictError(f"概念已存在: {concept_id}")
+            return {"op": "put_concept", "concept": dict(concept)}
+
+        return self._commit(make_record)
+
+    def update_concept(self, concept_id, fields):
+        """合并更新概念字段（不能修改 id），概念不存在时抛出 KeyError；返回 (更新后的概念, 序号)"""
+        if "id" in fields and fields["id"] != concept_id:
+            raise ValueError("不能修改概念 id")
+        result = {}
+
+        def make_record(data):
+            if concept_id not in data.concepts:
+                raise KeyError(concept_id)
+            # 日志中记录合并后的完整概念，回放时与原记录无关，保持幂等
+            result["concept"] = dict(data.concepts[concept_id], **fields)
+            return {"op": "put_concept", "concept": result["concept"]}
+
+        seq = self._commit(make_record)
+        return result["concept"], seq
+
+    def delete_concept(self, concept_id):
+        """删除概念及与之相连的全部关系，概念不存在时抛出 KeyError；返回写日志序号"""
+        def make_record(data):
+            if concept_id not in data.concepts:
+                raise KeyError(concept_id)
+            return {"op": "delete_concept", "id": concept_id}
+
+        return self._commit(make_record)
+
+    def add_relation(self, relation):
+        """新增关系，两端概念必须存在；同一 (src_id, dst_id, relation_type) 已存在时抛出 ConflictError"""
+        for field in ("src_id", "dst_id", "relation_type"):
+            if not isinstance(relation.get(field), str) or not relation[field]:
+                raise ValueError(f"关系必须有字符串类型的 {field}")
+        key = relation_key(relation)
+
+        def make_record(data):
+            for concept_id in key[:2]:
+                if concept_id not in data.concepts:
+                    raise KeyError(concept_id)
+            if key in data.relations:
+                raise ConflictError(f"关系已存在: {' -> '.join(key[:2])} ({key[2]})")
+            return {"op": "put_relation", "relation": dict(relation)}
+
+        return self._commit(make_record)
+
+    def delete_relation(self, src_id, dst_id, relation_type):
+        """删除关系，不存在时抛出 KeyError；返回写日志序号"""
+        key = (src_id, dst_id, relation_type)
+
+        def make_record(data):
+            if key not in data.relations:
+                raise KeyError(key)
+            return {"op": "delete_relation", "key": list(key)}
+
+        return self._commit(make_record)
+
+    @staticmethod
+    def _require_id(concept):
+        concept_id = concept.get("id")
+        if not isinstance(concept_id, str) or not concept_id:
+            raise ValueError("概念必须有字符串类型的 id")
+        return concept_id
+
+    def _commit(self, make_record):
+        """在写锁内校验并生成记录、分配序号、修改主副本，锁外等待组提交落盘"""
+        with self._write_lock:
+            data = self._writable_data()
+            record = make_record(data)
+            log = self._log
+            seq = log.enqueue(record)
+            data.apply(record)
+            self._seq = seq
+            if self._pending is not None:
+                self._pending.append(record)
+        try:
+            log.wait(seq)
+        except OSError:
+            # 主副本已包含未能落盘的修改，丢弃它并从磁盘重新读取
+            logger.exception("写日志落盘失败，从磁盘重新加载图数据")
+            self._recover(log)
+            raise
+
+        self._schedule_rebuild()
+        if log.records_since_rotate >= self.compact_threshold:
+            self.compact_in_background()
+        return seq
+
+    def _writable_data(self):
+        if self.mode != "indexed":
+            raise RuntimeError(f"{self.mode} 模式为只读，不支持写操作")
+        if self.read_only:
+            raise RuntimeError("存储以只读方式打开（多个工作进程时写日志只能由单个进程写入），不支持写操作")
+        if self._log is None:
+            self._log = WriteLog(self.log_file, fsync=self.fsync, next_seq=self._seq + 1)
+        if self._data is None:
+            snapshot = self.snapshot
+            self._data = GraphData(snapshot.concepts, snapshot.relations)
+            # 数据文件中有重复的概念ID或关系时主副本已去重，与快照不一致：
+            # 概念重复时第一次发布整体重建，只有关系重复时只重建图索引
+            if len(self._data.concepts) != len(snapshot.concepts):
+                self._pending = None
+            elif len(self._data.relations) != len(snapshot.relations):
+                self._reindex_graph = True
+        return self._data
+
+    def _recover(self, failed_log):
+        with self._write_lock:
+            if self._log is not failed_log:
+                return
+            self._log = None
+            try:
+                failed_log.close()
+            except OSError:
+                pass
+            self._install(*self._read_state())
+
+    def _schedule_rebuild(self):
+        self._rebuild_wanted.set()
+        with self._write_lock:
+            if self._rebuilder is None or not self._rebuilder.is_alive():
+                self._rebuilder = threading.Thread(target=self._rebuild_loop, name="graph-rebuild", daemon=True)
+                self._rebuilder.start()
+
+    def _rebuild_loop(self):
+        while True:
+            self._rebuild_wanted.wait()
+            # 等待片刻，把这段时间内的多次写入合并为一次重建
+            time.sleep(self.rebuild_delay)
+            self._rebuild_wanted.clear()
+            try:
+                self._rebuild()
+            except Exception:
+                logger.exception("写入后重建快照失败")
+
+    def _rebuild(self):
+        """发布包含最新写入的快照：写入不多时在当前快照上增量更新，否则整体重建"""
+        with self._write_lock:
+            if self._data is None or self._seq <= self.snapshot.seq:
+                return
+            generation = self._generation
+            seq = self._seq
+            log = self._log
+            version = self._compose_version(self._file_version, seq)
+            base = self.snapshot
+            records = self._pending
+            self._pending = []
+            changes = None
+            if records is not None and len(records) <= max(1, len(base.graph) * INCREMENTAL_MAX_FRACTION):
+                changes = self._collect_changes(records, base)
+            reindex_graph = self._reindex_graph
+            self._reindex_graph = False
+            concepts, relations = self._data.lists()
+
+        start = time.perf_counter()
+        try:
+            # 只发布已经落盘的修改
+            log.wait(seq)
+            if changes is None:
+                snapshot = GraphSnapshot(concepts, relations, self.mode, version, time.time(), seq)
+            else:
+                snapshot = base.updated(concepts, relations, *changes, version, time.time(), seq, reindex_graph)
+        except Exception:
+            # 这批记录没能进入快照，下次整体重建
+            with self._write_lock:
+                if generation == self._generation:
+                    self._pending = None
+            raise
+        with self._write_lock:
+            # 构建期间数据文件被重新加载过时放弃本次结果，由新的状态为准
+            if generation != self._generation:
+                return
+            self._publish(snapshot)
+        logger.debug("写入后%s快照: 序号 %d, 用时 %.3f 秒", "整体重建" if changes is None else "增量更新",
+                     seq, time.perf_counter() - start)
+
+    def _collect_changes(self, records, base):
+        """把一批写日志记录归纳为 (概念变化, 关系变化, 是否删除过概念, 新增的关系键)，取主副本中的当前值，
+        调用方须持有写锁
+
+        概念变化为 {概念ID: 当前概念，已删除为 None}，关系变化为 {关系键: 当前关系，已删除为 None}；
+        删除概念时级联删除的关系取自 base 中该概念的边和这批写入新增的边。
+        新增（包括删除后再新增）的关系在 GraphData 中排到末尾，关系变化中这些键按最后一次新增的顺序排列。
+        """
+        data = self._data
+        concept_ids = {}
+        relation_keys = {}
+        # 这批写入中出现过的关系键当前是否存在；未出现过的以 base 为准
+        present = {}
+        added_by_node = {}
+        appended = set()
+        removed = False
+
+        def exists(key):
+            if key in present:
+                return present[key]
+            return any(edge[0] == key[1] and edge[1] == key[2] for edge in base.graph.edges(key[0], "out"))
+
+        def delete(key):
+            present[key] = False
+            relation_keys.setdefault(key, None)
+
+        for record in records:
+            op = record["op"]
+            if op == "put_concept":
+                concept_ids[record["concept"]["id"]] = None
+            elif op == "delete_concept":
+                removed = True
+                concept_id = record["id"]
+                concept_ids[concept_id] = None
+                for other_id, relation_type, _ in base.graph.edges(concept_id, "out"):
+                    delete((concept_id, other_id, relation_type))
+                for other_id, relation_type, _ in base.graph.edges(concept_id, "in"):
+                    delete((other_id, concept_id, relation_type))
+                for key in added_by_node.pop(concept_id, ()):
+                    delete(key)
+            elif op == "put_relation":
+                key = relation_key(record["relation"])
+                if not exists(key):
+                    relation_keys.pop(key, None)
+                    appended.add(key)
+                    for concept_id in key[:2]:
+                        added_by_node.setdefault(concept_id, []).append(key)
+                present[key] = True
+                relation_keys[key] = None
+            elif op == "delete_relation":
+                delete(tuple(record["key"]))
+        return ({concept_id: data.concepts.get(concept_id) for concept_id in concept_ids},
+                {key: data.relations.get(key) for key in relation_keys}, removed, appended)
+
+    def wait_visible(self, seq, timeout=None):
+        """等待包含写日志序号 seq 的快照发布，超时返回 False"""
+        with self._visible:
+            return self._visible.wait_for(lambda: self.snapshot.seq >= seq, timeout)
+
+    def compact(self):
+        """把写日志合并进数据文件，返回是否进行了合并
+
+        在写锁内转存日志并取得当前数据，之后的写入进入新日志，不受合并影响；
+        写数据文件在锁外进行。合并完成前崩溃时，重启后回放转存的日志即可恢复。
+        """
+        with self._compact_lock:
+            with self._write_lock:
+                if self.mode != "indexed" or self.read_only or not self._has_log_records():
+                    return False
+                data = self._writable_data()
+                self._log.rotate(self.compacting_log_file)
+                concepts, relations = data.lists()
+
+            start = time.perf_counter()
+            file_version = self._write_data(concepts, relations)
+            with self._write_lock:
+                os.remove(self.compacting_log_file)
+                self._file_version = file_version
+                # 数据文件是自己写的，不必由监视线程重新加载
+                self._signature = self._file_signature()
+            logger.info("写日志已合并进数据文件: %d 个概念, %d 个关系, 用时 %.2f 秒",
+                        len(concepts), len(relations), time.perf_counter() - start)
+            return True
+
+    def _has_log_records(self):
+        if self._log is not None and self._log.records_since_rotate:
+            return True
+        if os.path.exists(self.compacting_log_file):
+            return True
+        return os.path.exists(self.log_file) and os.path.getsize(self.log_file) > 0
+
+    def compact_in_background(self):
+        """在后台线程中合并写日志；已有合并在进行时不重复启动"""
+        if self._compact_lock.locked():
+            return None
+        thread = threading.Thread(target=self._safe_compact, name="graph-compact", daemon=True)
+        thread.start()
+        return thread
+
+    def _safe_compact(self):
+        try:
+            return self.compact()
+        except Exception:
+            logger.exception("合并写日志失败，写日志保留")
+            return False
+
+    def close(self):
+        """停止后台线程并把尚未落盘的写日志记录写出"""
+        self.stop_watcher()
+        with self._write_lock:
+            if self._log is not None:
+                self._log.close()
+                self._log = None
+
+    def get_centrality(self, snapshot=None):
+        """快照（默认为当前快照）的中心性指标，每个数据版本只计算一次；尚未算好时等待计算完成。
+        未安装 numpy 时抛出 RuntimeError"""
+        return self._compute_centrality(snapshot or self.snapshot)
+
+    def _compute_centrality(self, snapshot, current_only=False):
+        """current_only 为真且快照已不是当前快照时不计算，返回 None"""
+        cached = self._centrality
+        if cached is not None and cached[0] == snapshot.version:
+            return cached[1]
+        with self._centrality_lock:
+            cached = self._centrality
+            if cached is None or cached[0] != snapshot.version:
+                if current_only and snapshot is not self.snapshot:
+                    return None
+                start = time.perf_counter()
+                cached = (snapshot.version, Centrality(snapshot.graph))
+                logger.info("中心性已计算: %d 个概念, 用时 %.2f 秒", len(snapshot.graph), time.perf_counter() - start)
+                # 旧快照的结果不替换当前版本已算好的结果
+                if snapshot is self.snapshot or self._centrality is None:
+                    self._centrality = cached
+        return cached[1]
+
+    @property
+    def centrality_available(self):
+        """是否安装了 numpy；为 True 时缺少中心性字段的概念详情只是尚未算好，内容在本数据版本内还会变化"""
+        return centrality_available()
+
+    def _optional_centrality(self, snapshot):
+        """已经算好的中心性；后台尚未算完或未安装 numpy 时返回 None，不在请求中计算"""
+        cached = self._centrality
+        if cached is not None and cached[0] == snapshot.version:
+            return cached[1]
+        return None
+
+    def get_concepts(self, category=None, sort=None):
+        snapshot = self.snapshot
+        if not category and sort is None:
+            return snapshot.graph.concepts()
+        return self.result_cache.get_or_compute(
+            snapshot.version, ("concepts", category, sort),
+            lambda: snapshot.graph.concepts(category) if sort is None
+            else list(self.iter_concepts(category, None, sort, snapshot)))
+
+    def iter_concepts(self, category=None, after=None, sort=None, snapshot=None):
+        """sort 为 None 时按加载顺序，为 "centrality" 时按 PageRank 从高到低遍历；未知游标抛出 KeyError"""
+        snapshot = snapshot or self.snapshot
+        graph = snapshot.graph
+        if sort is None:
+            return graph.iter_concepts(category, after)
+
+        centrality = self.get_centrality(snapshot)
+        after_position = None
+        if after is not None:
+            after_position = graph.concept_position(after)
+            if after_position is None:
+                raise KeyError(after)
+        ranked = centrality.ranked(graph.positions(category), after_position)
+        return (graph.concept_at(int(position)) for position in ranked)
+
+    def get_concepts_page(self, category=None, after=None, limit=100, sort=None):
+        """游标分页：返回 (本页概念列表, 下一页游标)，没有下一页时游标为 None"""
+        snapshot = self.snapshot
+
+        def compute():
+            items = list(islice(self.iter_concepts(category, after, sort, snapshot), limit + 1))
+            next_cursor = items[limit - 1].get("id") if len(items) > limit else None
+            return items[:limit], next_cursor
+
+        if not category and sort is None:
+            return compute()
+        return self.result_cache.get_or_compute(snapshot.version, ("page", category, after, limit, sort), compute)
+
+    def get_concept(self, concept_id):
+        snapshot = self.snapshot
+        concept = snapshot.graph.concept(concept_id)
+        if concept is None:
+            return None
+        return self._concept_detail(snapshot.graph, concept, None, {}, self._optional_centrality(snapshot))
+
+    def get_concepts_batch(self, concept_ids, types=None):
+        """批量获取概念详情，返回 (id → 详情, 不存在的ID列表)
+
+        所有ID在同一个快照上解析，多个概念共同的关系目标只查找一次；
+        types 为关系类型集合时只返回这些类型的关系。
+        """
+        snapshot = self.snapshot
+        graph = snapshot.graph
+        centrality = self._optional_centrality(snapshot)
+        target_cache = {}
+        found = {}
+        missing = []
+        for concept_id in dict.fromkeys(concept_ids):
+            concept = graph.concept(concept_id)
+            if concept is None:
+                missing.append(concept_id)
+            else:
+                found[concept_id] = self._concept_detail(graph, concept, types, target_cache, centrality)
+        return found, missing
+
+    @staticmethod
+    def _concept_detail(graph, concept, types, target_cache, centrality=None):
+        """概念及其出边关系的详情；target_cache 缓存已查过的关系目标，可在多次调用间共用
+
+        centrality 不为 None 时附带该概念的中心性指标（未安装 numpy 时不返回该字段）。
+        """
+        # 查找相关概念
+        concept_copy = concept.copy()
+        concept_copy["relations"] = []
+        if centrality is not None:
+            concept_copy["centrality"] = centrality.metrics(graph.concept_position(concept.get("id")))
+
+        for target_id, relation_type, weight in graph.edges(concept.get("id"), "out"):
+            if types is not None and relation_type not in types:
+                continue
+            if target_id in target_cache:
+                target_concept = target_cache[target_id]
+            else:
+                target_concept = target_cache[target_id] = graph.concept(target_id)
+            if target_concept:
+                concept_copy["relations"].append({
+                    "type": relation_type,
+                    "target_id": target_concept.get("id"),
+                    "target_name": target_concept.get("name"),
+                    "target_category": target_concept.get("category")
+                })
+
+        return concept_copy
+
+    def get_categories(self):
+        return self.graph.categories()
+
+    def search(self, query, category=None, limit=20):
+        snapshot = self.snapshot
+        results = []
+        for doc, score in snapshot.search_index.search(query, category, limit):
+            concept = snapshot.graph.concept(snapshot.search_index.doc_ids[doc])
+            results.append({
+                "id": concept.get("id"),
+                "name": concept.get("name"),
+                "description": concept.get("description"),
+                "category": concept.get("category"),
+                "score": score
+            })
+        return results
+
+    def get_neighborhood(self, concept_id, depth=1, direction="out", types=None, limit=200):
+        snapshot = self.snapshot
+        key = ("neighborhood", concept_id, depth, direction, _types_key(types), limit)
+        return self.result_cache.get_or_compute(
+            snapshot.version, key,
+            lambda: neighborhood(snapshot.graph, concept_id, depth, direction, types, limit))
+
+    def find_paths(self, source_id, target_id, k=1, max_len=6, direction="both", types=None,
+                   max_expansions=100000, timeout=None):
+        snapshot = self.snapshot
+        key = ("path", source_id, target_id, k, max_len, direction, _types_key(types), max_expansions)
+        # 超出预算（可能是超时）而截断的结果与当时的负载有关，不缓存
+        return self.result_cache.get_or_compute(
+            snapshot.version, key,
+            lambda: find_paths(snapshot.graph, source_id, target_id, k, max_len, direction, types,
+                               max_expansions, timeout),
+            cacheable=lambda result: not result["truncated"])
+
+    def get_layout(self, category=None, snapshot=None):
+        """返回 category 下概念的预计算布局（节点坐标和边），每个数据版本、每个分类只计算一次
+
+        通常已在发布快照时由后台线程算好；尚未算好时在本次调用中计算，同一布局的并发请求等待这一次计算。
+        """
+        snapshot = snapshot or self.snapshot
+        key = (snapshot.version, category or "")
+        layout = self._layouts.get(key)
+        if layout is not None:
+            return layout
+        with self._layout_lock:
+            lock = self._layout_locks.setdefault(key, threading.Lock())
+        with lock:
+            layout = self._layouts.get(key)
+            if layout is None:
+                start = time.perf_counter()
+                layout = compute_layout(snapshot.graph, category or None)
+                layout["version"] = snapshot.version
+                logger.info("布局已计算: 分类 %s, %d 个节点, %d 条边, 用时 %.2f 秒", category or "全部",
+                            len(layout["nodes"]), len(layout["edges"]), time.perf_counter() - start)
+                with self._layout_lock:
+                    current = self.snapshot.version
+                    self._layouts = {k: v for k, v in self._layouts.items() if k[0] == current}
+                    self._layouts[key] = layout
+                    self._layout_locks = {k: v for k, v in self._layout_locks.items() if k[0] == current}
+        return layout
+
+    # 添加基本的示例数据
+    def add_sample_data(self, overwrite=False):
+        """默认只在没有数据时写入示例数据；overwrite=True 时总是以示例数据覆盖现有数据（旧版的行为）"""
+        if overwrite or not len(self.graph):
+            concepts = [
+                {"id": "concept1", "name": "五位七十五法", "description": "阿毗达摩系统将一切法分为五大类七十五种", "category": "核心概念"},
+                {"id": "concept2", "name": "色法", "description": "物质现象相关的概念，共十一种", "category": "五位"},
+                {"id": "concept3", "name": "心法", "description": "心识相关的概念，共一种", "category": "五位"},
+                {"id": "concept4", "name": "心所法", "description": "心的作用相关的概念，共五十一种", "category": "五位"},
+                {"id": "concept5", "name": "心不相应行法", "description": "非心性但与心相关的概念，共十四种", "category": "五位"},
+                {"id": "concept6", "name": "无为法", "description": "不生不灭的概念，共三种", "category": "五位"},
+                {"id": "concept7", "name": "眼", "description": "眼根，色法之一", "category": "色法"},
+                {"id": "concept8", "name": "耳", "description": "耳根，色法之一", "category": "色法"},
+                {"id": "concept9", "name": "心王", "description": "心识本体", "category": "心法"}
+            ]
+
+            relations = [
+                {"src_id": "concept1", "dst_id": "concept2", "relation_type": "包含", "weight": 5},
+                {"src_id": "concept1", "dst_id": "concept3", "relation_type": "包含", "weight": 5},
+                {"src_id": "concept1", "dst_id": "concept4", "relation_type": "包含", "weight": 5},
+                {"src_id": "concept1", "dst_id": "concept5", "relation_type": "包含", "weight": 5},
+                {"src_id": "concept1", "dst_id": "concept6", "relation_type": "包含", "weight": 5},
+                {"src_id": "concept2", "dst_id": "concept7", "relation_type": "包含", "weight": 3},
+                {"src_id": "concept2", "dst_id": "concept8", "relation_type": "包含", "weight": 3},
+                {"src_id": "concept3", "dst_id": "concept9", "relation_type": "包含", "weight": 3}
+            ]
+
+            if overwrite:
+                # 先把写日志合并进数据文件，覆盖之后不会再回放此前的写入
+                self.compact()
+            self._write_data(concepts, relations)
+            self.load_data()
@@ -0,0 +1,128 @@
+# coding: utf-8
+"""基于图数据版本的 HTTP 条件请求与响应压缩
+
+图数据只在处理流程重新运行后才会变化，因此只读接口的响应完全由数据版本决定：
+- 响应带上弱 ETag（数据版本）和 Last-Modified（数据文件修改时间）
+- 请求的 If-None-Match / If-Modified-Since 与当前版本一致时直接返回 304，不再访问存储
+- 内容在本版本内还会变化的响应（如中心性尚在后台计算的概念详情）不带 ETag，并禁止缓存
+- 较大的响应按 Accept-Encoding 协商 br（需安装 brotli）或 gzip 压缩，流式响应逐块压缩
+"""
+import os
+import zlib
+from email.utils import formatdate
+
+from flask import g, request
+
+try:
+    import brotli
+except ImportError:  # brotli 为可选依赖，未安装时只提供 gzip
+    brotli = None
+
+# 响应由数据版本唯一确定的只读接口
+CACHEABLE_PREFIXES = ("/api/concepts", "/api/concept/", "/api/categories", "/api/search", "/api/path",
+                      "/api/layout")
+COMPRESSIBLE_MIMETYPES = ("application/json", "application/x-ndjson", "text/plain")
+
+COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", 1024))
+# 浏览器每次都回源校验（命中时只返回 304），CDN 可在 s-maxage 秒内直接使用缓存
+CDN_MAX_AGE = int(os.getenv("CDN_MAX_AGE", 60))
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+def is_cacheable():
+    return request.method in ("GET", "HEAD") and request.path.startswith(CACHEABLE_PREFIXES)
+
+
+def _not_modified(version, last_modified):
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(version)
+    if request.if_modified_since:
+        return int(last_modified) <= request.if_modified_since.timestamp()
+    return False
+
+
+def mark_incomplete():
+    """标记本次响应尚不完整：同一数据版本稍后的响应会不同，不能以数据版本作为 ETag 缓存"""
+    g.incomplete_response = True
+
+
+def _set_cache_headers(response, version, last_modified):
+    response.set_etag(version, weak=True)
+    response.headers["Last-Modified"] = formatdate(last_modified, usegmt=True)
+    response.headers["Cache-Control"] = f"public, max-age=0, s-maxage={CDN_MAX_AGE}"
+    response.vary.add("Accept-Encoding")
+
+
+def _choose_encoding():
+    offered = ["br", "gzip"] if brotli is not None else ["gzip"]
+    return request.accept_encodings.best_match(offered)
+
+
+def _compressor(encoding):
+    """返回 (compress, flush) 一对函数"""
+    if encoding == "br":
+        compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        return compressor.process, compressor.finish
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)  # wbits=31 输出 gzip 格式
+    return compressor.compress, compressor.flush
+
+
+def _compress_stream(chunks, encoding):
+    compress, flush = _compressor(encoding)
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode("utf-8")
+        data = compress(chunk)
+        if data:
+            yield data
+    yield flush()
+
+
+def compress_response(response):
+    if (response.status_code != 200 or response.direct_passthrough
+            or "Content-Encoding" in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+
+    response.vary.add("Accept-Encoding")
+    encoding = _choose_encoding()
+    if encoding is None:
+        return response
+
+    if response.is_streamed:
+        response.response = _compress_stream(response.response, encoding)
+        response.headers.pop("Content-Length", None)
+    else:
+        data = response.get_data()
+        if len(data) < COMPRESS_MIN_SIZE:
+            return response
+        compress, flush = _compressor(encoding)
+        response.set_data(compress(data) + flush())
+    response.headers["Content-Encoding"] = encoding
+    return response
+
+
+def init_app(app, store):
+    """为 app 注册条件请求和压缩钩子，数据版本取自 store.version / store.last_modified"""
+
+    @app.before_request
+    def answer_not_modified():
+        if not is_cacheable():
+            return None
+        # 记下本次请求看到的版本，响应头与处理请求时使用的数据保持一致
+        version, last_modified = g.data_version = (store.version, store.last_modified)
+        if _not_modified(version, last_modified):
+            response = app.response_class(status=304)
+            _set_cache_headers(response, version, last_modified)
+            return response
+        return None
+
+    @app.after_request
+    def add_cache_headers(response):
+        if is_cacheable() and response.status_code == 200 and g.get("incomplete_response"):
+            response.headers["Cache-Control"] = "no-store"
+        elif is_cacheable() and response.status_code == 200:
+            version, last_modified = g.get("data_version", (store.version, store.last_modified))
+            _set_cache_headers(response, version, last_modified)
+        return compress_response(response)
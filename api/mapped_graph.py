@@ -0,0 +1,383 @@
+# coding: utf-8
+"""内存映射的只读概念图，供多个 API 工作进程共享
+
+write_mapped() 把 CompactGraph 和 SearchIndex 的全部数组、字符串拼接块按段写入一个文件；
+open_mapped() 以只读方式 mmap 该文件，各段通过 memoryview.cast 直接当作类型化数组使用，
+不复制数据。多个进程映射同一个文件时共用操作系统的页缓存，增加工作进程不增加图数据内存。
+概念记录、ID 和检索字段都在访问时才解码；概念ID → 节点号通过按 UTF-8 字节排序的
+节点号数组二分查找，不建立 dict。
+
+文件布局：8 字节魔数 | uint32 头部长度 | 头部 JSON（版本、计数和段表）| 各段（按 8 字节对齐）
+"""
+import os
+import json
+import mmap
+import struct
+from array import array
+from bisect import bisect_right
+
+from compact_graph import CompactGraph
+from search_index import SearchIndex, FIELD_BOOSTS
+
+MAGIC = b"FZGMAP01"
+_PREFIX = struct.Struct("<8sI")
+_ALIGN = 8
+
+
+def _string_table(strings):
+    """把字符串列表编码为 (拼接块, 偏移量数组)"""
+    blob = bytearray()
+    offsets = array("Q", [0])
+    for value in strings:
+        blob += value.encode("utf-8")
+        offsets.append(len(blob))
+    return blob, offsets
+
+
+def write_mapped(path, concepts, relations, version):
+    """从概念、关系列表构建紧凑图和检索索引，写成可映射的文件（先写临时文件再原子替换）"""
+    graph = CompactGraph(concepts, relations)
+    search_index = SearchIndex(graph.concepts())
+    sections = {}
+
+    # 概念ID：按节点号存放，另存按 UTF-8 字节排序的节点号用于二分查找；
+    # 非字符串ID（只可能出现在关系引用的缺失端点上）转为字符串，None 记为空串
+    ids = ["" if concept_id is None else str(concept_id) for concept_id in graph.ids]
+    encoded_ids = [concept_id.encode("utf-8") for concept_id in ids]
+    sections["ids_blob"], sections["ids_offsets"] = _string_table(ids)
+    sections["ids_sorted"] = array("I", sorted(range(len(encoded_ids)), key=encoded_ids.__getitem__))
+
+    sections["record_blob"] = graph.record_blob
+    sections["record_offsets"] = graph.record_offsets
+    sections["node_category"] = graph.node_category
+    for name in ("out_offsets", "out_targets", "out_types", "out_weights",
+                 "in_offsets", "in_sources", "in_types", "in_weights"):
+        sections[name] = getattr(graph, name)
+    category_offsets = array("I", [0])
+    category_nodes = array("I")
+    for nodes in graph.category_nodes:
+        category_nodes.extend(nodes)
+        category_offsets.append(len(category_nodes))
+    sections["category_offsets"] = category_offsets
+    sections["category_nodes"] = category_nodes
+
+    # 检索索引：gram 按字节序排列，倒排表依次拼接
+    grams = sorted(search_index.postings, key=lambda gram: gram.encode("utf-8"))
+    sections["grams_blob"], sections["grams_offsets"] = _string_table(grams)
+    posting_offsets = array("Q", [0])
+    posting_docs = array("I")
+    posting_weights = array("B")
+    for gram in grams:
+        docs, weights = search_index.postings[gram]
+        posting_docs.extend(docs)
+        posting_weights.extend(weights)
+        posting_offsets.append(len(posting_docs))
+    sections["posting_offsets"] = posting_offsets
+    sections["posting_docs"] = posting_docs
+    sections["posting_weights"] = posting_weights
+    sections["fields_blob"], sections["fields_offsets"] = _string_table(
+        text for fields in search_index.doc_fields for text in fields)
+    names = [fields[0].encode("utf-8") for fields in search_index.doc_fields]
+    sections["names_sorted"] = array("I", sorted(range(len(names)), key=names.__getitem__))
+
+    header = {
+        "version": version,
+        "concept_count": graph.concept_count,
+        "node_count": len(graph.ids),
+        "relation_count": graph.relation_count,
+        "categories": graph.categories_table.strings,
+        "relation_types": graph.relation_types.strings,
+        "sections": {}
+    }
+    # 段表中的偏移量相对于数据区起点，头部长度因此与偏移量无关
+    position = 0
+    for name, data in sections.items():
+        typecode = data.typecode if isinstance(data, array) else "B"
+        length = len(data) * (data.itemsize if isinstance(data, array) else 1)
+        header["sections"][name] = [position, length, typecode]
+        position += length + (-length % _ALIGN)
+    header_bytes = json.dumps(header, ensure_ascii=False).encode("utf-8")
+    header_bytes += b" " * (-(_PREFIX.size + len(header_bytes)) % _ALIGN)
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_PREFIX.pack(MAGIC, len(header_bytes)))
+        f.write(header_bytes)
+        for data in sections.values():
+            raw = data.tobytes() if isinstance(data, array) else bytes(data)
+            f.write(raw)
+            f.write(b"\0" * (-len(raw) % _ALIGN))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def read_mapped_version(path):
+    """返回映射文件头部记录的数据版本；文件不存在或不是本格式时返回 None"""
+    try:
+        with open(path, "rb") as f:
+            prefix = f.read(_PREFIX.size)
+            if len(prefix) != _PREFIX.size:
+                return None
+            magic, header_length = _PREFIX.unpack(prefix)
+            if magic != MAGIC:
+                return None
+            return json.loads(f.read(header_length)).get("version")
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def open_mapped(path):
+    """映射文件，返回 (MappedGraph, MappedSearchIndex)"""
+    with open(path, "rb") as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, header_length = _PREFIX.unpack(buffer[:_PREFIX.size])
+    if magic != MAGIC:
+        raise ValueError(f"不是图映射文件: {path}")
+    header = json.loads(buffer[_PREFIX.size:_PREFIX.size + header_length])
+    view = memoryview(buffer)
+    base = _PREFIX.size + header_length
+    sections = {}
+    for name, (offset, length, typecode) in header["sections"].items():
+        section = view[base + offset:base + offset + length]
+        sections[name] = section.cast(typecode) if typecode != "B" else section
+    graph = MappedGraph(buffer, header, sections)
+    return graph, MappedSearchIndex(graph, sections)
+
+
+class MappedStrings:
+    """映射文件中的字符串表，按下标惰性解码"""
+
+    def __init__(self, blob, offsets, count=None):
+        self.blob = blob
+        self.offsets = offsets
+        self.count = len(offsets) - 1 if count is None else count
+
+    def raw(self, idx):
+        return bytes(self.blob[self.offsets[idx]:self.offsets[idx + 1]])
+
+    def __getitem__(self, idx):
+        if not 0 <= idx < self.count:
+            raise IndexError(idx)
+        return self.raw(idx).decode("utf-8")
+
+    def __len__(self):
+        return self.count
+
+
+def _sorted_lookup(strings, order, key):
+    """在按字节序排列的下标数组 order 中二分查找 key，返回第一个不小于 key 的位置"""
+    lo, hi = 0, len(order)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if strings.raw(order[mid]) < key:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+
+class MappedGraph:
+    """与 CompactGraph 相同的数组布局，数组都是映射文件上的 memoryview"""
+
+    def __init__(self, buffer, header, sections):
+        self.buffer = buffer
+        self.concept_count = header["concept_count"]
+        self.relation_count = header["relation_count"]
+        self.ids = MappedStrings(sections["ids_blob"], sections["ids_offsets"])
+        self.ids_sorted = sections["ids_sorted"]
+        self.record_blob = sections["record_blob"]
+        self.record_offsets = sections["record_offsets"]
+        self.node_category = sections["node_category"]
+        self.out_offsets = sections["out_offsets"]
+        self.out_targets = sections["out_targets"]
+        self.out_types = sections["out_types"]
+        self.out_weights = sections["out_weights"]
+        self.in_offsets = sections["in_offsets"]
+        self.in_sources = sections["in_sources"]
+        self.in_types = sections["in_types"]
+        self.in_weights = sections["in_weights"]
+        self.category_offsets = sections["category_offsets"]
+        self.category_nodes = sections["category_nodes"]
+        # 分类和关系类型数量很少，直接解码
+        self.categories_list = header["categories"]
+        self.category_index = {category: idx for idx, category in enumerate(self.categories_list)}
+        self.relation_types = header["relation_types"]
+
+    def node_of(self, concept_id):
+        if not isinstance(concept_id, str):
+            return None
+        key = concept_id.encode("utf-8")
+        pos = _sorted_lookup(self.ids, self.ids_sorted, key)
+        if pos < len(self.ids_sorted) and self.ids.raw(self.ids_sorted[pos]) == key:
+            return self.ids_sorted[pos]
+        return None
+
+    def __len__(self):
+        return self.concept_count
+
+    def __contains__(self, concept_id):
+        node = self.node_of(concept_id)
+        return node is not None and node < self.concept_count
+
+    def _materialize(self, node):
+        record = json.loads(bytes(self.record_blob[self.record_offsets[node]:self.record_offsets[node + 1]]))
+        concept = {"id": self.ids[node]}
+        category_idx = self.node_category[node]
+        if category_idx >= 0:
+            concept["category"] = self.categories_list[category_idx]
+        concept.update(record)
+        return concept
+
+    def _category_nodes(self, category):
+        idx = self.category_index.get(category)
+        if idx is None:
+            return []
+        return self.category_nodes[self.category_offsets[idx]:self.category_offsets[idx + 1]]
+
+    def concept(self, concept_id):
+        node = self.node_of(concept_id)
+        if node is None or node >= self.concept_count:
+            return None
+        return self._materialize(node)
+
+    def concepts(self, category=None):
+        nodes = self._category_nodes(category) if category else range(self.concept_count)
+        return [self._materialize(node) for node in nodes]
+
+    def iter_concepts(self, category=None, after=None):
+        """按加载顺序遍历概念；after 为游标（上一页最后一个概念的ID），未知游标抛出 KeyError"""
+        nodes = self._category_nodes(category) if category else range(self.concept_count)
+        start = 0
+        if after is not None:
+            node = self.node_of(after)
+            if node is None or node >= self.concept_count:
+                raise KeyError(after)
+            start = bisect_right(nodes, node)
+        return (self._materialize(nodes[i]) for i in range(start, len(nodes)))
+
+    def categories(self):
+        return list(self.categories_list)
+
+    def positions(self, category=None):
+        """category 下（为空时为全部）概念的位置（即节点号），按升序排列"""
+        return self._category_nodes(category) if category else range(self.concept_count)
+
+    def concept_position(self, concept_id):
+        node = self.node_of(concept_id)
+        return node if node is not None and node < self.concept_count else None
+
+    def concept_at(self, position):
+        return self._materialize(position)
+
+    def edges(self, concept_id, direction="out"):
+        """返回 (另一端概念ID, 关系类型, 权重) 列表"""
+        node = self.node_of(concept_id)
+        if node is None:
+            return []
+        if direction == "in":
+            offsets, others, types, weights = self.in_offsets, self.in_sources, self.in_types, self.in_weights
+        else:
+            offsets, others, types, weights = self.out_offsets, self.out_targets, self.out_types, self.out_weights
+
+        ids = self.ids
+        relation_types = self.relation_types
+        result = []
+        for pos in range(offsets[node], offsets[node + 1]):
+            weight = weights[pos]
+            if weight != weight:  # NaN
+                weight = None
+            elif weight.is_integer():
+                weight = int(weight)
+            result.append((ids[others[pos]], relation_types[types[pos]], weight))
+        return result
+
+
+class _MappedPostings:
+    """gram → (文档号数组, 权重数组)，接口与 SearchIndex.postings 的 dict 一致"""
+
+    def __init__(self, sections):
+        self.grams = MappedStrings(sections["grams_blob"], sections["grams_offsets"])
+        self.order = range(len(self.grams))
+        self.offsets = sections["posting_offsets"]
+        self.docs = sections["posting_docs"]
+        self.weights = sections["posting_weights"]
+
+    def _find(self, gram):
+        key = gram.encode("utf-8")
+        pos = _sorted_lookup(self.grams, self.order, key)
+        if pos < len(self.grams) and self.grams.raw(pos) == key:
+            return pos
+        return None
+
+    def __contains__(self, gram):
+        return self._find(gram) is not None
+
+    def __getitem__(self, gram):
+        pos = self._find(gram)
+        if pos is None:
+            raise KeyError(gram)
+        start, end = self.offsets[pos], self.offsets[pos + 1]
+        return self.docs[start:end], self.weights[start:end]
+
+    def __len__(self):
+        return len(self.grams)
+
+
+class _MappedFields:
+    """文档号 → 各检索字段折叠后的文本"""
+
+    def __init__(self, sections):
+        self.strings = MappedStrings(sections["fields_blob"], sections["fields_offsets"])
+        self.width = len(FIELD_BOOSTS)
+
+    def __getitem__(self, doc):
+        start = doc * self.width
+        return tuple(self.strings[i] for i in range(start, start + self.width))
+
+    def __len__(self):
+        return len(self.strings) // self.width
+
+
+class _MappedNameDocs:
+    """折叠后的名称 → 文档号列表，接口与 SearchIndex.name_docs 的 dict.get 一致"""
+
+    def __init__(self, sections, fields):
+        self.fields = fields
+        self.order = sections["names_sorted"]
+
+    def get(self, name, default=None):
+        strings, width = self.fields.strings, self.fields.width
+        key = name.encode("utf-8")
+        lo, hi = 0, len(self.order)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if strings.raw(self.order[mid] * width) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        docs = []
+        while lo < len(self.order) and strings.raw(self.order[lo] * width) == key:
+            docs.append(self.order[lo])
+            lo += 1
+        return docs or default
+
+
+class _MappedCategories:
+    def __init__(self, graph):
+        self.graph = graph
+
+    def __getitem__(self, doc):
+        category_idx = self.graph.node_category[doc]
+        return self.graph.categories_list[category_idx] if category_idx >= 0 else None
+
+
+class MappedSearchIndex(SearchIndex):
+    """映射文件上的检索索引；文档号与节点号相同，查询逻辑沿用 SearchIndex.search"""
+
+    def __init__(self, graph, sections):
+        self.doc_ids = MappedStrings(graph.ids.blob, graph.ids.offsets, graph.concept_count)
+        self.doc_categories = _MappedCategories(graph)
+        self.doc_fields = _MappedFields(sections)
+        self.name_docs = _MappedNameDocs(sections, self.doc_fields)
+        self.postings = _MappedPostings(sections)
@@ -0,0 +1,204 @@
+# coding: utf-8
+"""请求与存储操作的运行指标，以 Prometheus 文本格式从 /api/metrics 输出
+
+- 每个路由（URL 规则，如 /api/concept/<concept_id>）的请求数、延迟直方图和响应字节数
+- 存储操作（get_concept、get_concepts、search、reload 等）的耗时直方图
+- 图规模（概念数、关系数、分类数）、数据版本和查询结果缓存的计数，在抓取时读取
+
+记录一次观测只需一次字典查找、一次二分查找和几次加法，在锁内完成，可以在生产环境常开。
+流式响应的延迟和字节数在最后一块数据发出后记录。指标保存在进程内，
+gunicorn 的多个工作进程各自统计，抓取到的是处理该次抓取请求的进程的数据。
+"""
+import time
+import threading
+from bisect import bisect_left
+
+from flask import g, request
+
+# 延迟直方图的桶上界（秒）
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# 要计时的存储方法
+STORE_OPERATIONS = ("get_concept", "get_concepts", "get_concepts_page", "get_concepts_batch", "search",
+                    "get_neighborhood", "find_paths", "get_layout", "get_centrality",
+                    "load_data", "reload", "compact")
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _labels(names, values, extra=""):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name, help_text, label_names=()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels=(), amount=1):
+        with self._lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self.values.items())
+        for labels, value in items:
+            lines.append(f"{self.name}{_labels(self.label_names, labels)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, label_names=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        # labels → [各桶计数（非累计，最后一个为 +Inf）, 总和, 次数]
+        self.values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self.values.get(labels)
+            if entry is None:
+                entry = self.values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((labels, (list(counts), total, count)) for labels, (counts, total, count)
+                           in self.values.items())
+        for labels, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += bucket_count
+                le = f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_labels(self.label_names, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, labels)} {total}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, labels)} {count}")
+        return lines
+
+
+def _gauge(name, help_text, value, labels=""):
+    return [f"# HELP {name} {help_text}", f"# TYPE {name} gauge", f"{name}{labels} {value}"]
+
+
+class Metrics:
+    def __init__(self):
+        self.requests = Counter("http_requests_total", "HTTP 请求数", ("route", "method", "status"))
+        self.latency = Histogram("http_request_duration_seconds", "HTTP 请求处理时间（秒）", ("route", "method"))
+        self.response_bytes = Counter("http_response_bytes_total", "HTTP 响应体字节数（压缩后）",
+                                      ("route", "method"))
+        self.store_latency = Histogram("store_operation_duration_seconds", "存储操作耗时（秒）", ("operation",))
+        self.store_errors = Counter("store_operation_errors_total", "抛出异常的存储操作次数", ("operation",))
+
+    def observe_request(self, route, method, status, seconds, size):
+        self.requests.inc((route, method, str(status)))
+        self.latency.observe((route, method), seconds)
+        self.response_bytes.inc((route, method), size)
+
+    def instrument(self, obj, names):
+        """把 obj 上的各个方法替换为计时的包装（只影响该实例）"""
+        for name in names:
+            method = getattr(obj, name, None)
+            if method is not None:
+                setattr(obj, name, self._timed(name, method))
+
+    def _timed(self, name, method):
+        labels = (name,)
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            except Exception:
+                self.store_errors.inc(labels)
+                raise
+            finally:
+                self.store_latency.observe(labels, time.perf_counter() - start)
+
+        timed.__wrapped__ = method
+        return timed
+
+    def render(self, store, ready=True):
+        snapshot = store.snapshot
+        graph = snapshot.graph
+        lines = []
+        for metric in (self.requests, self.latency, self.response_bytes, self.store_latency, self.store_errors):
+            lines.extend(metric.render())
+
+        lines += _gauge("graph_concepts", "当前快照的概念数", len(graph))
+        lines += _gauge("graph_relations", "当前快照的关系数", graph.relation_count)
+        lines += _gauge("graph_categories", "当前快照的分类数", len(graph.categories()))
+        lines += _gauge("graph_data_last_modified_seconds", "数据文件修改时间（Unix 时间戳）", snapshot.last_modified)
+        lines += _gauge("graph_data_info", "当前数据版本和存储模式", 1,
+                        _labels(("version", "mode"), (snapshot.version, store.mode)))
+        lines += _gauge("service_ready", "服务是否就绪（开始优雅关闭后为 0）", int(ready))
+
+        cache = store.result_cache.stats()
+        lines += _gauge("result_cache_entries", "查询结果缓存的条目数", cache["entries"])
+        lines += _gauge("result_cache_bytes", "查询结果缓存占用的估算字节数", cache["bytes"])
+        for key, text in (("hits", "命中"), ("misses", "未命中"), ("evictions", "淘汰"), ("invalidations", "失效")):
+            name = f"result_cache_{key}_total"
+            lines += [f"# HELP {name} 查询结果缓存的{text}次数", f"# TYPE {name} counter", f"{name} {cache[key]}"]
+        return "\n".join(lines) + "\n"
+
+
+def _count_stream(chunks, finish):
+    """逐块转发流式响应，结束（或客户端断开）后以总字节数调用 finish"""
+    size = 0
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode("utf-8")
+            size += len(chunk)
+            yield chunk
+    finally:
+        finish(size)
+
+
+def init_app(app, store):
+    """注册请求计时钩子并为 store 的操作计时，返回 Metrics 对象
+
+    须在其他钩子（如 http_cache）之前注册：before_request 按注册顺序执行、可能提前返回，
+    after_request 按注册的逆序执行，这样计时覆盖整个请求，字节数是压缩后的大小。
+    """
+    metrics = Metrics()
+    metrics.instrument(store, STORE_OPERATIONS)
+
+    @app.before_request
+    def start_timer():
+        g.metrics_start = time.perf_counter()
+
+    @app.after_request
+    def record_request(response):
+        start = g.get("metrics_start")
+        if start is None:
+            return response
+        route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+        method = request.method
+        status = response.status_code
+
+        def finish(size):
+            metrics.observe_request(route, method, status, time.perf_counter() - start, size)
+
+        if response.is_streamed:
+            response.response = _count_stream(response.response, finish)
+        else:
+            finish(response.content_length or 0)
+        return response
+
+    return metrics
@@ -0,0 +1,108 @@
+# coding: utf-8
+"""按数据版本失效的查询结果缓存
+
+邻域展开、路径查询和过滤后的概念列表计算代价较高，而访问集中在少数热门概念上。
+ResultCache 以 (数据版本, 规范化后的查询) 为键缓存结果：
+- 容量按结果的估算字节数（JSON 序列化长度）限制，超出时淘汰最久未使用的条目（LRU）；
+  单个结果超过总容量的 1/MAX_ENTRY_FRACTION 时不缓存，避免一个大结果挤掉全部热门条目
+- 查询时发现数据版本变化就清空全部条目，重新加载或写入后不会返回旧版本的结果
+- 记录命中、未命中、淘汰和失效次数
+缓存的结果会被多个请求共用，调用方不能修改。
+"""
+import json
+import threading
+from collections import OrderedDict
+
+MAX_ENTRY_FRACTION = 8
+
+
+def estimate_size(value):
+    return len(json.dumps(value, ensure_ascii=False, separators=(",", ":"), default=str))
+
+
+class ResultCache:
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = None
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def _check_version(self, version):
+        if version != self._version:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self.bytes = 0
+            self._version = version
+
+    def get(self, version, key):
+        """返回 (是否命中, 结果)"""
+        with self._lock:
+            self._check_version(version)
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, entry[0]
+
+    def put(self, version, key, value):
+        size = estimate_size(value)
+        if size > self.max_bytes // MAX_ENTRY_FRACTION:
+            return
+        with self._lock:
+            # 计算期间数据已更新到新版本时，旧版本的结果直接丢弃
+            if version != self._version:
+                return
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old[1]
+            self._entries[key] = (value, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.bytes -= evicted_size
+                self.evictions += 1
+
+    def get_or_compute(self, version, key, compute, cacheable=None):
+        """命中时返回缓存结果，否则调用 compute() 计算；cacheable(结果) 为假时不缓存该结果"""
+        if not self.enabled:
+            return compute()
+        hit, value = self.get(version, key)
+        if hit:
+            return value
+        value = compute()
+        if value is not None and (cacheable is None or cacheable(value)):
+            self.put(version, key, value)
+        return value
+
+    def clear(self):
+        """数据版本替换时调用：立即释放全部条目，仍在按旧版本计算的结果也不再写入"""
+        with self._lock:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self.bytes = 0
+            self._version = None
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations
+            }
@@ -0,0 +1,227 @@
+# coding: utf-8
+import heapq
+from array import array
+from collections import defaultdict
+
+from cjk_text import fold, segments, index_grams, query_grams
+
+# 各字段的权重：命中名称最重要，其次是巴利语/梵语名，最后是描述（描述须排在最后）
+FIELD_BOOSTS = (("name", 10), ("pali", 4), ("sanskrit", 4), ("description", 1))
+NAME_BOOST = 10
+DESCRIPTION_BOOST = 1
+# 查询词与名称完全相同 / 为名称前缀时的额外加分
+EXACT_NAME_BONUS = 10
+PREFIX_NAME_BONUS = 3
+MAX_TERM_SCORE = sum(boost for _, boost in FIELD_BOOSTS) + EXACT_NAME_BONUS
+MAX_SEARCH_LIMIT = 200
+
+
+class SearchIndex:
+    """概念全文检索的倒排索引
+
+    文本先经 fold() 做繁简折叠、去变音符号和小写化，再切为字符 n-gram
+    （汉字取单字和双字，拉丁字母取三字母组）。每个 gram 的倒排表保存文档号和
+    字段权重（该 gram 出现的各字段权重之和），按权重降序排列。
+
+    查询时以最稀有的 gram 驱动候选集，再用子串匹配核对每个查询词确实出现在某个字段中；
+    名称完全匹配的概念通过名称字典直接取得；其余候选按倒排表的权重降序遍历，
+    已收集到足够结果且剩余候选的得分上界不高于当前第 limit 名时提前结束。
+    写入后以 updated() 得到新索引：变化的概念的旧文档记入 deleted，新文档追加在末尾，
+    原索引不变，可继续供旧快照使用。
+    """
+
+    # 已删除（被替换）的文档号
+    deleted = frozenset()
+    # 已删除的文档超过该比例时 updated() 整体重建索引
+    MAX_DELETED_FRACTION = 0.25
+
+    def __init__(self, concepts):
+        self.doc_ids = []
+        self.doc_categories = []
+        self.doc_fields = []
+        self.name_docs = {}
+        postings = defaultdict(list)
+
+        for concept in concepts:
+            concept_id = concept.get("id")
+            if concept_id is None:
+                continue
+            doc = len(self.doc_ids)
+            self.doc_ids.append(concept_id)
+            self.doc_categories.append(concept.get("category"))
+
+            fields = _document_fields(concept)
+            self.doc_fields.append(fields)
+            self.name_docs.setdefault(fields[0], []).append(doc)
+
+            # 倒排项把权重和文档号打包为一个整数：高位为权重，低位为文档号的反码，
+            # 这样对整数降序排序即得到"权重降序、同权重文档号升序"
+            packed_doc = 0xFFFFFFFF - doc
+            for gram, weight in _gram_weights(fields).items():
+                postings[gram].append(weight << 32 | packed_doc)
+
+        # 倒排表定型为紧凑数组
+        self.postings = {}
+        for gram, entry in postings.items():
+            entry.sort(reverse=True)
+            self.postings[gram] = (array("I", [0xFFFFFFFF - (packed & 0xFFFFFFFF) for packed in entry]),
+                                   array("B", [packed >> 32 for packed in entry]))
+
+    def __len__(self):
+        return len(self.doc_ids)
+
+    def updated(self, changes, concepts):
+        """返回应用了概念变化的新索引，本索引不变
+
+        changes 为 [(旧概念或 None, 新概念或 None)]，concepts 为变化后的全部概念（整体重建时使用）。
+        旧文档只记入 deleted，新文档追加在末尾，只复制涉及的 gram 的倒排表，代价与变化的概念数成正比。
+        同分的结果按文档号排序，更新过的概念因此可能排在同分概念之后，整体重建后恢复加载顺序。
+        """
+        index = SearchIndex.__new__(SearchIndex)
+        index.doc_ids = list(self.doc_ids)
+        index.doc_categories = list(self.doc_categories)
+        index.doc_fields = list(self.doc_fields)
+        index.name_docs = dict(self.name_docs)
+        index.postings = dict(self.postings)
+        deleted = set(self.deleted)
+        # 本次已复制过的倒排表，同一 gram 的多个新文档在同一份副本上插入
+        copied = {}
+
+        for old, new in changes:
+            new_fields = _document_fields(new) if new is not None else None
+            if old is not None:
+                concept_id = old.get("id")
+                old_fields = _document_fields(old)
+                if new_fields == old_fields and new.get("category") == old.get("category"):
+                    continue
+                docs = index.name_docs.get(old_fields[0], ())
+                stale = [doc for doc in docs if index.doc_ids[doc] == concept_id and doc not in deleted]
+                if stale:
+                    deleted.update(stale)
+                    remaining = [doc for doc in docs if doc not in stale]
+                    if remaining:
+                        index.name_docs[old_fields[0]] = remaining
+                    else:
+                        del index.name_docs[old_fields[0]]
+            if new is None or new.get("id") is None:
+                continue
+
+            doc = len(index.doc_ids)
+            index.doc_ids.append(new.get("id"))
+            index.doc_categories.append(new.get("category"))
+            index.doc_fields.append(new_fields)
+            index.name_docs[new_fields[0]] = index.name_docs.get(new_fields[0], []) + [doc]
+            for gram, weight in _gram_weights(new_fields).items():
+                entry = copied.get(gram)
+                if entry is None:
+                    docs, weights = self.postings.get(gram, (array("I"), array("B")))
+                    entry = copied[gram] = index.postings[gram] = (docs[:], weights[:])
+                # 新文档号最大，排在权重不低于它的各项之后
+                position = _insert_position(entry[1], weight)
+                entry[0].insert(position, doc)
+                entry[1].insert(position, weight)
+
+        if len(deleted) > len(index.doc_ids) * self.MAX_DELETED_FRACTION:
+            return SearchIndex(concepts)
+        index.deleted = frozenset(deleted)
+        return index
+
+    def _term_score(self, doc, term):
+        name, *_ = fields = self.doc_fields[doc]
+        score = 0
+        for (_, boost), text in zip(FIELD_BOOSTS, fields):
+            if term in text:
+                score += boost
+        if score >= NAME_BOOST:
+            if name == term:
+                score += EXACT_NAME_BONUS
+            elif name.startswith(term):
+                score += PREFIX_NAME_BONUS
+        return score
+
+    def search(self, query, category=None, limit=20):
+        """返回 (文档号, 得分) 列表，按得分降序；所有查询词都必须命中"""
+        terms = list(dict.fromkeys(segments(fold(query))))
+        if not terms:
+            return []
+
+        # 每个查询词取其最稀有的 gram；任一 gram 不存在则没有结果
+        drivers = []
+        for term in terms:
+            grams = query_grams(term)
+            if any(gram not in self.postings for gram in grams):
+                return []
+            drivers.append(min(grams, key=lambda gram: len(self.postings[gram][0])))
+
+        driver_gram = min(drivers, key=lambda gram: len(self.postings[gram][0]))
+        docs, weights = self.postings[driver_gram]
+        other_terms_bound = (len(terms) - 1) * MAX_TERM_SCORE
+
+        heap = []
+        deleted = self.deleted
+
+        def offer(doc):
+            if category and self.doc_categories[doc] != category:
+                return
+            if deleted and doc in deleted:
+                return
+            score = 0
+            for term in terms:
+                term_score = self._term_score(doc, term)
+                if not term_score:
+                    return
+                score += term_score
+            item = (score, -doc)
+            if len(heap) < limit:
+                heapq.heappush(heap, item)
+            elif item > heap[0]:
+                heapq.heapreplace(heap, item)
+
+        # 名称与驱动查询词完全相同的概念先行处理，之后的候选不再可能获得完全匹配加分
+        driver_term = terms[drivers.index(driver_gram)]
+        exact_docs = self.name_docs.get(driver_term, ())
+        for doc in exact_docs:
+            offer(doc)
+        exact_docs = set(exact_docs)
+
+        for doc, weight in zip(docs, weights):
+            if len(heap) >= limit:
+                bound = weight + (PREFIX_NAME_BONUS if weight >= NAME_BOOST else 0) + other_terms_bound
+                if bound <= heap[0][0]:
+                    break
+            if doc not in exact_docs:
+                offer(doc)
+
+        return [(-neg_doc, score) for score, neg_doc in sorted(heap, reverse=True)]
+
+
+def _document_fields(concept):
+    """概念各检索字段折叠后的文本，次序同 FIELD_BOOSTS"""
+    return tuple(fold(_as_text(concept.get(field))) for field, _ in FIELD_BOOSTS)
+
+
+def _gram_weights(fields):
+    """gram → 该 gram 出现的各字段权重之和"""
+    gram_weights = dict.fromkeys(index_grams(fields[-1]), DESCRIPTION_BOOST)
+    for (_, boost), text in zip(FIELD_BOOSTS[:-1], fields):
+        for gram in index_grams(text):
+            gram_weights[gram] = gram_weights.get(gram, 0) + boost
+    return gram_weights
+
+
+def _insert_position(weights, weight):
+    """在按降序排列的 weights 中，权重不低于 weight 的项数"""
+    low, high = 0, len(weights)
+    while low < high:
+        middle = (low + high) // 2
+        if weights[middle] >= weight:
+            low = middle + 1
+        else:
+            high = middle
+    return low
+
+
+def _as_text(value):
+    if value is None:
+        return ""
+    return value if isinstance(value, str) else str(value)
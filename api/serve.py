@@ -0,0 +1,129 @@
+# coding: utf-8
+"""生产环境启动入口（app.py 末尾的 app.run 仅供开发调试）
+
+用法: python serve.py [--bind 0.0.0.0:5000] [--workers N] [--threads N]
+
+- Linux/macOS 使用 gunicorn：主进程先导入 app（加载数据、建好全部索引），再 fork 出工作进程，
+  各工作进程以写时复制方式共享已建好的图数据，每个工作进程用 gthread 多线程处理请求。
+  工作进程数默认等于 CPU 核数，以便并发读请求用满所有核。
+- 多于一个工作进程时存储以只读方式打开（写日志只能由单个进程写入），写接口返回 409；
+  需要写接口时以 --workers 1 运行。
+- Windows 没有 fork，改用 waitress 单进程多线程服务；未安装 waitress 时使用 Flask 内置的多线程服务器。
+- 收到 SIGTERM 后 /api/ready 返回 503，不再接受新连接，处理中的请求在 --graceful-timeout 秒内完成后退出，
+  退出前把尚未落盘的写日志写出。
+"""
+import os
+import gc
+import logging
+import argparse
+
+from dotenv import load_dotenv
+
+try:
+    import gunicorn.app.base
+except ImportError:  # gunicorn 不支持 Windows，为可选依赖
+    gunicorn = None
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="法相知识图谱 API 服务")
+    parser.add_argument("--bind", default=os.getenv("API_BIND", "0.0.0.0:5000"),
+                        help="监听地址，默认 0.0.0.0:5000")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("API_WORKERS") or os.cpu_count() or 1),
+                        help="工作进程数，默认为 CPU 核数（仅 gunicorn）")
+    parser.add_argument("--threads", type=int, default=int(os.getenv("API_THREADS", 4)),
+                        help="每个工作进程的线程数，默认 4")
+    parser.add_argument("--timeout", type=int, default=int(os.getenv("API_TIMEOUT", 30)),
+                        help="单个请求的超时秒数，超时的工作进程会被重启（仅 gunicorn）")
+    parser.add_argument("--graceful-timeout", type=int, default=int(os.getenv("API_GRACEFUL_TIMEOUT", 30)),
+                        help="优雅关闭时等待处理中请求的最长秒数（仅 gunicorn）")
+    return parser.parse_args()
+
+
+def serve_gunicorn(args):
+    if args.workers > 1:
+        os.environ["GRAPH_READ_ONLY"] = "1"
+    # 在 fork 之前导入 app：数据只在主进程中加载一次
+    import app as api
+
+    store = api.graph_store
+    # 中心性和全图布局在主进程中算好，工作进程共享这份结果，不再各自计算
+    store.wait_precomputed()
+    # 后台线程不会随 fork 进入工作进程，主进程中停掉监视线程，由每个工作进程各自启动
+    store.stop_watcher()
+    # 已加载的对象移入永久代，工作进程中的垃圾回收不再扫描它们，避免写时复制的页面被逐渐复制
+    gc.collect()
+    gc.freeze()
+
+    def post_fork(server, worker):
+        if api.GRAPH_RELOAD_INTERVAL > 0:
+            store.start_watcher(api.GRAPH_RELOAD_INTERVAL)
+
+        # 收到 SIGTERM 时先把就绪状态置为 503，再交给 gunicorn 进入优雅关闭
+        handle_exit = worker.handle_exit
+
+        def handle_exit_gracefully(sig, frame):
+            api.service_state["ready"] = False
+            handle_exit(sig, frame)
+
+        worker.handle_exit = handle_exit_gracefully
+
+    def worker_exit(server, worker):
+        api.service_state["ready"] = False
+        store.close()
+
+    options = {
+        "bind": args.bind,
+        "workers": args.workers,
+        "threads": args.threads,
+        "worker_class": "gthread",
+        "timeout": args.timeout,
+        "graceful_timeout": args.graceful_timeout,
+        "preload_app": True,
+        "post_fork": post_fork,
+        "worker_exit": worker_exit,
+    }
+
+    class Application(gunicorn.app.base.BaseApplication):
+        def load_config(self):
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return api.app
+
+    Application().run()
+
+
+def serve_threaded(args):
+    import app as api
+
+    host, port = args.bind.rsplit(":", 1)
+    try:
+        from waitress import serve
+    except ImportError:
+        serve = None
+    try:
+        if serve is not None:
+            serve(api.app, host=host, port=int(port), threads=args.threads)
+        else:
+            logging.warning("未安装 waitress，使用 Flask 内置的多线程服务器")
+            api.app.run(host=host, port=int(port), threaded=True)
+    finally:
+        api.service_state["ready"] = False
+        api.graph_store.close()
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    # 命令行参数的默认值取自环境变量，须在解析参数之前加载 .env
+    load_dotenv()
+    args = parse_args()
+    if gunicorn is not None and os.name != "nt":
+        serve_gunicorn(args)
+    else:
+        serve_threaded(args)
+
+
+if __name__ == "__main__":
+    main()
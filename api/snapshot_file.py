@@ -0,0 +1,82 @@
+# coding: utf-8
+"""图快照的二进制文件格式，用于加快启动
+
+JSON 数据文件仍是交换格式；快照文件只是加载结果的缓存，保存已经建好的图索引和检索索引，
+启动时数据版本、存储模式与快照一致就直接读入，跳过 JSON 解析和建索引。
+
+文件布局（整数为小端序）：
+    8 字节魔数 | uint32 格式版本 | uint32 头部长度 | 头部 JSON
+    | uint64 数据长度 | 数据（GraphSnapshot 的 pickle）
+先读出头部校验，匹配后再一次读入全部数据。快照文件由本程序写在数据目录中，
+与数据文件同样受信任；不要加载来源不明的快照文件。
+"""
+import os
+import gc
+import json
+import time
+import pickle
+import struct
+
+MAGIC = b"FZGSNAP\0"
+# 快照中对象的结构（GraphIndex、CompactGraph、SearchIndex 的字段）变化时递增，旧快照随之失效
+FORMAT_VERSION = 1
+_PREFIX = struct.Struct("<8sII")
+_PAYLOAD_LENGTH = struct.Struct("<Q")
+
+
+def write_snapshot(path, snapshot, mode):
+    """把快照写入 path：先写临时文件并 fsync，再原子替换"""
+    header = json.dumps({
+        "version": snapshot.version,
+        "seq": snapshot.seq,
+        "mode": mode,
+        "created": time.time()
+    }).encode("utf-8")
+    payload = pickle.dumps(snapshot, protocol=pickle.HIGHEST_PROTOCOL)
+
+    # 多个进程可能同时写同一个快照，临时文件名带上进程号
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_PREFIX.pack(MAGIC, FORMAT_VERSION, len(header)))
+        f.write(header)
+        f.write(_PAYLOAD_LENGTH.pack(len(payload)))
+        f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return len(payload)
+
+
+def read_header(f):
+    """读取并返回头部 dict；不是本格式或格式版本不符时返回 None"""
+    prefix = f.read(_PREFIX.size)
+    if len(prefix) != _PREFIX.size:
+        return None
+    magic, format_version, header_length = _PREFIX.unpack(prefix)
+    if magic != MAGIC or format_version != FORMAT_VERSION:
+        return None
+    return json.loads(f.read(header_length))
+
+
+def load_snapshot(path, version, mode):
+    """数据版本和存储模式都与快照一致时返回快照对象，否则返回 None"""
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return None
+    with f:
+        header = read_header(f)
+        if header is None or header.get("version") != version or header.get("mode") != mode:
+            return None
+        (length,) = _PAYLOAD_LENGTH.unpack(f.read(_PAYLOAD_LENGTH.size))
+        payload = f.read(length)
+    if len(payload) != length:
+        return None
+    # 反序列化一次创建数百万个对象，期间暂停循环垃圾回收（不会产生循环垃圾），耗时约减半
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return pickle.loads(payload)
+    finally:
+        if gc_enabled:
+            gc.enable()
@@ -0,0 +1,153 @@
+# coding: utf-8
+import os
+import json
+import threading
+
+
+class WriteLogError(IOError):
+    """写日志落盘失败"""
+
+
+def read_log(path):
+    """读取写日志，返回 (记录列表, 有效字节数)
+
+    进程崩溃时最后一行可能只写了一半，读到第一条不完整或无法解析的记录即停止，
+    其后的内容视为无效。
+    """
+    records = []
+    valid_size = 0
+    if not os.path.exists(path):
+        return records, valid_size
+    with open(path, "rb") as f:
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                break
+            valid_size += len(line)
+    return records, valid_size
+
+
+class WriteLog:
+    """追加写的 JSONL 写日志，带组提交
+
+    enqueue() 在调用方持有的写锁内分配序号并放入待提交缓冲区，不做磁盘 I/O；
+    wait() 等待该序号落盘。第一个等待者成为本轮的提交者：先等待 commit_delay 秒
+    收集并发写入，再一次性写出整批记录并只调用一次 fsync，其余等待者随之返回。
+    """
+
+    def __init__(self, path, fsync=True, commit_delay=0.002, next_seq=1):
+        self.path = path
+        self.fsync = fsync
+        self.commit_delay = commit_delay
+        self._cond = threading.Condition()
+        self._pending = []
+        self._next_seq = next_seq
+        self._committed_seq = next_seq - 1
+        self._failed_seq = 0
+        self._committing = False
+
+        # 截掉上次崩溃留下的不完整尾部，避免新记录接在残缺的行后面
+        records, valid_size = read_log(path)
+        self.records_since_rotate = len(records)
+        self._file = open(path, "ab")
+        if self._file.tell() != valid_size:
+            self._file.truncate(valid_size)
+            self._file.seek(valid_size)
+
+    @property
+    def last_seq(self):
+        """最后一个已分配的序号"""
+        return self._next_seq - 1
+
+    def enqueue(self, record):
+        """为记录分配序号并放入待提交缓冲区，返回序号"""
+        with self._cond:
+            seq = self._next_seq
+            self._next_seq += 1
+            record["seq"] = seq
+            line = json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n"
+            self._pending.append((seq, line.encode("utf-8")))
+            self.records_since_rotate += 1
+            return seq
+
+    def wait(self, seq):
+        """阻塞直到 seq 及之前的记录全部落盘"""
+        with self._cond:
+            while self._committed_seq < seq:
+                if seq <= self._failed_seq:
+                    raise WriteLogError(f"写日志记录 {seq} 落盘失败")
+                if self._committing:
+                    self._cond.wait()
+                    continue
+                self._commit_batch()
+
+    def append(self, record):
+        seq = self.enqueue(record)
+        self.wait(seq)
+        return seq
+
+    def _commit_batch(self):
+        """在持有 _cond 的情况下调用，期间会暂时释放锁执行 I/O"""
+        self._committing = True
+        try:
+            if self.commit_delay:
+                self._cond.wait(self.commit_delay)
+            batch, self._pending = self._pending, []
+            if not batch:
+                return
+            self._cond.release()
+            try:
+                self._file.write(b"".join(line for _, line in batch))
+                self._file.flush()
+                if self.fsync:
+                    os.fsync(self._file.fileno())
+            except OSError as e:
+                self._failed_seq = batch[-1][0]
+                raise WriteLogError(f"写日志落盘失败: {e}") from e
+            finally:
+                self._cond.acquire()
+            self._committed_seq = batch[-1][0]
+        finally:
+            self._committing = False
+            self._cond.notify_all()
+
+    def rotate(self, dest):
+        """把当前日志（含尚未提交的记录）落盘后转存到 dest，之后的记录写入新的空日志
+
+        dest 已存在（上次合并未完成）时把当前日志追加到其末尾，而不是覆盖。
+        """
+        with self._cond:
+            while self._committing:
+                self._cond.wait()
+            self._committing = True
+            try:
+                batch, self._pending = self._pending, []
+                self._file.write(b"".join(line for _, line in batch))
+                self._file.flush()
+                os.fsync(self._file.fileno())
+                self._file.close()
+                if os.path.exists(dest):
+                    with open(self.path, "rb") as src, open(dest, "ab") as out:
+                        out.write(src.read())
+                        out.flush()
+                        os.fsync(out.fileno())
+                    os.remove(self.path)
+                else:
+                    os.replace(self.path, dest)
+                self._file = open(self.path, "ab")
+                if batch:
+                    self._committed_seq = batch[-1][0]
+                self.records_since_rotate = 0
+            finally:
+                self._committing = False
+                self._cond.notify_all()
+
+    def close(self):
+        try:
+            self.wait(self.last_seq)
+        finally:
+            with self._cond:
+                self._file.close()
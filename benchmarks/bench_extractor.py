@@ -0,0 +1,106 @@
+# coding: utf-8
+"""概念提取的端到端吞吐：对本地替身服务（scripts/mock_llm_server.py）完整运行 llm_concept_extractor.py
+
+用法: python benchmarks/bench_extractor.py [--segments 200] [--workers 1,4,8] [--latency 0.5] [--rate-429 0.02]
+                                         [--timeout 0] [--malformed 0] [--pack-tokens 1500] [--rpm 6000]
+
+段落按五位七十五法的名目合成，长短呈长尾分布（多数只有一两句，少数长达数千字）。
+每种并发数在新的输出目录中、不使用响应缓存运行一次提取脚本（子进程），报告耗时、每秒段落数、
+请求数以及替身服务返回的 429、超时和格式错误的响应数。不会访问真实的 DeepSeek 接口。
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import subprocess
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SCRIPTS_DIR = os.path.join(BENCH_DIR, "..", "scripts")
+sys.path.insert(0, SCRIPTS_DIR)
+
+from mock_llm_server import start_server  # noqa: E402
+from synthetic_graph import FIVE_POSITIONS  # noqa: E402
+
+EXTRACTOR = os.path.join(SCRIPTS_DIR, "llm_concept_extractor.py")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="概念提取吞吐基准")
+    parser.add_argument("--segments", type=int, default=200)
+    parser.add_argument("--workers", default="1,4,8", help="逗号分隔的并发数")
+    parser.add_argument("--latency", type=float, default=0.5, help="替身服务的平均响应延迟（秒）")
+    parser.add_argument("--rate-429", type=float, default=0.02)
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--timeout", type=float, default=0.0, help="请求挂起直到客户端超时的概率")
+    parser.add_argument("--malformed", type=float, default=0.0)
+    parser.add_argument("--pack-tokens", type=int, default=1500)
+    parser.add_argument("--rpm", type=float, default=6000, help="提取脚本的每分钟请求上限")
+    parser.add_argument("--seed", type=int, default=42)
+    return parser.parse_args()
+
+
+def dharma_names():
+    names = []
+    for position, members in FIVE_POSITIONS.items():
+        names.append(position)
+        groups = members.values() if isinstance(members, dict) else [members]
+        for group in groups:
+            names.extend(group)
+    return names
+
+
+def make_segments(count, seed):
+    """合成段落：每句"X者，Y相应，Z为性。"，句数取帕累托分布"""
+    rng = random.Random(seed)
+    names = dharma_names()
+    segments = []
+    for i in range(count):
+        sentences = min(2000, int(rng.paretovariate(1.2)))
+        content = "".join(f"{rng.choice(names)}者，与{rng.choice(names)}相应，以{rng.choice(names)}为性。"
+                          for _ in range(sentences))
+        segments.append({"title": f"{rng.choice(names)}品第{i + 1}", "level": 2, "content": content})
+    return segments
+
+
+def run_extractor(workdir, segments_file, url, workers, args):
+    output_dir = os.path.join(workdir, f"out_{workers}")
+    env = dict(os.environ, DEEPSEEK_API_URL=url, DEEPSEEK_API_KEY="mock", LLM_TIMEOUT="5",
+               LLM_JOURNAL_FSYNC="0")
+    command = [sys.executable, EXTRACTOR, segments_file, output_dir, f"--workers={workers}",
+               f"--rpm={args.rpm:g}", f"--pack-tokens={args.pack_tokens}", "--no-cache"]
+    start = time.perf_counter()
+    subprocess.run(command, cwd=workdir, env=env, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    elapsed = time.perf_counter() - start
+    with open(os.path.join(output_dir, "concepts.json"), "r", encoding="utf-8") as f:
+        concepts = len(json.load(f))
+    return elapsed, concepts
+
+
+def main():
+    args = parse_args()
+    server, url = start_server(latency=args.latency, rate_429=args.rate_429, retry_after=args.retry_after,
+                               timeout=args.timeout, hang=10, malformed=args.malformed, seed=args.seed)
+    state = server.RequestHandlerClass.state
+    print(f"替身服务 {url}，平均延迟 {args.latency}s，429 概率 {args.rate_429}")
+    print(f"{'并发数':>6}{'耗时(s)':>10}{'段落/秒':>10}{'请求数':>8}{'429':>6}{'超时':>6}{'格式错误':>8}{'概念数':>8}")
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            segments_file = os.path.join(workdir, "segments.json")
+            with open(segments_file, "w", encoding="utf-8") as f:
+                json.dump(make_segments(args.segments, args.seed), f, ensure_ascii=False)
+            for workers in [int(w) for w in args.workers.split(",") if w]:
+                before = dict(state.counts)
+                elapsed, concepts = run_extractor(workdir, segments_file, url, workers, args)
+                counts = {key: state.counts[key] - before[key] for key in before}
+                print(f"{workers:>6}{elapsed:>10.2f}{args.segments / elapsed:>10.1f}{counts['requests']:>8}"
+                      f"{counts['throttled']:>6}{counts['timeouts']:>6}{counts['malformed']:>8}{concepts:>8}",
+                      flush=True)
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
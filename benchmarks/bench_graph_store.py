@@ -0,0 +1,91 @@
+# coding: utf-8
+"""FileGraphStore 查询性能基准：对比原先的线性扫描实现与索引实现
+
+用法: python benchmarks/bench_graph_store.py [概念数] [关系数]
+"""
+import os
+import sys
+import time
+import random
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api"))
+
+from graph_store import FileGraphStore  # noqa: E402
+from synthetic_graph import write_graph  # noqa: E402
+
+
+def legacy_get_concept(concepts, relations, concept_id):
+    """原 api/app.py 中的线性扫描实现，仅用于对比"""
+    for concept in concepts:
+        if concept.get("id") == concept_id:
+            concept_copy = concept.copy()
+            concept_copy["relations"] = []
+            for relation in relations:
+                if relation.get("src_id") == concept_id:
+                    target_id = relation.get("dst_id")
+                    target_concept = None
+                    for c in concepts:
+                        if c.get("id") == target_id:
+                            target_concept = c
+                            break
+                    if target_concept:
+                        concept_copy["relations"].append({
+                            "type": relation.get("relation_type"),
+                            "target_id": target_concept.get("id"),
+                            "target_name": target_concept.get("name"),
+                            "target_category": target_concept.get("category")
+                        })
+            return concept_copy
+    return None
+
+
+def legacy_get_concepts(concepts, category):
+    return [c for c in concepts if c.get("category") == category]
+
+
+def legacy_get_categories(concepts):
+    return list({c.get("category") for c in concepts if c.get("category")})
+
+
+def timeit(func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    num_concepts = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    num_relations = int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        write_graph(data_dir, num_concepts, num_relations)
+
+        start = time.perf_counter()
+        store = FileGraphStore(data_dir, precompute=False)
+        load_time = time.perf_counter() - start
+
+        rng = random.Random(0)
+        ids = [f"c{rng.randrange(num_concepts)}" for _ in range(20)]
+
+        results = [
+            ("get_concept",
+             timeit(lambda: [legacy_get_concept(store.concepts, store.relations, i) for i in ids], 1) / len(ids),
+             timeit(lambda: [store.get_concept(i) for i in ids], 50) / len(ids)),
+            ("get_concepts(category)",
+             timeit(lambda: legacy_get_concepts(store.concepts, "心所法"), 20),
+             timeit(lambda: store.get_concepts("心所法"), 200)),
+            ("get_categories",
+             timeit(lambda: legacy_get_categories(store.concepts), 20),
+             timeit(lambda: store.get_categories(), 2000)),
+        ]
+
+    print(f"图规模: {num_concepts} 个概念, {num_relations} 个关系, 加载并建立索引 {load_time * 1000:.1f} ms")
+    print(f"{'操作':<24}{'线性扫描(ms)':>14}{'索引(ms)':>12}{'加速比':>10}")
+    for name, legacy, indexed in results:
+        print(f"{name:<24}{legacy * 1000:>14.3f}{indexed * 1000:>12.4f}{legacy / indexed:>10.0f}x")
+
+
+if __name__ == "__main__":
+    main()
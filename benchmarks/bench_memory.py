@@ -0,0 +1,51 @@
+# coding: utf-8
+"""FileGraphStore 常驻内存对比：indexed（dict 索引）、compact（数组化）和 mapped（内存映射）模式
+
+mapped 模式的图数据位于映射文件中，由操作系统页缓存在各进程间共享，不计入进程私有的常驻内存，
+另行列出映射文件大小。
+
+用法: python benchmarks/bench_memory.py [概念数] [关系数]
+"""
+import os
+import sys
+import gc
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api"))
+
+from graph_store import FileGraphStore, STORE_MODES  # noqa: E402
+from synthetic_graph import write_graph  # noqa: E402
+
+
+def measure(data_dir, mode):
+    """返回加载完成后存储对象常驻的字节数"""
+    gc.collect()
+    tracemalloc.start()
+    store = FileGraphStore(data_dir, mode=mode, precompute=False)
+    gc.collect()
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del store
+    return retained
+
+
+def main():
+    num_concepts = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    num_relations = int(sys.argv[2]) if len(sys.argv) > 2 else 200000
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        write_graph(data_dir, num_concepts, num_relations)
+        print(f"图规模: {num_concepts} 个概念, {num_relations} 个关系")
+        print(f"{'模式':<10}{'常驻内存(MB)':>14}{'每条关系(字节)':>16}")
+        for mode in STORE_MODES:
+            retained = measure(data_dir, mode)
+            print(f"{mode:<10}{retained / 1024 / 1024:>14.1f}{retained / num_relations:>16.0f}")
+        for name in os.listdir(data_dir):
+            if name.endswith(".map"):
+                size = os.path.getsize(os.path.join(data_dir, name))
+                print(f"mapped 模式的映射文件（各进程共享）: {size / 1024 / 1024:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
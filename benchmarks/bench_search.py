@@ -0,0 +1,63 @@
+# coding: utf-8
+"""概念全文检索基准：用《法宗原》文本随机拼出概念，测量建索引时间与查询延迟
+
+用法: python benchmarks/bench_search.py [概念数]
+"""
+import os
+import sys
+import time
+import random
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT, "api"))
+
+from search_index import SearchIndex  # noqa: E402
+from cjk_text import is_cjk  # noqa: E402
+
+CATEGORIES = ["色法", "心法", "心所法", "心不相应行法", "无为法"]
+
+
+def make_concepts(num_concepts, seed=42):
+    with open(os.path.join(ROOT, "data", "fazongyuan.txt"), "r", encoding="utf-8-sig") as f:
+        text = "".join(ch for ch in f.read() if is_cjk(ch))
+    rng = random.Random(seed)
+    concepts = []
+    for i in range(num_concepts):
+        start = rng.randrange(len(text) - 40)
+        name_len = rng.randint(2, 4)
+        concepts.append({
+            "id": f"c{i}",
+            "name": text[start:start + name_len],
+            "description": text[start:start + rng.randint(15, 40)],
+            "category": CATEGORIES[i % len(CATEGORIES)],
+            "pali": f"dhamma{i % 997}"
+        })
+    return concepts
+
+
+def main():
+    num_concepts = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    concepts = make_concepts(num_concepts)
+
+    start = time.perf_counter()
+    index = SearchIndex(concepts)
+    build_time = time.perf_counter() - start
+    print(f"{num_concepts} 个概念，建索引 {build_time:.2f} s，{len(index.postings)} 个 gram")
+
+    rng = random.Random(0)
+    queries = ["色", "法", "心所", "無為", "五蘊", "dhamma12"]
+    queries += [c["name"] for c in rng.sample(concepts, 200)]
+    for category in (None, "心所法"):
+        latencies = []
+        for query in queries:
+            start = time.perf_counter()
+            index.search(query, category, 20)
+            latencies.append(time.perf_counter() - start)
+        latencies.sort()
+        p50 = latencies[len(latencies) // 2] * 1000
+        p99 = latencies[int(len(latencies) * 0.99)] * 1000
+        print(f"分类过滤={category or '无'}: {len(queries)} 个查询，p50 {p50:.3f} ms，p99 {p99:.3f} ms，最大 {latencies[-1] * 1000:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+# coding: utf-8
+"""FileGraphStore 冷启动时间：从 JSON 解析并建索引 与 载入二进制快照文件 对比
+
+mapped 模式不使用二进制快照文件，对应的是映射文件：JSON 一栏包含第一次写出映射文件，
+写快照一栏为 write_mapped 的用时，载入快照一栏为映射已有映射文件的启动用时。
+
+用法: python benchmarks/bench_startup.py [关系数 ...]
+默认测量 1 万、10 万、100 万条关系，概念数取关系数的四分之一。
+"""
+import os
+import sys
+import gc
+import json
+import time
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api"))
+
+from graph_store import FileGraphStore, STORE_MODES  # noqa: E402
+from mapped_graph import write_mapped  # noqa: E402
+from snapshot_file import write_snapshot  # noqa: E402
+from synthetic_graph import write_graph  # noqa: E402
+
+
+def timed_load(data_dir, mode, binary_snapshot):
+    gc.collect()
+    start = time.perf_counter()
+    store = FileGraphStore(data_dir, mode=mode, binary_snapshot=binary_snapshot, precompute=False)
+    return store, time.perf_counter() - start
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10000, 100000, 1000000]
+    print(f"{'关系数':>10}{'模式':>10}{'JSON(s)':>10}{'写快照(s)':>12}{'快照(MB)':>10}{'载入快照(s)':>14}{'加速':>8}")
+    for num_relations in sizes:
+        with tempfile.TemporaryDirectory() as data_dir:
+            write_graph(data_dir, num_relations // 4, num_relations)
+            snapshot_path = os.path.join(data_dir, "graph.snapshot")
+            for mode in STORE_MODES:
+                store, json_time = timed_load(data_dir, mode, False)
+
+                if mode == "mapped":
+                    # 快照持有 mmap，不能序列化；改为重新写出映射文件，之后的启动直接映射该文件
+                    path = store._mapped_path(store.version)
+                    with open(store.concepts_file, encoding="utf-8") as f:
+                        concepts = json.load(f)
+                    with open(store.relations_file, encoding="utf-8") as f:
+                        relations = json.load(f)
+                    start = time.perf_counter()
+                    write_mapped(path, concepts, relations, store.version)
+                    write_time = time.perf_counter() - start
+                else:
+                    path = snapshot_path
+                    start = time.perf_counter()
+                    write_snapshot(path, store.snapshot, mode)
+                    write_time = time.perf_counter() - start
+                del store
+
+                store, snapshot_time = timed_load(data_dir, mode, True)
+                del store
+                print(f"{num_relations:>10}{mode:>10}{json_time:>10.2f}{write_time:>12.2f}"
+                      f"{os.path.getsize(path) / 1024 / 1024:>10.1f}{snapshot_time:>14.2f}"
+                      f"{json_time / snapshot_time:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
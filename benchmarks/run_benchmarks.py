@@ -0,0 +1,215 @@
+# coding: utf-8
+"""FileGraphStore 基准套件：在不同规模的合成图上测量加载与查询耗时，输出 JSON 并检查性能回退
+
+用法:
+    python benchmarks/run_benchmarks.py [--sizes 1000,10000,100000] [--modes indexed,compact,mapped]
+                                        [--output results.json] [--baseline baseline.json] [--tolerance 0.5]
+                                        [--repeat 3]
+
+图由 synthetic_graph 按五位七十五法的结构生成，关系数为概念数的 3 倍。每个规模、每种存储模式测量：
+- load_data：构造 FileGraphStore（读取 JSON、建立索引）的时间，mapped 模式另测已有映射文件时的启动时间
+- centrality：每个数据版本一次的中心性计算（需要 numpy）；同时检查根概念排在只有一条关系的叶子概念之前，否则以退出码 1 结束
+- get_concept：随机抽取的概念（按关系数加权，热门概念更常被抽到）的单次耗时，取中位数和 p99
+- get_concepts(category)：五位各分类的平均耗时
+- get_categories：单次平均耗时
+各指标取 --repeat 轮中最好的一轮。查询结果缓存在测量时关闭，测的是查询本身。指定 --baseline 时，任一指标比基线慢 tolerance 以上
+（且差值超过 MIN_REGRESSION_SECONDS）即视为回退，列出后以退出码 1 结束，可直接用于 CI。
+"""
+import os
+import sys
+import gc
+import json
+import time
+import random
+import platform
+import argparse
+import tempfile
+import statistics
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "api"))
+
+from graph_centrality import Centrality  # noqa: E402
+from graph_store import FileGraphStore, STORE_MODES  # noqa: E402
+from synthetic_graph import CATEGORIES, write_graph  # noqa: E402
+
+DEFAULT_SIZES = (1000, 10000, 100000)
+CONCEPT_SAMPLES = 500
+# 低于该差值（秒）的变化视为测量噪声，不算回退
+MIN_REGRESSION_SECONDS = 0.00005
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="FileGraphStore 基准套件")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                        help="逗号分隔的概念数，默认 1000,10000,100000（可加到 1000000）")
+    parser.add_argument("--modes", default=",".join(STORE_MODES), help="逗号分隔的存储模式")
+    parser.add_argument("--output", help="把结果写入该 JSON 文件")
+    parser.add_argument("--baseline", help="与该 JSON 结果文件比较，有回退时以退出码 1 结束")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="允许比基线慢的比例，默认 0.5")
+    parser.add_argument("--repeat", type=int, default=3, help="每个指标测量的轮数，取最好的一轮，默认 3")
+    parser.add_argument("--seed", type=int, default=42)
+    return parser.parse_args()
+
+
+def timed(func):
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def mean_time(func, min_seconds=0.2, max_repeat=10000):
+    """重复调用 func 直到累计超过 min_seconds，返回单次平均耗时"""
+    repeat = 0
+    start = time.perf_counter()
+    while True:
+        func()
+        repeat += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds or repeat >= max_repeat:
+            return elapsed / repeat
+
+
+def sample_ids(data_dir, count, seed):
+    """按关系数加权抽取概念ID：线上访问集中在热门概念上"""
+    with open(os.path.join(data_dir, "relations.json"), "r", encoding="utf-8") as f:
+        relations = json.load(f)
+    endpoints = [r["src_id"] for r in relations] + [r["dst_id"] for r in relations]
+    rng = random.Random(seed)
+    return [rng.choice(endpoints) for _ in range(count)]
+
+
+def load_store(data_dir, mode, cold=True):
+    """返回 (store, 构造耗时)；mapped 模式冷启动前删除已有的映射文件"""
+    if mode == "mapped" and cold:
+        for name in os.listdir(data_dir):
+            if name.endswith(".map"):
+                os.remove(os.path.join(data_dir, name))
+    gc.collect()
+    start = time.perf_counter()
+    store = FileGraphStore(data_dir, mode=mode, result_cache_bytes=0, precompute=False)
+    return store, time.perf_counter() - start
+
+
+def misranked_leaves(store):
+    """按中心性排在根概念 c0 之前、只有一条关系的叶子概念的ID"""
+    graph = store.graph
+    centrality = store.get_centrality()
+    root_rank = centrality.rank[graph.concept_position("c0")]
+    leaves = (centrality.degree == 1) & (centrality.rank < root_rank)
+    return [graph.concept_at(int(position)).get("id") for position in leaves.nonzero()[0]]
+
+
+def bench_mode(data_dir, mode, ids, repeat):
+    """各指标取 repeat 轮中最好的一轮，减少机器负载波动的影响"""
+    metrics = {}
+    load_times = []
+    for _ in range(repeat):
+        store, elapsed = load_store(data_dir, mode)
+        load_times.append(elapsed)
+        store.close()
+        del store
+    metrics["load_data"] = min(load_times)
+    if mode == "mapped":
+        warm_times = []
+        for _ in range(repeat):
+            store, elapsed = load_store(data_dir, mode, cold=False)
+            warm_times.append(elapsed)
+            store.close()
+            del store
+        metrics["load_data_mapped_warm"] = min(warm_times)
+
+    store, _ = load_store(data_dir, mode, cold=False)
+    # 中心性在每个数据版本第一次查询概念详情时计算一次，单独计时；先算好，不计入下面的查询
+    try:
+        misranked = misranked_leaves(store)
+        if misranked:
+            sys.exit(f"中心性排序错误（{mode}）：{len(misranked)} 个叶子概念排在根概念之前，如 {misranked[:5]}")
+        metrics["centrality"] = min(timed(lambda: Centrality(store.graph)) for _ in range(repeat))
+    except RuntimeError:
+        pass
+
+    # 每个概念取各轮中的最短耗时，再求中位数和 p99
+    durations = [float("inf")] * len(ids)
+    for _ in range(repeat):
+        for i, concept_id in enumerate(ids):
+            durations[i] = min(durations[i], timed(lambda: store.get_concept(concept_id)))
+    durations.sort()
+    metrics["get_concept_p50"] = statistics.median(durations)
+    metrics["get_concept_p99"] = durations[int(len(durations) * 0.99) - 1]
+    metrics["get_concepts_category"] = min(
+        statistics.mean(mean_time(lambda: store.get_concepts(category), max_repeat=50) for category in CATEGORIES)
+        for _ in range(repeat))
+    metrics["get_categories"] = min(mean_time(store.get_categories) for _ in range(repeat))
+    store.close()
+    return metrics
+
+
+def run(sizes, modes, seed, repeat):
+    results = []
+    for num_concepts in sizes:
+        with tempfile.TemporaryDirectory() as data_dir:
+            concept_count, relation_count = write_graph(data_dir, num_concepts, seed=seed)
+            ids = sample_ids(data_dir, CONCEPT_SAMPLES, seed)
+            for mode in modes:
+                metrics = bench_mode(data_dir, mode, ids, repeat)
+                results.append({
+                    "concepts": concept_count,
+                    "relations": relation_count,
+                    "mode": mode,
+                    "metrics": metrics
+                })
+                print(f"{concept_count:>9} {mode:<8} " + "  ".join(
+                    f"{name}={value * 1000:.3f}ms" for name, value in metrics.items()), flush=True)
+    return results
+
+
+def find_regressions(results, baseline, tolerance):
+    """返回 [(概念数, 模式, 指标, 基线秒数, 当前秒数)]；基线中没有的组合不比较"""
+    previous = {(r["concepts"], r["mode"]): r["metrics"] for r in baseline["results"]}
+    regressions = []
+    for result in results:
+        old_metrics = previous.get((result["concepts"], result["mode"]))
+        if old_metrics is None:
+            continue
+        for name, value in result["metrics"].items():
+            old = old_metrics.get(name)
+            if old is not None and value > old * (1 + tolerance) and value - old > MIN_REGRESSION_SECONDS:
+                regressions.append((result["concepts"], result["mode"], name, old, value))
+    return regressions
+
+
+def main():
+    args = parse_args()
+    sizes = [int(size) for size in args.sizes.split(",") if size]
+    modes = [mode for mode in args.modes.split(",") if mode]
+    for mode in modes:
+        if mode not in STORE_MODES:
+            sys.exit(f"未知的存储模式: {mode}")
+
+    report = {
+        "created": time.time(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "unit": "seconds",
+        "results": run(sizes, modes, args.seed, args.repeat)
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"结果已写入 {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = find_regressions(report["results"], baseline, args.tolerance)
+        if regressions:
+            print(f"性能回退（比基线慢 {args.tolerance:.0%} 以上）:")
+            for concepts, mode, name, old, new in regressions:
+                print(f"  {concepts} {mode} {name}: {old * 1000:.3f}ms → {new * 1000:.3f}ms ({new / old:.2f}x)")
+            sys.exit(1)
+        print("与基线相比没有性能回退")
+
+
+if __name__ == "__main__":
+    main()
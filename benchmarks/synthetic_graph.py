@@ -0,0 +1,117 @@
+# coding: utf-8
+"""按五位七十五法的结构合成概念图，供各基准脚本使用
+
+图的骨架与真实数据一致：根概念"五位七十五法"（核心概念）→ 五位（分类"五位"）→
+俱舍论的七十五法（心所法下另有大地法等六组），其余概念逐个挂到已有概念之下，
+父节点按"已有子节点数 + 1"的比例选取（优先连接），各层子概念数呈幂律分布，
+分类沿用所属的五位。树之外的关系两端都按 Zipf 分布抽取，少数热门概念集中了大部分关系。
+同样的参数和种子总是生成同样的图；概念ID为 c0、c1……，c0 为根概念。
+
+也可以直接运行，把图写入指定目录：
+用法: python benchmarks/synthetic_graph.py 输出目录 [概念数] [关系数]
+"""
+import os
+import sys
+import json
+import random
+from itertools import accumulate
+
+FIVE_POSITIONS = {
+    "色法": ["眼", "耳", "鼻", "舌", "身", "色", "声", "香", "味", "触", "无表色"],
+    "心法": ["心"],
+    "心所法": {
+        "大地法": ["受", "想", "思", "触", "欲", "慧", "念", "作意", "胜解", "三摩地"],
+        "大善地法": ["信", "勤", "舍", "惭", "愧", "无贪", "无瞋", "不害", "轻安", "不放逸"],
+        "大烦恼地法": ["痴", "放逸", "懈怠", "不信", "惛沉", "掉举"],
+        "大不善地法": ["无惭", "无愧"],
+        "小烦恼地法": ["忿", "覆", "悭", "嫉", "恼", "害", "恨", "谄", "诳", "憍"],
+        "不定地法": ["恶作", "睡眠", "寻", "伺", "贪", "瞋", "慢", "疑"],
+    },
+    "心不相应行法": ["得", "非得", "同分", "无想果", "无想定", "灭尽定", "命根",
+                     "生", "住", "异", "灭", "名身", "句身", "文身"],
+    "无为法": ["虚空", "择灭", "非择灭"],
+}
+CATEGORIES = list(FIVE_POSITIONS)
+# 树之外的关系类型及其出现比例
+RELATION_TYPES = [("相应", 5), ("俱有", 3), ("因缘", 3), ("对治", 2), ("属于", 1)]
+# Zipf 分布的指数，越大关系越集中在少数概念上
+ZIPF_EXPONENT = 0.8
+
+
+def generate(num_concepts, num_relations=None, seed=42):
+    """返回 (concepts, relations)；num_relations 默认为概念数的 3 倍（含树中的包含关系）"""
+    if num_relations is None:
+        num_relations = 3 * num_concepts
+    rng = random.Random(seed)
+    concepts = []
+    relations = []
+
+    def add_concept(name, category, description, parent=None, weight=1):
+        concept_id = f"c{len(concepts)}"
+        concepts.append({"id": concept_id, "name": name, "description": description, "category": category})
+        if parent is not None:
+            relations.append({"src_id": parent, "dst_id": concept_id, "relation_type": "包含", "weight": weight})
+        return concept_id
+
+    # 骨架：根概念、五位、（心所法的六组）、七十五法
+    root = add_concept("五位七十五法", "核心概念", "阿毗达摩将一切法分为五位七十五法")
+    leaves = []
+    for position, members in FIVE_POSITIONS.items():
+        position_id = add_concept(position, "五位", f"五位之一：{position}", root, 5)
+        groups = members.items() if isinstance(members, dict) else [(None, members)]
+        for group, names in groups:
+            parent = add_concept(group, position, f"{position}中的{group}", position_id, 4) if group else position_id
+            for name in names:
+                leaves.append((add_concept(name, position, f"{position}之一：{name}", parent, 3), name, position))
+
+    # 其余概念按优先连接挂到七十五法及其后代之下；pool 中每个概念出现 (子节点数 + 1) 次
+    pool = list(leaves)
+    while len(concepts) < num_concepts:
+        parent, parent_name, position = pool[rng.randrange(len(pool))]
+        name = f"{parent_name}·{len(concepts)}"
+        child = (add_concept(name, position, f"{parent_name}的细分：{name}", parent, rng.randint(1, 3)),
+                 name, position)
+        pool.append(child)
+        pool.append((parent, parent_name, position))
+
+    # 树之外的关系：两端按 Zipf 分布抽取，热门概念在ID上随机分散
+    total = len(concepts)
+    extra = max(0, num_relations - len(relations))
+    if extra and total > 1:
+        ranks = list(range(total))
+        rng.shuffle(ranks)
+        cum_weights = list(accumulate(1.0 / (rank + 1) ** ZIPF_EXPONENT for rank in ranks))
+        sources = rng.choices(range(total), cum_weights=cum_weights, k=extra)
+        targets = rng.choices(range(total), cum_weights=cum_weights, k=extra)
+        types = rng.choices([t for t, _ in RELATION_TYPES], weights=[w for _, w in RELATION_TYPES], k=extra)
+        for src, dst, relation_type in zip(sources, targets, types):
+            if src == dst:
+                dst = (dst + 1) % total
+            relations.append({"src_id": f"c{src}", "dst_id": f"c{dst}", "relation_type": relation_type,
+                              "weight": rng.randint(1, 5)})
+    return concepts, relations
+
+
+def write_graph(data_dir, num_concepts, num_relations=None, seed=42):
+    """生成图并写入 data_dir 下的 concepts.json / relations.json"""
+    concepts, relations = generate(num_concepts, num_relations, seed)
+    os.makedirs(data_dir, exist_ok=True)
+    with open(os.path.join(data_dir, "concepts.json"), "w", encoding="utf-8") as f:
+        json.dump(concepts, f, ensure_ascii=False)
+    with open(os.path.join(data_dir, "relations.json"), "w", encoding="utf-8") as f:
+        json.dump(relations, f, ensure_ascii=False)
+    return len(concepts), len(relations)
+
+
+def main():
+    if len(sys.argv) < 2:
+        print(__doc__.strip().splitlines()[-1])
+        sys.exit(1)
+    num_concepts = int(sys.argv[2]) if len(sys.argv) > 2 else 10000
+    num_relations = int(sys.argv[3]) if len(sys.argv) > 3 else None
+    concept_count, relation_count = write_graph(sys.argv[1], num_concepts, num_relations)
+    print(f"已写入 {concept_count} 个概念、{relation_count} 个关系到 {sys.argv[1]}")
+
+
+if __name__ == "__main__":
+    main()
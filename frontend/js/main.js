@@ -82,27 +82,7 @@ async function loadConcepts(category = '') {
         if (Array.isArray(concepts)) {
             // 更新图谱统计
             updateGraphStats(concepts);
-            
-            // 渲染概念卡片
-            conceptsContainer.innerHTML = '';
-            concepts.forEach(concept => {
-                const card = document.createElement('div');
-                card.className = 'concept-card';
-                card.setAttribute('data-id', concept.id);
-                
-                card.innerHTML = `
-                    <h3>${concept.name}</h3>
-                    <p>${concept.description}</p>
-                    <div class="category-tag">${concept.category || '未分类'}</div>
-                `;
-                
-                card.addEventListener('click', () => showConceptDetail(concept.id));
-                conceptsContainer.appendChild(card);
-            });
-            
-            if (concepts.length === 0) {
-                conceptsContainer.innerHTML = '<p>没有找到符合条件的概念</p>';
-            }
+            renderConcepts(concepts);
         }
     } catch (error) {
         console.error('加载概念失败:', error);
@@ -110,6 +90,29 @@ async function loadConcepts(category = '') {
     }
 }
 
+// 渲染概念卡片
+function renderConcepts(concepts) {
+    conceptsContainer.innerHTML = '';
+    concepts.forEach(concept => {
+        const card = document.createElement('div');
+        card.className = 'concept-card';
+        card.setAttribute('data-id', concept.id);
+        
+        card.innerHTML = `
+            <h3>${concept.name}</h3>
+            <p>${concept.description}</p>
+            <div class="category-tag">${concept.category || '未分类'}</div>
+        `;
+        
+        card.addEventListener('click', () => showConceptDetail(concept.id));
+        conceptsContainer.appendChild(card);
+    });
+    
+    if (concepts.length === 0) {
+        conceptsContainer.innerHTML = '<p>没有找到符合条件的概念</p>';
+    }
+}
+
 // 更新图谱统计
 function updateGraphStats(concepts) {
     if (!Array.isArray(concepts) || concepts.length === 0) return;
@@ -196,14 +199,13 @@ async function showConceptDetail(conceptId) {
 
 // 初始化图谱可视化
 function initGraph() {
-    // 这里使用D3.js创建力导向图
-    // 注意：这是一个简化版本，实际项目中可能需要更复杂的实现
+    // 节点坐标由服务端预计算（/api/layout，按数据版本缓存），这里只负责绘制，不再在浏览器中运行力导向模拟
     graphContainer.innerHTML = '<div class="loading">正在加载图谱数据...</div>';
     
-    fetch(`${API_URL}/concepts`)
+    fetch(`${API_URL}/layout`)
         .then(response => response.json())
-        .then(concepts => {
-            if (!Array.isArray(concepts) || concepts.length === 0) {
+        .then(layout => {
+            if (!layout.nodes || layout.nodes.length === 0) {
                 graphContainer.innerHTML = '<p>没有可用的图谱数据</p>';
                 return;
             }
@@ -218,7 +220,7 @@ function initGraph() {
             
             // 创建缩放功能
             const zoom = d3.zoom()
-                .scaleExtent([0.1, 4])
+                .scaleExtent([0.05, 8])
                 .on('zoom', (event) => {
                     container.attr('transform', event.transform);
                 });
@@ -227,31 +229,29 @@ function initGraph() {
             
             const container = svg.append('g');
             
-            // 模拟关系数据
-            const nodes = concepts.map(c => ({
-                id: c.id,
-                name: c.name,
-                category: c.category || '未分类'
+            const nodes = layout.nodes.map(n => ({
+                id: n.id,
+                name: n.name,
+                category: n.category || '未分类',
+                x: n.x,
+                y: n.y
+            }));
+            const nodeById = new Map(nodes.map(n => [n.id, n]));
+            const links = layout.edges.map(e => ({
+                source: nodeById.get(e.source),
+                target: nodeById.get(e.target),
+                type: e.type
             }));
             
-            // 简单地创建一些连接，实际中应该从API获取
-            const links = [];
-            for (let i = 0; i < Math.min(concepts.length, 20); i++) {
-                const source = nodes[i];
-                const target = nodes[Math.floor(Math.random() * nodes.length)];
-                if (source.id !== target.id) {
-                    links.push({ source: source.id, target: target.id });
-                }
-            }
-            
-            // 设置力导向图
-            const simulation = d3.forceSimulation(nodes)
-                .force('link', d3.forceLink(links).id(d => d.id).distance(100))
-                .force('charge', d3.forceManyBody().strength(-200))
-                .force('center', d3.forceCenter(
-                    graphContainer.clientWidth / 2, 
-                    graphContainer.clientHeight / 2
-                ));
+            // 布局坐标在 [0, 1000] 区间，初始视图把整个布局缩放到容器中央
+            const size = 1000;
+            const width = graphContainer.clientWidth;
+            const height = graphContainer.clientHeight;
+            const scale = Math.min(width, height) / (size * 1.1) || 1;
+            const initialTransform = d3.zoomIdentity
+                .translate((width - size * scale) / 2, (height - size * scale) / 2)
+                .scale(scale);
+            svg.call(zoom.transform, initialTransform);
             
             // 绘制连接
             const link = container.append('g')
@@ -267,10 +267,7 @@ function initGraph() {
                 .selectAll('g')
                 .data(nodes)
                 .enter().append('g')
-                .call(d3.drag()
-                    .on('start', dragstarted)
-                    .on('drag', dragged)
-                    .on('end', dragended))
+                .call(d3.drag().on('drag', dragged))
                 .on('click', (event, d) => showConceptDetail(d.id));
             
             // 节点圆圈
@@ -278,14 +275,13 @@ function initGraph() {
                 .attr('r', 10)
                 .attr('fill', d => categoryColor(d.category));
             
-            // 节点文本
-            node.append('text')
+            // 节点文本；节点很多时文字相互重叠且拖慢绘制，只显示前 500 个节点的名称
+            node.filter((d, i) => i < 500).append('text')
                 .attr('dx', 12)
                 .attr('dy', '.35em')
                 .text(d => d.name);
             
-            // 更新力导向图
-            simulation.on('tick', () => {
+            function updatePositions() {
                 link
                     .attr('x1', d => d.source.x)
                     .attr('y1', d => d.source.y)
@@ -294,24 +290,20 @@ function initGraph() {
                 
                 node
                     .attr('transform', d => `translate(${d.x},${d.y})`);
-            });
-            
-            // 拖拽功能
-            function dragstarted(event, d) {
-                if (!event.active) simulation.alphaTarget(0.3).restart();
-                d.fx = d.x;
-                d.fy = d.y;
             }
             
-            function dragged(event, d) {
-                d.fx = event.x;
-                d.fy = event.y;
-            }
+            updatePositions();
             
-            function dragended(event, d) {
-                if (!event.active) simulation.alphaTarget(0);
-                d.fx = null;
-                d.fy = null;
+            // 拖拽功能：只移动被拖动的节点及其连接
+            function dragged(event, d) {
+                d.x = event.x;
+                d.y = event.y;
+                d3.select(this).attr('transform', `translate(${d.x},${d.y})`);
+                link.filter(l => l.source === d || l.target === d)
+                    .attr('x1', l => l.source.x)
+                    .attr('y1', l => l.source.y)
+                    .attr('x2', l => l.target.x)
+                    .attr('y2', l => l.target.y);
             }
             
             // 为缩放按钮添加事件
@@ -330,7 +322,7 @@ function initGraph() {
             document.getElementById('reset-view').addEventListener('click', () => {
                 svg.transition()
                     .duration(300)
-                    .call(zoom.transform, d3.zoomIdentity);
+                    .call(zoom.transform, initialTransform);
             });
         })
         .catch(error => {
@@ -370,21 +362,28 @@ categoryFilter.addEventListener('change', () => {
     loadConcepts(categoryFilter.value);
 });
 
-// 搜索功能
-searchInput.addEventListener('input', debounce(function() {
-    const searchTerm = this.value.toLowerCase().trim();
-    const cards = conceptsContainer.querySelectorAll('.concept-card');
+// 搜索功能（服务端检索，支持繁简通检）
+searchInput.addEventListener('input', debounce(async function() {
+    const searchTerm = this.value.trim();
+    if (!searchTerm) {
+        loadConcepts(categoryFilter.value);
+        return;
+    }
     
-    cards.forEach(card => {
-        const name = card.querySelector('h3').textContent.toLowerCase();
-        const description = card.querySelector('p').textContent.toLowerCase();
-        
-        if (name.includes(searchTerm) || description.includes(searchTerm)) {
-            card.style.display = 'block';
-        } else {
-            card.style.display = 'none';
+    try {
+        let url = `${API_URL}/search?q=${encodeURIComponent(searchTerm)}&limit=100`;
+        if (categoryFilter.value) {
+            url += `&category=${encodeURIComponent(categoryFilter.value)}`;
         }
-    });
+        const response = await fetch(url);
+        const data = await response.json();
+        if (Array.isArray(data.results)) {
+            renderConcepts(data.results);
+        }
+    } catch (error) {
+        console.error('搜索失败:', error);
+        conceptsContainer.innerHTML = '<p>搜索失败</p>';
+    }
 }, 300));
 
 // 防抖函数
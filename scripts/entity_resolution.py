@@ -0,0 +1,200 @@
+# entity_resolution.py
+"""提取结果的实体消解：把不同段落中以不同ID返回的同一个法合并为一个概念
+
+模型为同一个法给出的ID各不相同（vedana、feeling、vedanā），只按ID去重合并不了。这里分两步找出重复：
+- 精确键：规范化后的中文名（繁简折叠，对照表与检索共用 api/cjk_text.py）、
+  去掉变音符号和标点后的ID、巴利语名、梵语名，相同即视为同一概念
+- 近似匹配：名称和ID的字符 n-gram 集合做 MinHash，按 LSH 分桶，只比较同一桶内的概念，
+  n-gram 的 Jaccard 相似度不低于 JACCARD_THRESHOLD、首字相同且其中的数字相同时合并。首字不同的不合并，
+  以免 kusala 与 akusala、善与不善这类只差一个否定前缀的概念被合并；数字不同的（dharma_25 与 dharma_41）也不合并
+
+两步都要求分类相容（任一方没有分类，或一方的分类包含另一方），避免"触"（色法）与"触"（心所法）这类同名异法被合并。
+相容性按两组已合并成员的全部分类检查，没有分类的"触"不会把两个分类不相容的"触"连成一组。
+每个键、每个桶只和最多 MAX_BUCKET_COMPARISONS 个已有概念比较，总耗时与概念数近似线性。
+合并后保留最先出现的概念的ID，其余ID记入 aliases，关系的两端改写为保留的ID。
+"""
+import os
+import re
+import sys
+import struct
+import hashlib
+import logging
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api"))
+
+from cjk_text import fold, index_grams  # noqa: E402
+
+# 16 个哈希分 4 段、每段 4 个，Jaccard 约 0.7 以上的两个概念大概率落入同一个桶
+NUM_HASHES = 16
+BANDS = 4
+JACCARD_THRESHOLD = 0.7
+MAX_BUCKET_COMPARISONS = 20
+# 合并时以先出现的非空值为准的字段；description 取最长的
+FILL_FIELDS = ("name", "category", "pali", "sanskrit")
+
+# 每个 n-gram 的 NUM_HASHES 个哈希值取自一次 blake2b 摘要
+_HASH_FORMAT = struct.Struct(f"<{NUM_HASHES}I")
+_NON_ALNUM = re.compile(r"[^0-9a-z]")
+_DIGITS = re.compile(r"\d+")
+
+
+def latin_key(text, folded=None):
+    """ID、巴利语名、梵语名的规范形式：去掉变音符号、标点和大小写（vedanā → vedana）"""
+    return _NON_ALNUM.sub("", fold(text or "") if folded is None else folded)
+
+
+def merge_attributes(target, other):
+    """把 other 的字段并入 target：空字段取 other 的值，description 取较长的"""
+    for field in FILL_FIELDS:
+        if not target.get(field) and other.get(field):
+            target[field] = other[field]
+    if len(other.get("description") or "") > len(target.get("description") or ""):
+        target["description"] = other["description"]
+    for key, value in other.items():
+        if key not in target and key not in ("id", "aliases"):
+            target[key] = value
+    return target
+
+
+class _UnionFind:
+    """并查集；每组记下其成员的全部非空分类"""
+
+    def __init__(self, categories):
+        self.parent = list(range(len(categories)))
+        self.categories = [{category} if category else set() for category in categories]
+
+    def find(self, i):
+        parent = self.parent
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    def union(self, i, j):
+        """合并两个集合，编号较小（先出现）的作为代表"""
+        i, j = self.find(i), self.find(j)
+        if i != j:
+            if j < i:
+                i, j = j, i
+            self.parent[j] = i
+            self.categories[i] |= self.categories[j]
+            self.categories[j] = None
+
+    def compatible(self, i, j):
+        """i、j 所在两组的分类两两相容"""
+        a, b = self.categories[self.find(i)], self.categories[self.find(j)]
+        return all(_compatible(x, y) for x in a for y in b)
+
+
+def _compatible(a, b):
+    return not a or not b or a in b or b in a
+
+
+def _signature(grams, cache):
+    tuples = []
+    for gram in grams:
+        hashes = cache.get(gram)
+        if hashes is None:
+            digest = hashlib.blake2b(gram.encode("utf-8"), digest_size=_HASH_FORMAT.size).digest()
+            hashes = cache[gram] = _HASH_FORMAT.unpack(digest)
+        tuples.append(hashes)
+    return tuple(map(min, zip(*tuples)))
+
+
+def resolve_entities(concepts, relations):
+    """concepts 为 {id: 概念}（按首次出现的顺序），relations 为关系列表
+
+    返回 (合并后的 {id: 概念}, 端点改写后的关系列表, {原ID: 保留的ID})；不修改传入的对象
+    """
+    ids = list(concepts)
+    items = [concepts[concept_id] for concept_id in ids]
+    union = _UnionFind([fold(str(item.get("category") or "")).strip() for item in items])
+    folded_ids = [fold(str(concept_id)) for concept_id in ids]
+    folded_names = [fold(str(item.get("name") or "")).strip() for item in items]
+
+    def try_merge(i, candidates, check=None):
+        for j in candidates:
+            root = union.find(j)
+            if union.find(i) == root:
+                return True
+            # 近似匹配与组的代表比较，避免相似关系沿链条传递到不相干的概念
+            if union.compatible(i, root) and (check is None or check(i, root)):
+                union.union(i, j)
+                return True
+        if len(candidates) < MAX_BUCKET_COMPARISONS:
+            candidates.append(i)
+        return False
+
+    # 第一步：精确键
+    owners = {}
+    for i, item in enumerate(items):
+        keys = [("latin", latin_key(None, folded_ids[i])), ("name", folded_names[i])]
+        keys += [("latin", latin_key(str(item.get(field) or ""))) for field in ("pali", "sanskrit")]
+        for key in keys:
+            if key[1]:
+                try_merge(i, owners.setdefault(key, []))
+
+    # 第二步：名称和ID的 n-gram 做 MinHash LSH
+    gram_sets = []
+    keys = []
+    hash_cache = {}
+    buckets = {}
+    rows = NUM_HASHES // BANDS
+
+    def similar(i, j):
+        a, b = gram_sets[i], gram_sets[j]
+        return keys[i] == keys[j] and len(a & b) >= JACCARD_THRESHOLD * len(a | b)
+
+    for i, item in enumerate(items):
+        label = (folded_names[i] + " " + folded_ids[i]).strip()
+        grams = index_grams(label)
+        gram_sets.append(grams)
+        keys.append((label[:1], _DIGITS.findall(label)))
+        if not grams:
+            continue
+        signature = _signature(grams, hash_cache)
+        for band in range(BANDS):
+            bucket = buckets.setdefault((band, signature[band * rows:(band + 1) * rows]), [])
+            try_merge(i, bucket, similar)
+
+    # 合并各组的属性
+    mapping = {}
+    merged = {}
+    for i, concept_id in enumerate(ids):
+        root_id = ids[union.find(i)]
+        mapping[concept_id] = root_id
+        if root_id == concept_id:
+            merged[concept_id] = dict(items[i])
+            if "aliases" in items[i]:
+                merged[concept_id]["aliases"] = list(items[i]["aliases"])
+        else:
+            target = merged[root_id]
+            merge_attributes(target, items[i])
+            target.setdefault("aliases", []).append(concept_id)
+            target["aliases"].extend(items[i].get("aliases") or [])
+
+    # 关系端点不是已知ID时，再按规范化的ID查找（如关系写 vedanā、概念ID为 vedana）
+    by_latin = {}
+    for concept_id, folded in zip(ids, folded_ids):
+        key = latin_key(None, folded)
+        if key:
+            by_latin.setdefault(key, mapping[concept_id])
+
+    def resolve(endpoint):
+        if endpoint in mapping:
+            return mapping[endpoint]
+        key = latin_key(str(endpoint or ""))
+        return by_latin.get(key, endpoint) if key else endpoint
+
+    resolved = []
+    for relation in relations:
+        source, target = resolve(relation.get("source")), resolve(relation.get("target"))
+        # 两端合并为同一概念后形成的自环没有意义
+        if source == target and relation.get("source") != relation.get("target"):
+            continue
+        if source != relation.get("source") or target != relation.get("target"):
+            relation = dict(relation, source=source, target=target)
+        resolved.append(relation)
+
+    logging.info(f"实体消解: {len(ids)} 个概念合并为 {len(merged)} 个")
+    return merged, resolved, mapping
@@ -0,0 +1,122 @@
+# llm_cache.py
+"""LLM API 响应的本地缓存（SQLite）
+
+键为 (模型, temperature, max_tokens, 完整提示词) 的 SHA-256，值为 API 返回的原始 JSON。
+接口地址不是默认的 DeepSeek 地址时（如本地替身服务）地址也计入键，替身的响应不会在之后对真实接口的运行中被当作缓存使用。
+提示词不变的段落重跑时直接使用缓存，不再调用 API；缓存与输出目录无关，换目录重跑同样命中。
+- ttl 秒（0 表示永不过期）之前写入的条目视为过期，查询时忽略，prune() 时删除
+- 可被多个线程同时使用
+
+也可以直接运行来查看或清理缓存：
+用法: python llm_cache.py <缓存文件> [stats|prune|clear] [--ttl=秒数]
+"""
+import sys
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+
+
+# DeepSeek 的默认接口地址；该地址的缓存键不含地址，与加入地址之前写入的缓存保持一致
+DEFAULT_API_URL = "https://api.deepseek.com/v1/chat/completions"
+
+
+def cache_key(model, temperature, max_tokens, prompt, url=DEFAULT_API_URL):
+    fields = [model, temperature, max_tokens, prompt]
+    if url != DEFAULT_API_URL:
+        fields.append(url)
+    payload = json.dumps(fields, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    def __init__(self, path, ttl=0):
+        self.path = path
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, model TEXT, response TEXT NOT NULL, created REAL NOT NULL)")
+        self._conn.commit()
+
+    def _cutoff(self):
+        return time.time() - self.ttl if self.ttl > 0 else None
+
+    def get(self, key):
+        """返回缓存的响应，未命中或已过期时返回 None"""
+        with self._lock:
+            row = self._conn.execute("SELECT response, created FROM responses WHERE key = ?", (key,)).fetchone()
+            cutoff = self._cutoff()
+            if row is None or (cutoff is not None and row[1] < cutoff):
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key, model, response):
+        data = json.dumps(response, ensure_ascii=False)
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO responses (key, model, response, created) VALUES (?, ?, ?, ?)",
+                               (key, model, data, time.time()))
+            self._conn.commit()
+
+    def prune(self):
+        """删除过期条目，返回删除的条数；ttl 为 0 时不删除"""
+        cutoff = self._cutoff()
+        if cutoff is None:
+            return 0
+        with self._lock:
+            removed = self._conn.execute("DELETE FROM responses WHERE created < ?", (cutoff,)).rowcount
+            self._conn.commit()
+            if removed:
+                self._conn.execute("VACUUM")
+        return removed
+
+    def clear(self):
+        with self._lock:
+            removed = self._conn.execute("DELETE FROM responses").rowcount
+            self._conn.commit()
+            self._conn.execute("VACUUM")
+        return removed
+
+    def stats(self):
+        with self._lock:
+            count, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(response)), 0) FROM responses").fetchone()
+        return {"entries": count, "bytes": size, "hits": self.hits, "misses": self.misses}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def main():
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--ttl=")]
+    if not args:
+        print(__doc__.strip().splitlines()[-1])
+        sys.exit(1)
+    ttl = 0
+    for arg in sys.argv[1:]:
+        if arg.startswith("--ttl="):
+            ttl = float(arg.split("=")[1])
+    command = args[1] if len(args) > 1 else "stats"
+    cache = ResponseCache(args[0], ttl)
+    if command == "prune":
+        print(f"已删除 {cache.prune()} 个过期条目")
+    elif command == "clear":
+        print(f"已删除 {cache.clear()} 个条目")
+    elif command != "stats":
+        print(f"未知的命令: {command}")
+        sys.exit(1)
+    stats = cache.stats()
+    print(f"缓存 {args[0]}: {stats['entries']} 个条目, {stats['bytes']} 字节")
+    cache.close()
+
+
+if __name__ == "__main__":
+    main()
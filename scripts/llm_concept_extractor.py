@@ -5,9 +5,16 @@ import requests
 import time
 import sys
 import logging
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from dotenv import load_dotenv
 from datetime import datetime
 
+from entity_resolution import merge_attributes, resolve_entities
+from llm_cache import DEFAULT_API_URL, ResponseCache, cache_key
+from rate_limiter import AdaptiveRateLimiter, parse_retry_after
+from result_journal import ResultJournal, segment_hash
+from segment_packing import assign_results, format_batch, pack_segments, segment_to_text
+
 # 配置日志
 logging.basicConfig(
     level=logging.INFO,
@@ -23,17 +30,36 @@ load_dotenv()
 
 # DeepSeek API配置
 DEEPSEEK_API_KEY = os.getenv("DEEPSEEK_API_KEY")
+DEEPSEEK_API_URL = os.getenv("DEEPSEEK_API_URL", DEFAULT_API_URL)
 DEEPSEEK_MODEL = os.getenv("DEEPSEEK_MODEL", "deepseek-chat")
 TEMPERATURE = float(os.getenv("LLM_TEMPERATURE", 0.3))
 MAX_TOKENS = int(os.getenv("LLM_MAX_TOKENS", 4000))
+# 单次请求的超时（秒）
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", 120))
+# 并发调用数和每分钟最多发起的请求数（所有线程合计）
+LLM_WORKERS = int(os.getenv("LLM_WORKERS", 4))
+LLM_REQUESTS_PER_MINUTE = float(os.getenv("LLM_REQUESTS_PER_MINUTE", 60))
+# API响应缓存文件和有效期（秒，0 表示永不过期）
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "llm_cache.sqlite")
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", 0))
+# 每个请求中段落文本的 token 预算（0 表示每个段落单独请求、不切分），超长段落切分时相邻块的重叠 token 数
+LLM_PACK_TOKENS = int(os.getenv("LLM_PACK_TOKENS", 1500))
+LLM_SPLIT_OVERLAP = int(os.getenv("LLM_SPLIT_OVERLAP", 100))
+# 每写入一条段落结果后是否 fsync 结果日志
+LLM_JOURNAL_FSYNC = os.getenv("LLM_JOURNAL_FSYNC", "1") != "0"
+# 每条关系最多记录的来源段落数
+MAX_RELATION_SEGMENTS = 20
 
-# 检查API密钥
-if not DEEPSEEK_API_KEY:
-    logging.error("ERROR: DeepSeek API密钥未设置，请在.env文件中配置DEEPSEEK_API_KEY")
-    sys.exit(1)
+def extract_concepts_with_llm(text_segment, limiter=None, cache=None, packed=False):
+    """使用DeepSeek从文本段落中提取阿毗达摩法相概念
 
-def extract_concepts_with_llm(text_segment):
-    """使用DeepSeek从文本段落中提取阿毗达摩法相概念"""
+    packed 为真时 text_segment 是 format_batch 生成的多段文本，要求模型注明每个概念和关系所在的段落。
+    API调用最终失败或响应无法解析时返回 None
+    """
+    extra_note = ""
+    if packed:
+        extra_note = """
+    4. 文本分为多个以 [段落 编号] 标注的部分，请在每个概念和关系中加上 "segment" 字段，值为其所在段落的编号（整数）"""
     prompt = f"""
     你是一位精通佛教阿毗达摩的专家，请分析以下《法宗原》文本：
     
@@ -69,14 +95,37 @@ def extract_concepts_with_llm(text_segment):
     注意：
     1. 确保每个概念的ID是唯一的英文标识符(例如：rupa, vedana, samjna)
     2. 确保关系的source和target字段使用对应概念的ID值
-    3. 严格按照JSON格式返回，不要添加任何额外的说明文字
+    3. 严格按照JSON格式返回，不要添加任何额外的说明文字{extra_note}
     """
     
-    response = call_deepseek_api(prompt)
+    response = call_deepseek_api(prompt, limiter, cache)
     return parse_deepseek_response(response)
 
-def call_deepseek_api(prompt):
-    """调用DeepSeek API"""
+def extract_batch(batch, limiter=None, cache=None):
+    """处理 pack_segments 打包的一个请求，返回 {段落编号: 结果}
+
+    API调用失败或响应无法解析时抛出 RuntimeError，这些段落不写入结果日志，下次运行时重新请求
+    """
+    if len(batch) == 1 and batch[0]["parts"] == 1:
+        result = extract_concepts_with_llm(batch[0]["text"], limiter, cache)
+    else:
+        result = extract_concepts_with_llm(format_batch(batch), limiter, cache, packed=True)
+    if result is None:
+        raise RuntimeError("API调用失败或响应无法解析")
+    return assign_results(result, batch)
+
+def call_deepseek_api(prompt, limiter=None, cache=None):
+    """调用DeepSeek API；指定 limiter 时每次请求前先取令牌，429 由 limiter 让所有线程一起等待
+
+    指定 cache 时先查缓存，命中则不发请求；成功的响应写入缓存
+    """
+    key = cache_key(DEEPSEEK_MODEL, TEMPERATURE, MAX_TOKENS, prompt, DEEPSEEK_API_URL)
+    if cache is not None:
+        cached = cache.get(key)
+        if cached is not None:
+            logging.info("使用缓存的API响应")
+            return cached
+    
     headers = {
         "Content-Type": "application/json", 
         "Authorization": f"Bearer {DEEPSEEK_API_KEY}"
@@ -93,22 +142,38 @@ def call_deepseek_api(prompt):
     
     for attempt in range(max_retries):
         try:
+            if limiter is not None:
+                limiter.acquire()
             logging.info(f"调用API (尝试 {attempt + 1}/{max_retries})")
             response = requests.post(
-                "https://api.deepseek.com/v1/chat/completions",
+                DEEPSEEK_API_URL,
                 headers=headers,
                 json=data,
-                timeout=120  # 延长超时时间至120秒
+                timeout=LLM_TIMEOUT
             )
             
             if response.status_code == 429:
-                retry_after = int(response.headers.get('Retry-After', retry_delay * (2 ** attempt)))
-                logging.warning(f"API限流 (429)，等待 {retry_after} 秒后重试")
-                time.sleep(retry_after)
+                retry_after = parse_retry_after(response.headers.get('Retry-After'), retry_delay * (2 ** attempt))
+                if limiter is not None:
+                    rate = limiter.on_throttle(retry_after)
+                    logging.warning(f"API限流 (429)，所有线程暂停 {retry_after:.1f} 秒，速率降至每分钟 {rate * 60:.1f} 次")
+                else:
+                    logging.warning(f"API限流 (429)，等待 {retry_after:.1f} 秒后重试")
+                    time.sleep(retry_after)
                 continue
                 
             response.raise_for_status()
-            return response.json()
+            if limiter is not None:
+                limiter.on_success()
+            result = response.json()
+            if cache is not None:
+                # 内容不是合法JSON的响应不缓存，下次运行时重新请求
+                try:
+                    extract_response_json(result)
+                    cache.put(key, DEEPSEEK_MODEL, result)
+                except Exception:
+                    logging.warning("响应内容无法解析为JSON，不写入缓存")
+            return result
             
         except requests.exceptions.RequestException as e:
             logging.error(f"API请求失败 (尝试 {attempt + 1}/{max_retries}): {str(e)}")
@@ -121,27 +186,31 @@ def call_deepseek_api(prompt):
                 logging.error(f"段落处理最终失败，放弃此段落")
                 return None
 
+def extract_response_json(response):
+    """取出响应内容中的JSON并解析，格式不对时抛出异常"""
+    # DeepSeek返回格式
+    content = response['choices'][0]['message']['content']
+    
+    # 提取JSON部分（处理可能存在的markdown代码块）
+    json_str = content
+    if '```json' in content:
+        json_str = content.split('```json')[1].split('```')[0]
+    elif '```' in content:
+        json_str = content.split('```')[1].split('```')[0]
+    
+    # 清理可能导致解析错误的前导和尾随空白    
+    json_str = json_str.strip()
+    
+    # 尝试解析JSON
+    return json.loads(json_str)
+
 def parse_deepseek_response(response):
-    """解析DeepSeek API的响应"""
+    """解析DeepSeek API的响应，没有响应或无法解析时返回 None"""
     if not response:
-        return {"concepts": [], "relations": []}
+        return None
     
     try:
-        # DeepSeek返回格式
-        content = response['choices'][0]['message']['content']
-        
-        # 提取JSON部分（处理可能存在的markdown代码块）
-        json_str = content
-        if '```json' in content:
-            json_str = content.split('```json')[1].split('```')[0]
-        elif '```' in content:
-            json_str = content.split('```')[1].split('```')[0]
-        
-        # 清理可能导致解析错误的前导和尾随空白    
-        json_str = json_str.strip()
-        
-        # 尝试解析JSON
-        result = json.loads(json_str)
+        result = extract_response_json(response)
         
         # 验证必要字段
         if not all(k in result for k in ["concepts", "relations"]):
@@ -160,35 +229,75 @@ def parse_deepseek_response(response):
         logging.error(f"解析DeepSeek响应失败: {str(e)}")
         if response:
             logging.debug(f"原始响应: {response}")
-        return {"concepts": [], "relations": []}
+        return None
+
+def relation_key(relation):
+    """关系的去重键 (source, target, type)"""
+    return relation["source"], relation["target"], str(relation.get("type") or "")
+
+def add_relation(all_relations, relation, weight, segments):
+    """按 (source, target, type) 合并关系：weight 为出现该关系的段落数，重复出现时累加，
+    已记录过的来源段落不重复计数；记录最多 MAX_RELATION_SEGMENTS 个来源段落，定义取较长的。新增时返回 True"""
+    key = relation_key(relation)
+    existing = all_relations.get(key)
+    if existing is None:
+        relation = dict(relation, weight=weight, segments=list(segments[:MAX_RELATION_SEGMENTS]))
+        all_relations[key] = relation
+        return True
+    recorded = set(existing["segments"])
+    existing["weight"] += weight - sum(1 for segment in set(segments) if segment in recorded)
+    for segment in segments:
+        if len(existing["segments"]) >= MAX_RELATION_SEGMENTS:
+            break
+        if segment not in recorded:
+            recorded.add(segment)
+            existing["segments"].append(segment)
+    if len(relation.get("description") or "") > len(existing.get("description") or ""):
+        existing["description"] = relation["description"]
+    return False
+
+def merge_result(all_concepts, all_relations, result, index):
+    """把段落 index 的提取结果合并进已有结果，all_relations 为 {(source, target, type): 关系}，返回 (概念数, 关系数)"""
+    for concept in result.get("concepts", []):
+        concept_id = concept.get("id")
+        if not concept_id:
+            logging.warning(f"概念缺少ID，跳过：{concept}")
+            continue
+            
+        if concept_id not in all_concepts:
+            all_concepts[concept_id] = concept
+        else:
+            # 已存在时补全空字段、保留较长的定义
+            merge_attributes(all_concepts[concept_id], concept)
+            logging.debug(f"合并重复概念: {concept_id}")
+    
+    new_relations = result.get("relations", [])
+    seen = set()
+    for relation in new_relations:
+        # 验证source和target都存在
+        if not relation.get("source") or not relation.get("target"):
+            logging.warning(f"关系缺少source或target，跳过：{relation}")
+            continue
+        # 切分段落重叠部分中的关系会在两块中各出现一次，同一段落只计一次
+        key = relation_key(relation)
+        if key in seen:
+            add_relation(all_relations, relation, 0, [])
+        else:
+            seen.add(key)
+            add_relation(all_relations, relation, 1, [index])
+    return len(result.get("concepts", [])), len(new_relations)
+
+def process_all_segments(segments_file, output_dir, start_index=0, workers=LLM_WORKERS,
+                         requests_per_minute=LLM_REQUESTS_PER_MINUTE, cache=None, pack_tokens=LLM_PACK_TOKENS,
+                         resolve=True):
+    """处理所有文本段落，提取概念和关系
 
-def process_all_segments(segments_file, output_dir, start_index=0):
-    """处理所有文本段落，提取概念和关系"""
+    每个段落完成后立即写入输出目录下的结果日志 journal.jsonl；重新运行时跳过日志中已有的段落，
+    最后按段落顺序逐条读出日志记录合并为 concepts.json 和 relations.json
+    """
     # 创建输出目录
     os.makedirs(output_dir, exist_ok=True)
-    
-    # 检查是否有现有进度文件
-    progress_file = os.path.join(output_dir, "progress.json")
-    checkpoint_file = os.path.join(output_dir, "checkpoint.json")
-    
-    # 尝试从检查点恢复
-    all_concepts = {}
-    all_relations = []
-    
-    if os.path.exists(checkpoint_file) and start_index == 0:
-        try:
-            logging.info(f"尝试从检查点恢复...")
-            with open(checkpoint_file, 'r', encoding='utf-8') as f:
-                checkpoint = json.load(f)
-                all_concepts = checkpoint.get("concepts", {})
-                all_relations = checkpoint.get("relations", [])
-                start_index = checkpoint.get("last_processed_index", 0) + 1
-                logging.info(f"成功从检查点恢复，从段落 {start_index+1} 开始继续处理")
-        except Exception as e:
-            logging.warning(f"无法从检查点恢复: {str(e)}，将从头开始处理")
-            start_index = 0
-            all_concepts = {}
-            all_relations = []
+    journal_file = os.path.join(output_dir, "journal.jsonl")
     
     # 加载文本段落
     try:
@@ -199,7 +308,16 @@ def process_all_segments(segments_file, output_dir, start_index=0):
         sys.exit(1)
     
     total_segments = len(segments)
-    logging.info(f"开始处理，共 {total_segments} 个段落，从段落 {start_index+1} 开始")
+    hashes = [segment_hash(segment_to_text(segment)) for segment in segments]
+    
+    # 从结果日志恢复：只认段落内容未变的记录
+    journal = ResultJournal(journal_file, LLM_JOURNAL_FSYNC)
+    completed = {index: offset for index, (offset, text_hash) in journal.replay().items()
+                 if isinstance(index, int) and 0 <= index < total_segments and text_hash == hashes[index]}
+    if completed:
+        logging.info(f"从结果日志恢复 {len(completed)} 个已完成的段落")
+    todo = [i for i in range(start_index, total_segments) if i not in completed]
+    logging.info(f"开始处理，共 {total_segments} 个段落，待处理 {len(todo)} 个")
     
     # 统计信息
     start_time = time.time()
@@ -207,89 +325,101 @@ def process_all_segments(segments_file, output_dir, start_index=0):
     error_count = 0
     empty_result_count = 0
     
-    # 处理每个段落
-    for i in range(start_index, total_segments):
-        segment = segments[i]
-        logging.info(f"处理段落 {i+1}/{total_segments}")
-        
-        try:
-            # 调用大模型提取概念和关系
-            result = extract_concepts_with_llm(segment)
+    # 短段落打包进同一个请求、超长段落切分为多块
+    batches = pack_segments(segments, pack_tokens, LLM_SPLIT_OVERLAP, todo)
+    logging.info(f"共 {len(batches)} 个请求（每个请求的段落文本不超过约 {pack_tokens} token）" if pack_tokens > 0
+                 else f"每个段落单独请求，共 {len(batches)} 个请求")
+    
+    # 多个线程并发调用API，共用一个限流器；哪个请求先完成就先写日志
+    limiter = AdaptiveRateLimiter(requests_per_minute / 60, burst=workers)
+    window = max(1, workers) * 2
+    pending = {}
+    next_batch = 0
+    # 切分的段落各块的结果先累积在这里，全部块完成后写入日志；有一块失败则整段不写，下次运行时重做
+    segment_results = {}
+    logging.info(f"并发数 {workers}，每分钟最多 {requests_per_minute:g} 次请求")
+    
+    executor = ThreadPoolExecutor(max_workers=max(1, workers))
+    try:
+        while pending or next_batch < len(batches):
+            # 保持最多 window 个请求在处理中，避免大文本一次提交全部请求
+            while next_batch < len(batches) and len(pending) < window:
+                batch = batches[next_batch]
+                pending[executor.submit(extract_batch, batch, limiter, cache)] = batch
+                next_batch += 1
             
-            # 处理结果
-            if result and (result.get("concepts") or result.get("relations")):
-                # 合并概念（避免重复）
-                for concept in result.get("concepts", []):
-                    concept_id = concept.get("id")
-                    if not concept_id:
-                        logging.warning(f"概念缺少ID，跳过：{concept}")
-                        continue
-                        
-                    if concept_id not in all_concepts:
-                        all_concepts[concept_id] = concept
-                    else:
-                        # 如果已存在，可能需要合并某些字段
-                        logging.info(f"合并重复概念: {concept_id}")
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                batch = pending.pop(future)
+                try:
+                    assigned = future.result()
+                except Exception as e:
+                    error_count += 1
+                    logging.error(f"处理段落 {batch[0]['index']+1}-{batch[-1]['index']+1} 时发生错误: {str(e)}")
+                    assigned = None
                 
-                # 添加关系
-                new_relations = result.get("relations", [])
-                for relation in new_relations:
-                    # 验证source和target都存在
-                    if not relation.get("source") or not relation.get("target"):
-                        logging.warning(f"关系缺少source或target，跳过：{relation}")
+                extended = set()
+                for item in batch:
+                    i = item["index"]
+                    partial = segment_results.setdefault(i, {"concepts": [], "relations": [], "parts": 0, "failed": False})
+                    partial["parts"] += 1
+                    if assigned is None:
+                        partial["failed"] = True
+                    elif i not in extended:
+                        # 同一段落的几块在同一个请求中时，assigned[i] 已是这几块的全部结果，只累加一次
+                        extended.add(i)
+                        partial["concepts"].extend(assigned[i]["concepts"])
+                        partial["relations"].extend(assigned[i]["relations"])
+                    if partial["parts"] < item["parts"]:
                         continue
-                    all_relations.append(relation)
-                
-                success_count += 1
-                logging.info(f"成功提取: +{len(result.get('concepts', []))} 概念, +{len(new_relations)} 关系")
-            else:
-                empty_result_count += 1
-                logging.warning(f"段落 {i+1} 未提取出概念或关系")
-            
-            # 每10个段落保存一次进度
-            if (i + 1) % 10 == 0 or i == total_segments - 1:
-                save_checkpoint(checkpoint_file, all_concepts, all_relations, i)
-                
-            # 避免API限流，动态调整等待时间
-            wait_time = 3 if success_count > error_count else 5
-            logging.info(f"等待 {wait_time} 秒后继续...")
-            time.sleep(wait_time)
-            
-        except Exception as e:
-            error_count += 1
-            logging.error(f"处理段落 {i+1} 时发生错误: {str(e)}")
-            # 如果连续出错，增加等待时间
-            if error_count > 2:
-                logging.warning("连续多次出错，等待30秒后继续...")
-                time.sleep(30)
+                    
+                    result = segment_results.pop(i)
+                    if result["failed"]:
+                        continue
+                    completed[i] = journal.append(i, hashes[i], result)
+                    if result["concepts"] or result["relations"]:
+                        success_count += 1
+                        logging.info(f"段落 {i+1}/{total_segments} 提取: {len(result['concepts'])} 概念, {len(result['relations'])} 关系")
+                    else:
+                        empty_result_count += 1
+                        logging.warning(f"段落 {i+1} 未提取出概念或关系")
+    finally:
+        # 中断时不再开始新的请求，已发出的请求结束后退出
+        executor.shutdown(wait=False, cancel_futures=True)
+        journal.close()
     
-    # 完成处理，保存最终结果
-    save_final_results(output_dir, all_concepts, all_relations)
+    # 完成处理：按段落顺序逐条读出日志记录合并，保存最终结果
+    all_concepts = {}
+    all_relations = {}
+    for index, record in journal.results(completed):
+        merge_result(all_concepts, all_relations, record, index)
+    if resolve:
+        # 合并以不同ID返回的同一概念，并改写关系端点；改写后相同的关系再合并一次
+        all_concepts, resolved, _ = resolve_entities(all_concepts, all_relations.values())
+        all_relations = {}
+        for relation in resolved:
+            add_relation(all_relations, relation, relation["weight"], relation["segments"])
+    # 去掉端点不在概念中的关系
+    relations = [relation for relation in all_relations.values()
+                 if relation["source"] in all_concepts and relation["target"] in all_concepts]
+    dangling_count = len(all_relations) - len(relations)
+    save_final_results(output_dir, all_concepts, relations)
     
     # 记录统计信息
     elapsed_time = time.time() - start_time
     logging.info(f"处理完成！用时 {elapsed_time:.2f} 秒")
     logging.info(f"统计信息:")
     logging.info(f"  - 总段落数: {total_segments}")
+    logging.info(f"  - 已完成段落: {len(completed)}")
+    logging.info(f"  - 请求数: {len(batches)}")
     logging.info(f"  - 成功处理: {success_count}")
     logging.info(f"  - 空结果数: {empty_result_count}")
     logging.info(f"  - 错误数: {error_count}")
+    logging.info(f"  - 限流次数: {limiter.throttled}")
+    if cache is not None:
+        logging.info(f"  - 缓存命中: {cache.hits}，未命中: {cache.misses}")
     logging.info(f"  - 提取概念: {len(all_concepts)}")
-    logging.info(f"  - 提取关系: {len(all_relations)}")
-
-def save_checkpoint(checkpoint_file, concepts, relations, last_index):
-    """保存检查点"""
-    try:
-        with open(checkpoint_file, 'w', encoding='utf-8') as f:
-            json.dump({
-                "concepts": concepts,
-                "relations": relations,
-                "last_processed_index": last_index,
-                "timestamp": datetime.now().isoformat()
-            }, f, ensure_ascii=False)
-        logging.info(f"检查点已保存 (处理至段落 {last_index+1})")
-    except Exception as e:
-        logging.error(f"保存检查点失败: {str(e)}")
+    logging.info(f"  - 提取关系: {len(relations)}（另有 {dangling_count} 条端点不存在的关系已丢弃）")
 
 def save_final_results(output_dir, concepts_dict, relations_list):
     """保存最终结果"""
@@ -312,7 +442,13 @@ def save_final_results(output_dir, concepts_dict, relations_list):
 
 if __name__ == "__main__":
     if len(sys.argv) < 3:
-        print("用法: python llm_concept_extractor.py <segments.json文件> <输出目录> [--start-index=N] [--verbose]")
+        print("用法: python llm_concept_extractor.py <segments.json文件> <输出目录> [--start-index=N] [--workers=N] [--rpm=N] [--pack-tokens=N]"
+              " [--no-cache] [--cache-ttl=秒数] [--prune-cache] [--no-resolve] [--verbose]")
+        sys.exit(1)
+    
+    # 检查API密钥
+    if not DEEPSEEK_API_KEY:
+        logging.error("ERROR: DeepSeek API密钥未设置，请在.env文件中配置DEEPSEEK_API_KEY")
         sys.exit(1)
     
     segments_file = sys.argv[1]
@@ -320,6 +456,13 @@ if __name__ == "__main__":
     
     # 解析可选参数
     start_index = 0
+    workers = LLM_WORKERS
+    requests_per_minute = LLM_REQUESTS_PER_MINUTE
+    pack_tokens = LLM_PACK_TOKENS
+    use_cache = True
+    cache_ttl = LLM_CACHE_TTL
+    prune_cache = False
+    resolve = True
     verbose = False
     
     for arg in sys.argv[3:]:
@@ -329,6 +472,36 @@ if __name__ == "__main__":
             except:
                 logging.error(f"无效的起始索引: {arg}")
                 sys.exit(1)
+        elif arg.startswith("--workers=") or arg.startswith("--rpm="):
+            try:
+                value = arg.split("=")[1]
+                if arg.startswith("--workers="):
+                    workers = int(value)
+                else:
+                    requests_per_minute = float(value)
+                if workers < 1 or requests_per_minute <= 0:
+                    raise ValueError(value)
+            except ValueError:
+                logging.error(f"无效的参数: {arg}")
+                sys.exit(1)
+        elif arg.startswith("--pack-tokens="):
+            try:
+                pack_tokens = int(arg.split("=")[1])
+            except ValueError:
+                logging.error(f"无效的参数: {arg}")
+                sys.exit(1)
+        elif arg == "--no-cache":
+            use_cache = False
+        elif arg.startswith("--cache-ttl="):
+            try:
+                cache_ttl = float(arg.split("=")[1])
+            except ValueError:
+                logging.error(f"无效的参数: {arg}")
+                sys.exit(1)
+        elif arg == "--prune-cache":
+            prune_cache = True
+        elif arg == "--no-resolve":
+            resolve = False
         elif arg == "--verbose":
             verbose = True
             logging.getLogger().setLevel(logging.DEBUG)
@@ -337,11 +510,19 @@ if __name__ == "__main__":
     logging.info(f"开始时间: {datetime.now().isoformat()}")
     logging.info(f"输入文件: {segments_file}")
     logging.info(f"输出目录: {output_dir}")
+    logging.info(f"API地址: {DEEPSEEK_API_URL}")
     logging.info(f"起始段落: {start_index+1}")
+    logging.info(f"并发数: {workers}")
+    logging.info(f"响应缓存: {LLM_CACHE_PATH if use_cache else '不使用'}")
     logging.info(f"======================================")
     
+    cache = ResponseCache(LLM_CACHE_PATH, cache_ttl) if use_cache else None
+    if cache is not None and prune_cache:
+        logging.info(f"已删除 {cache.prune()} 个过期的缓存条目")
+    
     try:
-        process_all_segments(segments_file, output_dir, start_index)
+        process_all_segments(segments_file, output_dir, start_index, workers, requests_per_minute, cache,
+                             pack_tokens, resolve)
     except KeyboardInterrupt:
         logging.warning("用户中断处理")
         sys.exit(130)
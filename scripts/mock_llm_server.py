@@ -0,0 +1,228 @@
+# mock_llm_server.py
+"""本地的 /v1/chat/completions 替身服务，用于离线测试和测量 llm_concept_extractor.py 的吞吐
+
+响应有两种来源：
+- --replay=缓存文件：从 llm_cache.py 的 SQLite 缓存中按对真实接口的键（模型、temperature、max_tokens、提示词）取出录制的响应，
+  没有录制的提示词返回 404（加 --fallback 时改为合成）
+- 默认合成：从提示词中每个 [段落 N] 标注的文本里取若干个词作为概念，相邻概念之间加一条关系
+
+可注入的故障（按概率，--seed 固定随机序列）：
+- --latency=秒数：每个请求的平均延迟（在 0.5–1.5 倍之间均匀抖动）
+- --rate-429=概率、--retry-after=秒数：返回 429 和 Retry-After 头
+- --timeout=概率、--hang=秒数：挂起 hang 秒后才响应，用于触发客户端超时
+- --malformed=概率：返回不是 JSON 的内容
+GET /stats 返回各类响应的计数。
+
+用法: python mock_llm_server.py [--port=8765] [--latency=0.5] [--rate-429=0.05] [--retry-after=1] [--timeout=0] [--hang=30]
+                                [--malformed=0] [--replay=llm_cache.sqlite] [--fallback] [--seed=0]
+然后以 DEEPSEEK_API_URL=http://127.0.0.1:8765/v1/chat/completions 运行提取脚本。
+提取脚本的缓存键包含非默认的接口地址，对替身的运行与对真实接口的运行即使共用缓存文件也互不命中。
+"""
+import re
+import sys
+import json
+import time
+import zlib
+import random
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from llm_cache import ResponseCache, cache_key
+from segment_packing import estimate_tokens
+
+SEGMENT_MARKER = re.compile(r'\[段落 (\d+)\][^\n]*\n')
+WORD = re.compile(r'[一-鿿]{2,4}')
+WORDS_PER_SEGMENT = 4
+
+
+def synthesize(prompt):
+    """按提示词中的段落合成一个格式正确的提取结果；同样的提示词总是得到同样的结果"""
+    # 段落文本在"文本："之后、"请识别以下内容"之前
+    body = prompt.split("请识别以下内容")[0].split("文本：", 1)[-1]
+    sections = SEGMENT_MARKER.split(body)
+    if len(sections) > 1:
+        # split 的结果为 [前文, 编号, 文本, 编号, 文本, ...]
+        pairs = [(int(sections[i]), sections[i + 1]) for i in range(1, len(sections) - 1, 2)]
+    else:
+        pairs = [(None, body)]
+    concepts = []
+    relations = []
+    for segment, text in pairs:
+        words = list(dict.fromkeys(WORD.findall(text)))[:WORDS_PER_SEGMENT]
+        previous = None
+        for word in words:
+            concept_id = f"c{zlib.crc32(word.encode('utf-8')):08x}"
+            concept = {"id": concept_id, "name": word, "description": f"{word}的定义", "category": "心所法"}
+            if segment is not None:
+                concept["segment"] = segment
+            concepts.append(concept)
+            if previous is not None:
+                relation = {"source": previous, "target": concept_id, "type": "相应", "description": ""}
+                if segment is not None:
+                    relation["segment"] = segment
+                relations.append(relation)
+            previous = concept_id
+    return json.dumps({"concepts": concepts, "relations": relations}, ensure_ascii=False)
+
+
+class MockState:
+    def __init__(self, latency=0.0, rate_429=0.0, retry_after=1, timeout=0.0, hang=30.0, malformed=0.0,
+                 replay=None, fallback=False, seed=0):
+        self.latency = latency
+        self.rate_429 = rate_429
+        self.retry_after = retry_after
+        self.timeout = timeout
+        self.hang = hang
+        self.malformed = malformed
+        self.replay = ResponseCache(replay) if replay else None
+        self.fallback = fallback
+        self.counts = {"requests": 0, "ok": 0, "replayed": 0, "throttled": 0, "timeouts": 0, "malformed": 0,
+                       "not_found": 0}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def draw(self):
+        """返回本次请求的 (故障类型, 延迟)；故障类型为 None、"429"、"timeout" 或 "malformed" """
+        with self._lock:
+            self.counts["requests"] += 1
+            roll = self._random.random()
+            delay = self.latency * self._random.uniform(0.5, 1.5)
+        if roll < self.rate_429:
+            return "429", 0.0
+        roll -= self.rate_429
+        if roll < self.timeout:
+            return "timeout", self.hang
+        roll -= self.timeout
+        if roll < self.malformed:
+            return "malformed", delay
+        return None, delay
+
+    def count(self, name):
+        with self._lock:
+            self.counts[name] += 1
+
+
+def completion(model, content, prompt):
+    prompt_tokens = estimate_tokens(prompt)
+    completion_tokens = estimate_tokens(content)
+    return {
+        "id": f"mock-{time.time_ns()}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                  "total_tokens": prompt_tokens + completion_tokens}
+    }
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    state = None
+
+    def log_message(self, format, *args):
+        logging.debug(format % args)
+
+    def _send_json(self, status, body, headers=None):
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == "/stats":
+            with self.state._lock:
+                self._send_json(200, dict(self.state.counts))
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        if self.path.rstrip("/") != "/v1/chat/completions":
+            self._send_json(404, {"error": "not found"})
+            return
+        state = self.state
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            model = request.get("model", "")
+            prompt = request["messages"][-1]["content"]
+        except (ValueError, KeyError, IndexError, TypeError):
+            self._send_json(400, {"error": "invalid request"})
+            return
+
+        fault, delay = state.draw()
+        if fault == "429":
+            state.count("throttled")
+            self._send_json(429, {"error": "rate limited"}, {"Retry-After": str(state.retry_after)})
+            return
+        time.sleep(delay)
+        if fault == "timeout":
+            state.count("timeouts")
+        if fault == "malformed":
+            state.count("malformed")
+            self._send_json(200, completion(model, "概念如下：{\"concepts\": [", prompt))
+            return
+
+        if state.replay is not None:
+            key = cache_key(model, request.get("temperature"), request.get("max_tokens"), prompt)
+            recorded = state.replay.get(key)
+            if recorded is not None:
+                state.count("replayed")
+                self._send_json(200, recorded)
+                return
+            if not state.fallback:
+                state.count("not_found")
+                self._send_json(404, {"error": "no recorded response for this prompt"})
+                return
+        state.count("ok")
+        self._send_json(200, completion(model, synthesize(prompt), prompt))
+
+
+def start_server(port=0, **options):
+    """在后台线程中启动服务，返回 (server, 端点URL)；port 为 0 时自动选择端口"""
+    handler = type("Handler", (MockHandler,), {"state": MockState(**options)})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1/chat/completions"
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    port = 8765
+    options = {}
+    converters = {"--latency": ("latency", float), "--rate-429": ("rate_429", float),
+                  "--retry-after": ("retry_after", int), "--timeout": ("timeout", float),
+                  "--hang": ("hang", float), "--malformed": ("malformed", float),
+                  "--replay": ("replay", str), "--seed": ("seed", int)}
+    for arg in sys.argv[1:]:
+        name, _, value = arg.partition("=")
+        try:
+            if name == "--port":
+                port = int(value)
+            elif name == "--fallback":
+                options["fallback"] = True
+            elif name in converters:
+                key, convert = converters[name]
+                options[key] = convert(value)
+            else:
+                raise ValueError(arg)
+        except ValueError:
+            print(f"无效的参数: {arg}")
+            print("\n".join(__doc__.strip().splitlines()[-3:-1]))
+            sys.exit(1)
+
+    server, url = start_server(port, **options)
+    logging.info(f"替身服务已启动: {url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
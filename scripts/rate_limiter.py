@@ -0,0 +1,76 @@
+# rate_limiter.py
+"""多个工作线程共用的自适应令牌桶限流器
+
+- 令牌按 rate（次/秒）匀速补充，桶容量为 burst，每次调用 API 前取一个令牌
+- 收到 429 时速率减半（不低于 min_rate），并让所有线程一起暂停到 Retry-After 指定的时间
+- 之后每次成功调用把速率加回 max_rate 的 1/RECOVERY_STEPS，直到恢复到 max_rate
+"""
+import time
+import threading
+from email.utils import parsedate_to_datetime
+
+RECOVERY_STEPS = 20
+
+
+def parse_retry_after(value, default):
+    """解析 Retry-After 头（秒数或 HTTP 日期），返回等待秒数；无法解析时返回 default"""
+    if not value:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return default
+
+
+class AdaptiveRateLimiter:
+    def __init__(self, rate, burst=1, min_rate=None):
+        self.max_rate = float(rate)
+        self.rate = self.max_rate
+        self.min_rate = min_rate if min_rate is not None else self.max_rate / RECOVERY_STEPS
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.paused_until = 0.0
+        self.throttled = 0
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self):
+        """阻塞直到取得一个令牌，返回等待的秒数"""
+        start = time.monotonic()
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self.paused_until:
+                    wait = self.paused_until - now
+                elif self.tokens >= 1:
+                    self.tokens -= 1
+                    return now - start
+                else:
+                    wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def on_throttle(self, retry_after):
+        """收到 429：速率减半，所有线程暂停 retry_after 秒"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.throttled += 1
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.tokens = 0.0
+            self.paused_until = max(self.paused_until, now + retry_after)
+            return self.rate
+
+    def on_success(self):
+        with self._lock:
+            if self.rate < self.max_rate:
+                self._refill(time.monotonic())
+                self.rate = min(self.max_rate, self.rate + self.max_rate / RECOVERY_STEPS)
@@ -0,0 +1,90 @@
+# result_journal.py
+"""概念提取的逐段落结果日志（追加写入的 JSONL）
+
+每个段落完成后立即追加一行 {"index", "hash", "concepts", "relations", "timestamp"}，写入代价与已处理的段落数无关，
+进程崩溃最多丢失正在进行中的请求。并发时段落按完成的先后写入，顺序不固定：
+- replay() 扫描整个文件，记下每个段落最后一条记录的位置；hash 为段落文本的哈希，段落内容变化后旧记录不再有效
+- results() 按段落顺序逐条读出记录，内存中只保存各记录的位置
+崩溃时写了一半的最后一行在打开时截掉。
+"""
+import os
+import json
+import hashlib
+import logging
+from datetime import datetime
+
+
+def segment_hash(text):
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class ResultJournal:
+    def __init__(self, path, fsync=True):
+        self.path = path
+        self.fsync = fsync
+        self._truncate_partial_line()
+        self._file = open(path, "ab")
+
+    def _truncate_partial_line(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "rb+") as f:
+            size = f.seek(0, os.SEEK_END)
+            if size == 0:
+                return
+            f.seek(size - 1)
+            if f.read(1) == b"\n":
+                return
+            # 从末尾向前找到最后一个换行符
+            position = size
+            while position > 0:
+                step = min(65536, position)
+                position -= step
+                f.seek(position)
+                chunk = f.read(step)
+                newline = chunk.rfind(b"\n")
+                if newline >= 0:
+                    position += newline + 1
+                    break
+            logging.warning(f"结果日志末尾有不完整的记录，截断 {size - position} 字节")
+            f.truncate(position)
+
+    def append(self, index, text_hash, result):
+        """追加一条记录，返回其在文件中的位置"""
+        offset = self._file.tell()
+        record = {
+            "index": index,
+            "hash": text_hash,
+            "concepts": result.get("concepts", []),
+            "relations": result.get("relations", []),
+            "timestamp": datetime.now().isoformat()
+        }
+        self._file.write(json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n")
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+        return offset
+
+    def replay(self):
+        """返回 {段落编号: (记录位置, 段落哈希)}，同一段落有多条记录时以最后一条为准"""
+        records = {}
+        with open(self.path, "rb") as f:
+            offset = 0
+            for line in f:
+                try:
+                    record = json.loads(line)
+                    records[record["index"]] = (offset, record.get("hash"))
+                except (ValueError, KeyError, TypeError):
+                    logging.warning(f"跳过无法解析的日志记录 (位置 {offset})")
+                offset += len(line)
+        return records
+
+    def results(self, offsets):
+        """按段落编号顺序逐条读出记录，offsets 为 {段落编号: 记录位置}"""
+        with open(self.path, "rb") as f:
+            for index in sorted(offsets):
+                f.seek(offsets[index])
+                yield index, json.loads(f.readline())
+
+    def close(self):
+        self._file.close()
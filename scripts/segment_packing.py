@@ -0,0 +1,156 @@
+# segment_packing.py
+"""按 token 预算把文本段落打包成 LLM 请求
+
+preprocess.segment_text 得到的段落长短悬殊：目录一段很长，许多小标题下只有一行。
+- 短段落按顺序装入同一个请求，直到达到 token 预算（顺序装箱，每个请求包含连续的段落）
+- 超过预算的段落在句读处切分为多块，相邻两块重叠 overlap 个 token，避免切断的概念在两边都不完整
+- 请求中每块前标注段落编号，要求模型在每个概念和关系上注明所在段落，assign_results 据此把结果分回各段落
+
+token 数按 DeepSeek 文档给出的比例估算：一个汉字约 0.6 个 token，一个英文字符约 0.3 个 token。
+"""
+import re
+import math
+
+CJK_TOKENS_PER_CHAR = 0.6
+OTHER_TOKENS_PER_CHAR = 0.3
+# 每块前的段落编号标记占用的 token 数
+PART_OVERHEAD = 8
+CLAUSE_BOUNDARY = re.compile(r'(?<=[。！？；：，、．.!?;:,\n])')
+
+
+def _is_cjk(ch):
+    code = ord(ch)
+    return (0x3400 <= code <= 0x9fff or 0xf900 <= code <= 0xfaff or 0x3000 <= code <= 0x303f
+            or 0xff00 <= code <= 0xffef or 0x20000 <= code <= 0x2ffff)
+
+
+def _char_tokens(ch):
+    return CJK_TOKENS_PER_CHAR if _is_cjk(ch) else OTHER_TOKENS_PER_CHAR
+
+
+def estimate_tokens(text):
+    """估算文本的 token 数（中日韩字符与其他字符分别计）"""
+    cjk = sum(1 for ch in text if _is_cjk(ch))
+    return math.ceil(cjk * CJK_TOKENS_PER_CHAR + (len(text) - cjk) * OTHER_TOKENS_PER_CHAR)
+
+
+def segment_to_text(segment):
+    """preprocess 输出的段落为 {"title", "level", "content"}，也接受纯文本"""
+    if isinstance(segment, dict):
+        title = segment.get("title", "")
+        content = segment.get("content", "")
+        return f"{title}\n{content}" if title else content
+    return str(segment)
+
+
+def _hard_split(clause, budget):
+    """没有句读可切的长句按字符切分"""
+    pieces = []
+    start = 0
+    tokens = 0.0
+    for i, ch in enumerate(clause):
+        cost = _char_tokens(ch)
+        if tokens + cost > budget and i > start:
+            pieces.append(clause[start:i])
+            start = i
+            tokens = 0.0
+        tokens += cost
+    pieces.append(clause[start:])
+    return pieces
+
+
+def split_text(text, budget, overlap=0):
+    """在句读处把文本切成每块不超过 budget 个 token 的块，相邻块重叠不超过 overlap 个 token"""
+    if estimate_tokens(text) <= budget:
+        return [text]
+    overlap = min(overlap, budget // 2)
+    clauses = []
+    for clause in CLAUSE_BOUNDARY.split(text):
+        if clause:
+            clauses.extend(_hard_split(clause, budget) if estimate_tokens(clause) > budget else [clause])
+
+    chunks = []
+    current = []
+    current_tokens = 0
+    for clause in clauses:
+        tokens = estimate_tokens(clause)
+        if current and current_tokens + tokens > budget:
+            chunks.append("".join(current))
+            # 下一块以上一块末尾不超过 overlap 的几个分句开头
+            carry = []
+            carry_tokens = 0
+            for previous in reversed(current):
+                previous_tokens = estimate_tokens(previous)
+                if carry_tokens + previous_tokens > overlap or carry_tokens + previous_tokens + tokens > budget:
+                    break
+                carry.insert(0, previous)
+                carry_tokens += previous_tokens
+            current = carry
+            current_tokens = carry_tokens
+        current.append(clause)
+        current_tokens += tokens
+    if current:
+        chunks.append("".join(current))
+    return chunks
+
+
+def pack_segments(segments, budget, overlap=0, indices=None):
+    """把 segments 中编号在 indices（默认为全部）里的段落按顺序打包为请求列表
+
+    每个请求是若干块组成的列表，块为 {"index": 段落编号, "part": 块序号, "parts": 块数, "text": 文本}。
+    请求按段落顺序排列，同一段落的各块相邻。budget 不大于 0 时每个段落单独一个请求、不切分。
+    """
+    if indices is None:
+        indices = range(len(segments))
+    if budget <= 0:
+        return [[{"index": index, "part": 0, "parts": 1, "text": segment_to_text(segments[index])}]
+                for index in indices]
+    batches = []
+    current = []
+    current_tokens = 0
+    for index in indices:
+        chunks = split_text(segment_to_text(segments[index]), budget - PART_OVERHEAD, overlap)
+        for part, chunk in enumerate(chunks):
+            tokens = estimate_tokens(chunk) + PART_OVERHEAD
+            if current and current_tokens + tokens > budget:
+                batches.append(current)
+                current = []
+                current_tokens = 0
+            current.append({"index": index, "part": part, "parts": len(chunks), "text": chunk})
+            current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+def format_batch(batch):
+    """请求正文：每块前标注 [段落 编号]，切分的段落另注明第几块"""
+    sections = []
+    for item in batch:
+        if item["parts"] > 1:
+            header = f"[段落 {item['index']}]（第 {item['part'] + 1}/{item['parts']} 部分）"
+        else:
+            header = f"[段落 {item['index']}]"
+        sections.append(f"{header}\n{item['text']}")
+    return "\n\n".join(sections)
+
+
+def assign_results(result, batch):
+    """把一次请求的结果按 "segment" 字段分回各段落，返回 {段落编号: {"concepts", "relations"}}
+
+    未注明或注明了请求之外编号的条目归入请求中的第一个段落。
+    """
+    indices = list(dict.fromkeys(item["index"] for item in batch))
+    assigned = {index: {"concepts": [], "relations": []} for index in indices}
+    for key in ("concepts", "relations"):
+        for entry in (result or {}).get(key, []):
+            if not isinstance(entry, dict):
+                continue
+            entry = dict(entry)
+            segment = entry.pop("segment", None)
+            try:
+                segment = int(segment)
+            except (TypeError, ValueError):
+                segment = None
+            assigned[segment if segment in assigned else indices[0]][key].append(entry)
+    return assigned
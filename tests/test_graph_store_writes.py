@@ -0,0 +1,249 @@
+# coding: utf-8
+"""FileGraphStore 的写路径：崩溃后回放写日志、合并写日志、在已发布快照上增量更新"""
+import json
+import random
+
+import pytest
+
+from graph_data import ConflictError
+from graph_store import FileGraphStore, GraphIndex, GraphSnapshot
+from search_index import MAX_SEARCH_LIMIT, SearchIndex
+
+CATEGORIES = ["色法", "心法", "心所法", "心不相应行法", "无为法"]
+CHARS = "色受想行识眼耳鼻舌身意触作意欲胜解念定慧信惭愧无贪瞋痴勤安舍不放逸害"
+
+
+def random_name(rng):
+    return "".join(rng.choice(CHARS) for _ in range(rng.randint(1, 4)))
+
+
+def random_concept(rng, concept_id):
+    concept = {"id": concept_id, "name": random_name(rng), "description": random_name(rng) + "之法"}
+    if rng.random() < 0.9:
+        concept["category"] = rng.choice(CATEGORIES)
+    return concept
+
+
+def write_graph(data_dir, rng, num_concepts=60, num_relations=150):
+    concepts = [random_concept(rng, f"c{i}") for i in range(num_concepts)]
+    relations = {}
+    while len(relations) < num_relations:
+        src, dst = rng.sample(range(num_concepts), 2)
+        relation = {"src_id": f"c{src}", "dst_id": f"c{dst}", "relation_type": rng.choice(["包含", "相应"]),
+                    "weight": rng.randint(1, 5)}
+        relations[(relation["src_id"], relation["dst_id"], relation["relation_type"])] = relation
+    with open(data_dir / "concepts.json", "w", encoding="utf-8") as f:
+        json.dump(concepts, f, ensure_ascii=False)
+    with open(data_dir / "relations.json", "w", encoding="utf-8") as f:
+        json.dump(list(relations.values()), f, ensure_ascii=False)
+
+
+def open_store(data_dir, **kwargs):
+    # 后台重建线程等待一小时，由测试调用 _rebuild() 决定每批写入的边界
+    options = dict(fsync=False, rebuild_delay=3600, precompute=False, compact_threshold=10 ** 9)
+    options.update(kwargs)
+    return FileGraphStore(str(data_dir), **options)
+
+
+def random_write(store, rng, next_id):
+    """对 store 做一次随机写操作；目标不存在或已存在时忽略"""
+    concept_ids = list(store._writable_data().concepts)
+    relation_keys = list(store._data.relations)
+    op = rng.random()
+    try:
+        if op < 0.2 or len(concept_ids) < 2:
+            store.add_concept(random_concept(rng, f"n{next_id}"))
+        elif op < 0.4:
+            fields = {"name": random_name(rng)}
+            if rng.random() < 0.5:
+                fields["category"] = rng.choice(CATEGORIES + [""])
+            store.update_concept(rng.choice(concept_ids), fields)
+        elif op < 0.5:
+            store.delete_concept(rng.choice(concept_ids))
+        elif op < 0.75:
+            src, dst = rng.sample(concept_ids, 2)
+            store.add_relation({"src_id": src, "dst_id": dst, "relation_type": rng.choice(["包含", "相应"]),
+                                "weight": rng.randint(1, 5)})
+        elif relation_keys:
+            store.delete_relation(*rng.choice(relation_keys))
+    except (KeyError, ConflictError):
+        pass
+
+
+def assert_same_index(actual, expected):
+    assert actual.all_concepts == expected.all_concepts
+    assert actual.concept_by_id == expected.concept_by_id
+    assert actual.order == expected.order
+    assert actual.position == expected.position
+    assert list(actual.category_positions.items()) == list(expected.category_positions.items())
+    assert actual.out_edges == expected.out_edges
+    assert actual.in_edges == expected.in_edges
+    assert actual.relation_count == expected.relation_count
+
+
+@pytest.fixture
+def incremental_updates(monkeypatch):
+    """记录在已发布快照上增量更新（而不是整体重建）的次数"""
+    calls = []
+    updated = GraphSnapshot.updated
+
+    def spy(self, *args, **kwargs):
+        calls.append(self)
+        return updated(self, *args, **kwargs)
+
+    monkeypatch.setattr(GraphSnapshot, "updated", spy)
+    return calls
+
+
+def search_scores(index, query, category=None):
+    return {index.doc_ids[doc]: score for doc, score in index.search(query, category, MAX_SEARCH_LIMIT)}
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_incremental_snapshot_matches_full_rebuild(tmp_path, incremental_updates, seed):
+    rng = random.Random(seed)
+    write_graph(tmp_path, rng)
+    store = open_store(tmp_path)
+
+    next_id = 0
+    for _ in range(40):
+        # 每批 1–5 条写入，不超过整体重建的阈值（概念数的 10%）
+        for _ in range(rng.randint(1, 5)):
+            random_write(store, rng, next_id)
+            next_id += 1
+        previous = store.snapshot
+        store._rebuild()
+        snapshot = store.snapshot
+        if snapshot is previous:
+            continue
+
+        concepts, relations = store._data.lists()
+        expected = GraphIndex(concepts, relations)
+        assert_same_index(snapshot.graph, expected)
+        assert snapshot.concepts == concepts
+        assert snapshot.relations == relations
+        # 没有涉及的边列表与上一个快照共用
+        untouched = [key for key, edges in previous.graph.out_edges.items() if expected.out_edges.get(key) == edges]
+        assert any(snapshot.graph.out_edges[key] is previous.graph.out_edges[key] for key in untouched)
+
+        expected_search = SearchIndex(expected.concepts())
+        queries = [concept["name"] for concept in rng.sample(concepts, 5)] + [rng.choice(CHARS) for _ in range(5)]
+        for query in queries:
+            assert search_scores(snapshot.search_index, query) == search_scores(expected_search, query)
+            category = rng.choice(CATEGORIES)
+            assert (search_scores(snapshot.search_index, query, category)
+                    == search_scores(expected_search, query, category))
+    assert len(incremental_updates) >= 30
+    store.close()
+
+    # 从磁盘重新加载（回放写日志）得到同样的图
+    reloaded = open_store(tmp_path)
+    assert_same_index(reloaded.snapshot.graph, GraphIndex(*store._data.lists()))
+
+
+def test_relation_added_again_in_one_batch_moves_to_the_end(tmp_path, incremental_updates):
+    # 概念足够多，5 条写入在增量更新的阈值之内
+    concepts = [{"id": concept_id, "name": concept_id} for concept_id in list("abcde") + [f"x{i}" for i in range(60)]]
+    relations = [{"src_id": "a", "dst_id": dst_id, "relation_type": "包含"} for dst_id in "bcde"]
+    (tmp_path / "concepts.json").write_text(json.dumps(concepts), encoding="utf-8")
+    (tmp_path / "relations.json").write_text(json.dumps(relations), encoding="utf-8")
+    store = open_store(tmp_path)
+    store.delete_relation("a", "b", "包含")
+    store.add_relation({"src_id": "a", "dst_id": "b", "relation_type": "包含", "weight": 2})
+    # 删除概念时级联删除的关系，概念和关系再加回来后同样排到末尾
+    store.delete_concept("c")
+    store.add_concept({"id": "c", "name": "c"})
+    store.add_relation({"src_id": "a", "dst_id": "c", "relation_type": "包含"})
+    store._rebuild()
+
+    assert len(incremental_updates) == 1
+    assert_same_index(store.snapshot.graph, GraphIndex(*store._data.lists()))
+    assert [edge[0] for edge in store.graph.edges("a")] == ["d", "e", "b", "c"]
+    store.close()
+
+
+def test_large_batch_falls_back_to_full_rebuild(tmp_path, incremental_updates):
+    rng = random.Random(0)
+    write_graph(tmp_path, rng, num_concepts=20, num_relations=30)
+    store = open_store(tmp_path)
+    for i in range(5):
+        store.add_concept({"id": f"n{i}", "name": f"新{i}"})
+    store._rebuild()
+    assert incremental_updates == []
+    assert_same_index(store.snapshot.graph, GraphIndex(*store._data.lists()))
+    store.close()
+
+
+def test_writes_survive_crash_with_torn_tail(tmp_path):
+    rng = random.Random(1)
+    write_graph(tmp_path, rng)
+    store = open_store(tmp_path, fsync=True)
+    for i in range(30):
+        random_write(store, rng, i)
+    expected = store._data.lists()
+    # 不调用 close()：写操作返回时记录已经落盘；再模拟最后一条记录只写了一半
+    with open(store.log_file, "ab") as f:
+        f.write(b'{"op":"put_concept","concept":{"id":"torn","name":"')
+
+    recovered = open_store(tmp_path)
+    assert recovered.snapshot.concepts == expected[0]
+    assert recovered.snapshot.relations == expected[1]
+    assert "torn" not in recovered.graph
+
+    # 恢复后的写入接在有效记录之后，再次加载时全部回放
+    seq = recovered.add_concept({"id": "after", "name": "后"})
+    assert seq == store._seq + 1
+    recovered.close()
+    reloaded = open_store(tmp_path)
+    assert reloaded.graph.concept("after") == {"id": "after", "name": "后"}
+    assert reloaded.snapshot.concepts == expected[0] + [{"id": "after", "name": "后"}]
+
+
+def test_compaction_round_trip(tmp_path):
+    rng = random.Random(2)
+    write_graph(tmp_path, rng)
+    store = open_store(tmp_path)
+    for i in range(30):
+        random_write(store, rng, i)
+    expected = store._data.lists()
+
+    assert store.compact()
+    assert (tmp_path / "changes.log").stat().st_size == 0
+    assert not (tmp_path / "changes.log.compacting").exists()
+    with open(tmp_path / "concepts.json", encoding="utf-8") as f:
+        assert json.load(f) == expected[0]
+    with open(tmp_path / "relations.json", encoding="utf-8") as f:
+        assert json.load(f) == expected[1]
+    assert not store.compact()
+
+    # 合并后的写入进入新日志，重新加载时回放在新的数据文件之上
+    store.add_concept({"id": "after", "name": "后"})
+    store.close()
+    reloaded = open_store(tmp_path)
+    assert reloaded.snapshot.concepts == expected[0] + [{"id": "after", "name": "后"}]
+    assert reloaded.snapshot.relations == expected[1]
+
+
+def test_interrupted_compaction_is_replayed(tmp_path):
+    rng = random.Random(3)
+    write_graph(tmp_path, rng)
+    store = open_store(tmp_path)
+    for i in range(10):
+        random_write(store, rng, i)
+    # 模拟合并转存日志后、写出数据文件前崩溃
+    store._log.rotate(store.compacting_log_file)
+    for i in range(10, 20):
+        random_write(store, rng, i)
+    expected = store._data.lists()
+    store.close()
+
+    recovered = open_store(tmp_path)
+    assert recovered.snapshot.concepts == expected[0]
+    assert recovered.snapshot.relations == expected[1]
+    assert recovered.compact()
+    assert not (tmp_path / "changes.log.compacting").exists()
+    recovered.close()
+
+    reloaded = open_store(tmp_path)
+    assert reloaded.snapshot.concepts == expected[0]
+    assert reloaded.snapshot.relations == expected[1]
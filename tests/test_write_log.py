@@ -0,0 +1,78 @@
+# coding: utf-8
+"""写日志：崩溃留下的不完整尾部、组提交和转存"""
+import threading
+
+from write_log import WriteLog, read_log
+
+
+def test_torn_tail_is_ignored_and_truncated(tmp_path):
+    path = str(tmp_path / "changes.log")
+    log = WriteLog(path, fsync=False, commit_delay=0)
+    for i in range(3):
+        log.append({"op": "put_concept", "concept": {"id": f"c{i}"}})
+    log.close()
+    with open(path, "ab") as f:
+        f.write(b'{"op":"put_concept","concept":{"id":"torn"')
+
+    records, _ = read_log(path)
+    assert [record["concept"]["id"] for record in records] == ["c0", "c1", "c2"]
+
+    # 重新打开时截掉残缺的尾部，新记录接在最后一条完整记录之后
+    log = WriteLog(path, fsync=False, commit_delay=0, next_seq=4)
+    assert log.records_since_rotate == 3
+    log.append({"op": "put_concept", "concept": {"id": "c3"}})
+    log.close()
+    records, valid_size = read_log(path)
+    assert [record["seq"] for record in records] == [1, 2, 3, 4]
+    assert valid_size == (tmp_path / "changes.log").stat().st_size
+
+
+def test_invalid_line_stops_replay(tmp_path):
+    path = tmp_path / "changes.log"
+    path.write_bytes(b'{"op":"delete_concept","id":"a","seq":1}\nnot json\n{"op":"delete_concept","id":"b","seq":3}\n')
+    records, valid_size = read_log(str(path))
+    assert [record["id"] for record in records] == ["a"]
+    assert valid_size == len(b'{"op":"delete_concept","id":"a","seq":1}\n')
+
+
+def test_group_commit_keeps_every_record(tmp_path):
+    path = str(tmp_path / "changes.log")
+    log = WriteLog(path, fsync=False)
+    lock = threading.Lock()
+    seqs = []
+
+    def writer(n):
+        for i in range(50):
+            # 与 FileGraphStore 一样在锁内分配序号，锁外等待落盘
+            with lock:
+                seq = log.enqueue({"op": "delete_concept", "id": f"{n}-{i}"})
+            log.wait(seq)
+            seqs.append(seq)
+
+    threads = [threading.Thread(target=writer, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    log.close()
+
+    records, _ = read_log(path)
+    assert sorted(seqs) == list(range(1, 401))
+    assert [record["seq"] for record in records] == list(range(1, 401))
+
+
+def test_rotate_appends_to_unfinished_compaction(tmp_path):
+    path = str(tmp_path / "changes.log")
+    dest = path + ".compacting"
+    log = WriteLog(path, fsync=False, commit_delay=0)
+    log.append({"op": "delete_concept", "id": "a"})
+    log.rotate(dest)
+    assert log.records_since_rotate == 0
+    log.append({"op": "delete_concept", "id": "b"})
+    # 上次合并没有完成时，再次转存追加到已有的 .compacting 之后
+    log.rotate(dest)
+    log.append({"op": "delete_concept", "id": "c"})
+    log.close()
+
+    assert [record["id"] for record in read_log(dest)[0]] == ["a", "b"]
+    assert [record["id"] for record in read_log(path)[0]] == ["c"]